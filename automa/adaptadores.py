@@ -0,0 +1,287 @@
+import os
+import logging
+from html.parser import HTMLParser
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urljoin
+
+import urllib3
+from django.conf import settings
+
+from .capturas import opciones_captura
+from .navegadores import obtener_pool
+from .plazo import SIN_LIMITE, PlazoAgotado
+
+
+# ===================================================
+# ⚡ ADAPTADORES HTTP POR PORTAL
+# ===================================================
+#
+# Un portal puede declarar en ``paginas`` una vía rápida por HTTP:
+#
+#     "http": {
+#         "adaptador": "formulario",
+#         "campo_documento": "ctl00$MainContent$txtID",
+#         "boton": {"ctl00$MainContent$btnSearch": "Search"},
+#         "resultado_id": "ctl00_MainContent_divResults",
+#     }
+#
+# Si el adaptador falla (red, marcado distinto, sin resultado) la
+# consulta sigue por el camino Selenium de siempre (procesar_pagina).
+
+HTTP_CONEXIONES = getattr(settings, "CIVI_HTTP_CONEXIONES", 4)
+HTTP_TIMEOUT = getattr(settings, "CIVI_HTTP_TIMEOUT", 20)
+
+CABECERAS = {
+    "User-Agent": (
+        "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+    ),
+    "Accept": "text/html,application/xhtml+xml",
+    "Accept-Language": "es-CO,es;q=0.9,en;q=0.8",
+}
+
+# Conexiones keep-alive compartidas por todos los trabajos
+_http = urllib3.PoolManager(
+    num_pools=10,
+    maxsize=HTTP_CONEXIONES,
+    block=False,
+    headers=CABECERAS,
+    timeout=urllib3.Timeout(connect=5, read=HTTP_TIMEOUT),
+    retries=urllib3.Retry(total=2, backoff_factor=0.3, allowed_methods=["GET"]),
+)
+
+
+class ErrorAdaptador(Exception):
+    pass
+
+
+# ===================================================
+# 🧩 LECTURA DE FORMULARIOS HTML
+# ===================================================
+
+ETIQUETAS_VACIAS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input",
+    "link", "meta", "source", "track", "wbr",
+}
+
+
+class LectorFormularios(HTMLParser):
+    """Extrae los formularios (acción, método y campos) y el texto de un elemento por id."""
+
+    def __init__(self, id_buscado=None):
+        super().__init__(convert_charrefs=True)
+        self.formularios = []
+        self.id_buscado = id_buscado
+        self.encontrado = False
+        self.texto = []
+        self._profundidad = 0
+        self._select = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+
+        if tag not in ETIQUETAS_VACIAS:
+            if self._profundidad:
+                self._profundidad += 1
+            elif self.id_buscado and attrs.get("id") == self.id_buscado:
+                self.encontrado = True
+                self._profundidad = 1
+
+        if tag == "form":
+            self.formularios.append({
+                "action": attrs.get("action", ""),
+                "method": attrs.get("method", "get").lower(),
+                "campos": {},
+            })
+            return
+        if not self.formularios or not attrs.get("name"):
+            if tag == "option" and self._select is not None:
+                self._opcion(attrs)
+            return
+
+        campos = self.formularios[-1]["campos"]
+        if tag == "input":
+            tipo = attrs.get("type", "text").lower()
+            if tipo in ("submit", "button", "image", "reset", "file"):
+                return
+            if tipo in ("checkbox", "radio") and "checked" not in attrs:
+                return
+            campos[attrs["name"]] = attrs.get("value", "")
+        elif tag == "select":
+            self._select = attrs["name"]
+            campos.setdefault(self._select, None)
+        elif tag == "textarea":
+            campos[attrs["name"]] = ""
+
+    def _opcion(self, attrs):
+        campos = self.formularios[-1]["campos"]
+        valor = attrs.get("value", "")
+        if campos.get(self._select) is None or "selected" in attrs:
+            campos[self._select] = valor
+
+    def handle_endtag(self, tag):
+        if tag == "select":
+            self._select = None
+        if self._profundidad and tag not in ETIQUETAS_VACIAS:
+            self._profundidad -= 1
+
+    def handle_data(self, data):
+        if self._profundidad and data.strip():
+            self.texto.append(data.strip())
+
+
+# ===================================================
+# 🌐 ADAPTADORES
+# ===================================================
+
+class AdaptadorPortal:
+    """Interfaz de un portal consultado sin navegador."""
+
+    def __init__(self, pagina, config):
+        self.pagina = pagina
+        self.config = config
+        self.opciones = config.get("http", {})
+
+    def consultar(self, ctx):
+        """Consulta el portal y retorna el HTML del resultado; lanza ``ErrorAdaptador`` si falla."""
+        raise NotImplementedError
+
+
+class AdaptadorFormulario(AdaptadorPortal):
+    """Portales de formulario clásico (p. ej. ASP.NET WebForms): GET + POST con campos ocultos."""
+
+    def consultar(self, ctx):
+        url = self.opciones.get("url", self.config["url"])
+        campo = self.opciones["campo_documento"]
+        galletas = SimpleCookie()
+
+        inicial = self._pedir("GET", url, galletas)
+        lector = LectorFormularios()
+        lector.feed(inicial.data.decode(_codificacion(inicial), "replace"))
+
+        formulario = next((f for f in lector.formularios if campo in f["campos"]), None)
+        if formulario is None:
+            raise ErrorAdaptador(f"No se encontró el campo {campo}")
+
+        campos = {k: (v or "") for k, v in formulario["campos"].items()}
+        campos[campo] = ctx.numero_documento
+        campos.update(self.opciones.get("boton", {}))
+
+        accion = urljoin(url, formulario["action"] or url)
+        respuesta = self._pedir(
+            "POST", accion, galletas,
+            body=urlencode(campos),
+            headers={"Content-Type": "application/x-www-form-urlencoded", "Referer": url},
+        )
+        html = respuesta.data.decode(_codificacion(respuesta), "replace")
+
+        resultado_id = self.opciones.get("resultado_id")
+        if resultado_id:
+            lector = LectorFormularios(resultado_id)
+            lector.feed(html)
+            if not lector.encontrado:
+                raise ErrorAdaptador(f"La respuesta no contiene #{resultado_id}")
+            ctx.agregar_dato(self.pagina, "resultado", " ".join(lector.texto)[:2000])
+
+        return html, accion
+
+    def _pedir(self, metodo, url, galletas, headers=None, **kwargs):
+        headers = {**CABECERAS, **(headers or {})}
+        if galletas:
+            headers["Cookie"] = "; ".join(f"{k}={m.value}" for k, m in galletas.items())
+
+        try:
+            respuesta = _http.request(metodo, url, headers=headers, redirect=True, **kwargs)
+        except urllib3.exceptions.HTTPError as e:
+            raise ErrorAdaptador(f"{metodo} {url}: {e}") from e
+
+        if respuesta.status != 200:
+            raise ErrorAdaptador(f"{metodo} {url}: HTTP {respuesta.status}")
+
+        for cabecera in respuesta.headers.getlist("Set-Cookie"):
+            galletas.load(cabecera)
+        return respuesta
+
+
+ADAPTADORES = {
+    "formulario": AdaptadorFormulario,
+}
+
+
+def _codificacion(respuesta):
+    tipo = respuesta.headers.get("Content-Type", "")
+    if "charset=" in tipo:
+        return tipo.split("charset=")[-1].split(";")[0].strip()
+    return "utf-8"
+
+
+# ===================================================
+# 🚀 CONSULTA POR LA VÍA RÁPIDA
+# ===================================================
+
+def consultar_por_http(ctx, pagina, config, plazo=SIN_LIMITE):
+    """
+    Intenta la vía HTTP del portal. Retorna ``True`` si tuvo éxito y
+    ``False`` si hay que usar Selenium.
+    """
+    opciones = config.get("http")
+    if not opciones:
+        return False
+
+    ruta_html = os.path.join(ctx.carpeta, f"{pagina}_resultado.html")
+    try:
+        adaptador = ADAPTADORES[opciones["adaptador"]](pagina, config)
+        html, url_base = adaptador.consultar(ctx)
+
+        with open(ruta_html, "w", encoding="utf-8") as archivo:
+            archivo.write(_con_base(html, url_base))
+
+        # Solo se abre un navegador si el informe necesita la imagen
+        if config.get("captura_pantalla") and opciones_captura(config, "final") is not None:
+            renderizar_html(ctx, pagina, config, ruta_html, plazo)
+
+        # Se registra al final: si algo falla, Selenium no encuentra un resultado a medias
+        ctx.agregar_archivo(pagina, ruta_html)
+        print(f"⚡ {pagina} consultado por HTTP")
+        return True
+
+    except Exception as e:
+        logging.warning(f"{pagina} - Vía HTTP falló, se usa Selenium: {e}")
+        if os.path.exists(ruta_html):
+            os.remove(ruta_html)
+        return False
+
+
+def renderizar_html(ctx, pagina, config, ruta_html, plazo=SIN_LIMITE):
+    """
+    Abre el HTML guardado en un navegador para tomar la captura final.
+    Respeta el turno del portal, la estrategia de carga de su pool y el
+    plazo del trabajo, como la consulta por Selenium.
+    """
+    from .selenium_script import ejecutar_evento, semaforo_portal, tomar_captura
+
+    semaforo = semaforo_portal(pagina, config)
+    if not semaforo.acquire(timeout=plazo.restante()):
+        raise PlazoAgotado(f"{pagina}: sin turno libre antes del plazo")
+    try:
+        pool = obtener_pool(config.get("estrategia_carga", "normal"))
+        with pool.driver(timeout=plazo.restante()) as driver:
+            driver.get("file://" + os.path.abspath(ruta_html))
+            for i, evento in enumerate(opciones_render(config), start=1):
+                ejecutar_evento(driver, ctx, pagina, evento, i, {"capturas": []}, plazo)
+            tomar_captura(driver, ctx, pagina, "final", config, forzada=True)
+    finally:
+        semaforo.release()
+
+
+def opciones_render(config):
+    """Eventos visuales (zoom, scroll) a aplicar antes de la captura del HTML."""
+    return [e for e in config.get("extra_eventos", []) if e["tipo"] in ("zoom", "scroll")]
+
+
+def _con_base(html, url_base):
+    """Agrega <base href> para que el HTML guardado cargue estilos del portal."""
+    etiqueta = f'<base href="{url_base}">'
+    if "<head>" in html:
+        return html.replace("<head>", "<head>" + etiqueta, 1)
+    return etiqueta + html
@@ -1,3 +1,23 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import Artefacto, Lote, Trabajo
+
+
+@admin.register(Trabajo)
+class TrabajoAdmin(admin.ModelAdmin):
+    list_display = ("numero_documento", "estado", "etapa", "progreso", "lote", "creado")
+    list_filter = ("estado",)
+    search_fields = ("numero_documento",)
+
+
+@admin.register(Lote)
+class LoteAdmin(admin.ModelAdmin):
+    list_display = ("__str__", "total", "creado")
+
+
+@admin.register(Artefacto)
+class ArtefactoAdmin(admin.ModelAdmin):
+    list_display = ("nombre", "tipo", "portal", "numero_documento", "tamano", "creado")
+    list_filter = ("tipo", "portal")
+    search_fields = ("numero_documento", "nombre")
+    raw_id_fields = ("trabajo",)
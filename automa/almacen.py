@@ -0,0 +1,146 @@
+import os
+import re
+import json
+import hashlib
+import logging
+import tempfile
+
+from django.utils import timezone
+
+
+# ==========================================================
+# 🗄️ Almacenamiento de artefactos por trabajo
+# ==========================================================
+#
+#   descargas/
+#     trabajos/AAAA/MM/DD/<documento>/<trabajo>/   ← carpeta propia del trabajo
+#         manifiesto.json                          ← artefactos por portal
+#         ofac_final.jpg, rues/123_cert.pdf ...    ← enlaces duros a blobs/
+#     blobs/ab/cd/<sha256><ext>                    ← contenido único
+#
+# Dos trabajos nunca escriben en la misma carpeta, y los archivos con
+# el mismo contenido (capturas idénticas, certificados repetidos)
+# ocupan disco una sola vez. El manifiesto permite al informe ubicar
+# los artefactos de un trabajo sin recorrer ni interpretar nombres.
+
+NOMBRE_MANIFIESTO = "manifiesto.json"
+TAMANO_BLOQUE = 1024 * 1024
+
+
+def _segmento(texto):
+    """Nombre seguro para carpeta (el documento viene del usuario)."""
+    return re.sub(r"[^0-9A-Za-z_-]", "_", str(texto))[:40] or "sin_documento"
+
+
+def carpeta_trabajo(carpeta_base, trabajo_id, numero_documento, fecha=None):
+    """Carpeta del trabajo, repartida por fecha y documento."""
+    fecha = timezone.localtime(fecha or timezone.now())
+    return os.path.join(
+        carpeta_base, "trabajos",
+        fecha.strftime("%Y"), fecha.strftime("%m"), fecha.strftime("%d"),
+        _segmento(numero_documento), trabajo_id,
+    )
+
+
+def carpeta_blobs(carpeta_base):
+    return os.path.join(carpeta_base, "blobs")
+
+
+# ==========================================================
+# 🧬 Blobs por contenido
+# ==========================================================
+def hash_archivo(ruta):
+    sha = hashlib.sha256()
+    with open(ruta, "rb") as archivo:
+        for bloque in iter(lambda: archivo.read(TAMANO_BLOQUE), b""):
+            sha.update(bloque)
+    return sha.hexdigest()
+
+
+def ruta_blob(carpeta_base, digest, extension=""):
+    return os.path.join(carpeta_blobs(carpeta_base), digest[:2], digest[2:4], digest + extension.lower())
+
+
+def guardar_blob(carpeta_base, ruta):
+    """
+    Incorpora ``ruta`` al almacén de blobs: si ya existe un blob con el
+    mismo contenido, ``ruta`` pasa a ser un enlace duro a él; si no, el
+    archivo se convierte en el blob. Retorna el sha256 del contenido.
+    """
+    digest = hash_archivo(ruta)
+    blob = ruta_blob(carpeta_base, digest, os.path.splitext(ruta)[1])
+    os.makedirs(os.path.dirname(blob), exist_ok=True)
+
+    try:
+        if not os.path.exists(blob):
+            os.link(ruta, blob)
+        elif not os.path.samefile(blob, ruta):
+            # Se reemplaza en forma atómica para no dejar la ruta vacía
+            fd, temporal = tempfile.mkstemp(dir=os.path.dirname(ruta), suffix=".enlace")
+            os.close(fd)
+            os.remove(temporal)
+            os.link(blob, temporal)
+            os.replace(temporal, ruta)
+    except FileExistsError:
+        # Otro trabajo creó el mismo blob al mismo tiempo; ya es idéntico
+        pass
+    except OSError as e:
+        # Sistemas sin enlaces duros: el archivo queda como copia propia
+        logging.warning(f"Almacén - No se pudo enlazar {ruta}: {e}")
+
+    return digest
+
+
+# ==========================================================
+# 📋 Manifiesto del trabajo
+# ==========================================================
+def guardar_manifiesto(carpeta, numero_documento, portales, hashes):
+    """
+    ``portales`` es ``{portal: {"capturas": [...], "archivos": [...]}}``
+    con rutas absolutas; se guardan relativas a la carpeta del trabajo
+    cuando están dentro de ella.
+    """
+    def relativa(ruta):
+        rel = os.path.relpath(ruta, carpeta)
+        return ruta if rel.startswith("..") else rel.replace(os.sep, "/")
+
+    manifiesto = {
+        "documento": numero_documento,
+        "creado": timezone.now().isoformat(),
+        "portales": {
+            portal: {
+                clave: [
+                    {"ruta": relativa(r), "sha256": hashes.get(r, "")}
+                    for r in rutas
+                ]
+                for clave, rutas in datos.items()
+            }
+            for portal, datos in portales.items()
+        },
+    }
+
+    temporal = os.path.join(carpeta, NOMBRE_MANIFIESTO + ".tmp")
+    with open(temporal, "w", encoding="utf-8") as archivo:
+        json.dump(manifiesto, archivo, ensure_ascii=False, indent=1)
+    os.replace(temporal, os.path.join(carpeta, NOMBRE_MANIFIESTO))
+
+
+def leer_manifiesto(carpeta):
+    """
+    Artefactos del trabajo según su manifiesto, como
+    ``{portal: {"capturas": [rutas], "archivos": [rutas]}}`` con rutas
+    absolutas; ``None`` si la carpeta no tiene manifiesto.
+    """
+    try:
+        with open(os.path.join(carpeta, NOMBRE_MANIFIESTO), encoding="utf-8") as archivo:
+            manifiesto = json.load(archivo)
+    except (OSError, ValueError):
+        return None
+
+    return {
+        portal: {
+            clave: [os.path.join(carpeta, e["ruta"]) for e in entradas]
+            for clave, entradas in datos.items()
+        }
+        for portal, datos in manifiesto.get("portales", {}).items()
+    }
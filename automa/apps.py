@@ -1,6 +1,40 @@
 from django.apps import AppConfig
+from django.conf import settings
+
+
+_servicio_iniciado = False
+
+
+def iniciar_servicio():
+    """
+    Arranca lo que solo corresponde al proceso que atiende peticiones.
+    Lo llaman asgi.py y wsgi.py (``runserver`` carga wsgi.py solo en el
+    proceso que sirve), así que ``migrate`` y los demás comandos de
+    manage.py no lo ejecutan.
+    """
+    global _servicio_iniciado
+    if _servicio_iniciado:
+        return
+    _servicio_iniciado = True
+
+    from .cola import recuperar_pendientes
+    recuperar_pendientes()
+
+    if getattr(settings, "CIVI_RETENCION_AUTOMATICA", True):
+        from .retencion import iniciar
+        iniciar()
+
+    if getattr(settings, "CIVI_POOL_CALENTAR", False):
+        # Un pool por estrategia de carga de los portales; se reparten el cupo
+        from .navegadores import calentar_pools
+        from .selenium_script import paginas
+        calentar_pools(c.get("estrategia_carga", "normal") for c in paginas.values())
 
 
 class AutomaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'automa'
+
+    def ready(self):
+        from .registro import configurar_registro
+        configurar_registro()
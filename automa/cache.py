@@ -0,0 +1,149 @@
+import os
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+
+from .almacen import _segmento
+from .models import ResultadoPortal
+
+
+# ==========================================================
+# 🗃️ Caché de resultados por (portal, documento)
+# ==========================================================
+CARPETA_CACHE = os.path.join(settings.MEDIA_ROOT, "descargas", "cache")
+
+CACHE_TTL = getattr(settings, "CIVI_CACHE_TTL", 6 * 3600)
+CACHE_MAX_BYTES = getattr(settings, "CIVI_CACHE_MAX_MB", 500) * 1024 * 1024
+
+# Locks repartidos por entrada (número fijo: no crece con los documentos)
+_locks_entrada = [threading.Lock() for _ in range(64)]
+
+
+def ttl_portal(config):
+    """TTL en segundos del portal (clave ``cache_ttl`` en ``paginas``); 0 desactiva la caché."""
+    return config.get("cache_ttl", CACHE_TTL)
+
+
+def buscar_en_cache(portal, numero_doc, ttl):
+    """
+    Devuelve el ``ResultadoPortal`` vigente o ``None``. Las entradas
+    vencidas o con archivos faltantes se eliminan al encontrarlas.
+    """
+    if not ttl:
+        return None
+
+    entrada = ResultadoPortal.objects.filter(portal=portal, numero_documento=numero_doc).first()
+    if entrada is None:
+        return None
+
+    vencida = entrada.creado < timezone.now() - timedelta(seconds=ttl)
+    incompleta = not all(os.path.exists(r) for r in entrada.capturas + entrada.archivos)
+    if vencida or incompleta:
+        eliminar_entrada(entrada)
+        return None
+
+    ResultadoPortal.objects.filter(pk=entrada.pk).update(ultimo_acceso=timezone.now())
+    print(f"⚡ Resultado en caché: {portal} / {numero_doc}")
+    return entrada
+
+
+def guardar_en_cache(portal, numero_doc, capturas, archivos):
+    """
+    Copia los artefactos a la carpeta de caché y registra la entrada.
+
+    Otros trabajos pueden estar usando la entrada anterior (un acierto
+    guarda las rutas de la caché en su contexto): los archivos se arman
+    en una carpeta temporal hermana y se pasan uno a uno con
+    ``os.replace``, así quien los lee ve el archivo viejo o el nuevo,
+    nunca una carpeta vacía o a medio copiar.
+    """
+    carpeta = carpeta_entrada(portal, numero_doc)
+    with _lock_entrada(carpeta):
+        os.makedirs(carpeta, exist_ok=True)
+        # Los segmentos nunca llevan "." (ver ``_segmento``): no choca con otra entrada
+        temporal = tempfile.mkdtemp(prefix=".", dir=os.path.dirname(carpeta))
+        try:
+            copias_capturas = [_copiar(r, temporal) for r in capturas if os.path.exists(r)]
+            copias_archivos = [_copiar(r, temporal) for r in archivos if os.path.exists(r)]
+            tamano = sum(os.path.getsize(r) for r in copias_capturas + copias_archivos)
+            copias_capturas = [_reemplazar(r, carpeta) for r in copias_capturas]
+            copias_archivos = [_reemplazar(r, carpeta) for r in copias_archivos]
+        finally:
+            shutil.rmtree(temporal, ignore_errors=True)
+
+        # Lo que la entrada anterior tenía y la nueva ya no trae
+        vigentes = set(copias_capturas + copias_archivos)
+        for nombre in os.listdir(carpeta):
+            ruta = os.path.join(carpeta, nombre)
+            if ruta not in vigentes and os.path.isfile(ruta):
+                os.remove(ruta)
+
+        ahora = timezone.now()
+        ResultadoPortal.objects.update_or_create(
+            portal=portal,
+            numero_documento=numero_doc,
+            defaults={
+                "capturas": copias_capturas,
+                "archivos": copias_archivos,
+                "tamano": tamano,
+                "creado": ahora,
+                "ultimo_acceso": ahora,
+            },
+        )
+    desalojar()
+
+
+def desalojar(max_bytes=CACHE_MAX_BYTES):
+    """Elimina las entradas usadas hace más tiempo hasta quedar bajo ``max_bytes``."""
+    total = ResultadoPortal.objects.aggregate(total=Sum("tamano"))["total"] or 0
+    if total <= max_bytes:
+        return
+
+    for entrada in ResultadoPortal.objects.order_by("ultimo_acceso").iterator():
+        if total <= max_bytes:
+            break
+        total -= entrada.tamano
+        eliminar_entrada(entrada)
+
+
+def eliminar_entrada(entrada):
+    entrada.delete()
+    shutil.rmtree(carpeta_entrada(entrada.portal, entrada.numero_documento), ignore_errors=True)
+
+
+def carpeta_entrada(portal, numero_doc):
+    """
+    Carpeta de la entrada. El documento viene del usuario: se limpia y se
+    comprueba que la ruta quede dentro de la caché antes de usarla con
+    ``rmtree``.
+    """
+    base = os.path.realpath(CARPETA_CACHE)
+    carpeta = os.path.realpath(os.path.join(base, _segmento(portal), _segmento(numero_doc)))
+    if os.path.commonpath([base, carpeta]) != base or carpeta == base:
+        raise ValueError(f"Ruta de caché fuera de {CARPETA_CACHE}: {carpeta}")
+    return carpeta
+
+
+def _copiar(ruta, carpeta):
+    destino = os.path.join(carpeta, os.path.basename(ruta))
+    try:
+        os.link(ruta, destino)
+    except OSError:
+        shutil.copy2(ruta, destino)
+    return destino
+
+
+def _reemplazar(ruta, carpeta):
+    destino = os.path.join(carpeta, os.path.basename(ruta))
+    os.replace(ruta, destino)
+    return destino
+
+
+def _lock_entrada(carpeta):
+    """Un lock por entrada: dos trabajos que guardan el mismo documento no mezclan sus archivos."""
+    return _locks_entrada[hash(carpeta) % len(_locks_entrada)]
@@ -0,0 +1,133 @@
+import io
+import os
+import base64
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from .esperas import esperar_pintado, metodo_selector
+
+try:
+    from PIL import Image
+except ImportError:  # sin Pillow la captura de respaldo queda en PNG
+    Image = None
+
+
+# ===================================================
+# 📸 CAPTURAS DE PANTALLA
+# ===================================================
+#
+# Política por portal (clave "capturas" en ``paginas``): lista de los
+# cuadros que necesita el informe, por nombre ("input", "evento_5",
+# "final") o como diccionario con opciones propias:
+#
+#     "capturas": ["evento_2", {"nombre": "final", "selector": "#resultados", "calidad": 90}]
+#
+# Si el portal no define "capturas" se toman todos los cuadros. Las
+# capturas explícitas (eventos "captura" y "captura_pantalla") siempre
+# se toman.
+
+FORMATO = getattr(settings, "CIVI_CAPTURA_FORMATO", "jpeg")
+CALIDAD = getattr(settings, "CIVI_CAPTURA_CALIDAD", 80)
+WORKERS = getattr(settings, "CIVI_CAPTURA_WORKERS", 2)
+
+EXTENSIONES = {"png": "png", "jpeg": "jpg", "webp": "webp"}
+
+_executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="civi-capturas")
+
+
+def opciones_captura(config, nombre):
+    """Opciones del cuadro según la política del portal, o ``None`` si no se necesita."""
+    politica = config.get("capturas")
+    if politica is None:
+        return {}
+    for entrada in politica:
+        if isinstance(entrada, str) and entrada == nombre:
+            return {}
+        if isinstance(entrada, dict) and entrada.get("nombre") == nombre:
+            return entrada
+    return None
+
+
+def capturar(driver, opciones):
+    """
+    Toma la captura por CDP y devuelve (datos_base64, extension).
+    Con "selector" se recorta al elemento.
+    """
+    formato = opciones.get("formato", FORMATO)
+    parametros = {"format": formato, "captureBeyondViewport": False}
+    if formato != "png":
+        parametros["quality"] = opciones.get("calidad", CALIDAD)
+
+    selector = opciones.get("selector")
+    if selector:
+        elemento = driver.find_element(metodo_selector(selector), selector)
+        caja = driver.execute_script(
+            "const r = arguments[0].getBoundingClientRect();"
+            "return {x: r.left + window.scrollX, y: r.top + window.scrollY,"
+            " width: r.width, height: r.height};",
+            elemento,
+        )
+        parametros["clip"] = {**caja, "scale": 1}
+
+    datos = driver.execute_cdp_cmd("Page.captureScreenshot", parametros)["data"]
+    return datos, EXTENSIONES[formato]
+
+
+def capturar_respaldo(driver, opciones):
+    """
+    Captura sin CDP (``get_screenshot_as_png``). WebDriver solo entrega
+    PNG; con Pillow se pasa a JPEG, que el informe inserta sin decodificar.
+    """
+    png = driver.get_screenshot_as_png()
+    if Image is None:
+        return base64.b64encode(png).decode(), "png"
+
+    salida = io.BytesIO()
+    Image.open(io.BytesIO(png)).convert("RGB").save(
+        salida, "JPEG", quality=opciones.get("calidad", CALIDAD)
+    )
+    return base64.b64encode(salida.getvalue()).decode(), "jpg"
+
+
+def guardar_en_segundo_plano(ctx, pagina, ruta, datos_base64):
+    """Decodifica y escribe la captura en el pool de hilos; retorna el ``Future``."""
+    futuro = _executor.submit(_guardar, ctx, pagina, ruta, datos_base64)
+    ctx.registrar_pendiente(futuro)
+    return futuro
+
+
+def _guardar(ctx, pagina, ruta, datos_base64):
+    try:
+        contenido = base64.b64decode(datos_base64)
+        digest = hashlib.sha1(contenido).hexdigest()
+
+        # Cuadros idénticos dentro del trabajo comparten el archivo en disco
+        existente = ctx.registrar_hash(digest, ruta)
+        if existente:
+            try:
+                os.link(existente, ruta)
+            except OSError:
+                _escribir(ruta, contenido)
+        else:
+            _escribir(ruta, contenido)
+
+        ctx.agregar_captura(pagina, ruta)
+        return ruta
+
+    except Exception as e:
+        logging.error(f"Error al guardar captura de {pagina}: {e}")
+        return None
+
+
+def _escribir(ruta, contenido):
+    with open(ruta, "wb") as archivo:
+        archivo.write(contenido)
+
+
+def preparar_captura(driver):
+    """Restablece el zoom y espera a que se pinte el cuadro."""
+    driver.execute_script("document.body.style.zoom='1';")
+    esperar_pintado(driver)
@@ -0,0 +1,223 @@
+import os
+import uuid
+import logging
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+
+from .almacen import NOMBRE_MANIFIESTO
+from .descargas import SUFIJOS_PARCIALES
+from .models import Artefacto, Trabajo
+
+
+# ==========================================================
+# 📁 Catálogo de artefactos en /media/descargas
+# ==========================================================
+#
+# Cada archivo generado (captura, descarga, HTML, informe) queda
+# registrado en ``Artefacto`` al producirse, para que las vistas de
+# descargas consulten la tabla en lugar de recorrer la carpeta. La
+# caché tiene su propia tabla (``ResultadoPortal``) y los blobs del
+# almacén se catalogan a través de las rutas de cada trabajo.
+
+CARPETA_DESCARGAS = os.path.join(settings.MEDIA_ROOT, "descargas")
+CARPETAS_EXCLUIDAS = {"cache", "blobs"}
+TAMANO_LOTE = 500
+
+# Archivos a medio escribir: descargas de Chrome, el informe en flujo
+# (``.parcial``), enlaces del almacén y el PDF base temporal del informe
+SUFIJOS_TEMPORALES = SUFIJOS_PARCIALES + (".parcial", ".enlace")
+PREFIJOS_TEMPORALES = ("INFORME DE CONSULTAS_base_",)
+
+
+def ruta_relativa(ruta):
+    """Ruta relativa a MEDIA_ROOT con separador ``/`` (clave del catálogo)."""
+    return os.path.relpath(os.path.abspath(ruta), settings.MEDIA_ROOT).replace(os.sep, "/")
+
+
+def ruta_absoluta(relativa):
+    return os.path.join(settings.MEDIA_ROOT, *relativa.split("/"))
+
+
+def es_temporal(nombre):
+    return nombre.lower().endswith(SUFIJOS_TEMPORALES) or nombre.startswith(PREFIJOS_TEMPORALES)
+
+
+def catalogable(ruta):
+    """Solo se catalogan archivos de /media/descargas fuera de la caché y los blobs."""
+    relativa = os.path.relpath(os.path.abspath(ruta), CARPETA_DESCARGAS)
+    if relativa.startswith(".."):
+        return False
+    return relativa.split(os.sep)[0] not in CARPETAS_EXCLUIDAS
+
+
+def tipo_por_nombre(nombre):
+    nombre = nombre.lower()
+    if nombre.endswith((".html", ".htm")):
+        return Artefacto.HTML
+    if nombre.endswith(".pdf") and nombre.startswith(("informe", "informe de consultas")):
+        return Artefacto.INFORME
+    if nombre.endswith((".png", ".jpg", ".jpeg", ".webp")):
+        return Artefacto.CAPTURA
+    return Artefacto.ARCHIVO
+
+
+def _nuevo(ruta, tipo=None, portal="", numero_documento="", trabajo_id=None, sha256=""):
+    nombre = os.path.basename(ruta)
+    estado = os.stat(ruta)
+    return Artefacto(
+        trabajo_id=trabajo_id,
+        numero_documento=str(numero_documento)[:30],
+        portal=portal[:50],
+        tipo=tipo or tipo_por_nombre(nombre),
+        nombre=nombre[:255],
+        extension=os.path.splitext(nombre)[1].lower()[:10],
+        ruta=ruta_relativa(ruta),
+        tamano=estado.st_size,
+        sha256=sha256,
+        creado=datetime.fromtimestamp(estado.st_mtime, tz=dt_timezone.utc),
+        accedido=timezone.now(),
+    )
+
+
+def _guardar(artefactos):
+    """Inserta o actualiza (por ``ruta``) en lotes."""
+    for i in range(0, len(artefactos), TAMANO_LOTE):
+        Artefacto.objects.bulk_create(
+            artefactos[i:i + TAMANO_LOTE],
+            update_conflicts=True,
+            unique_fields=["ruta"],
+            update_fields=["trabajo", "numero_documento", "portal", "tipo", "tamano", "sha256", "creado", "accedido"],
+        )
+
+
+def _trabajo_existente(trabajo_id):
+    if not trabajo_id:
+        return None
+    try:
+        pk = uuid.UUID(str(trabajo_id))
+    except ValueError:
+        return None
+    return pk if Trabajo.objects.filter(pk=pk).exists() else None
+
+
+# ==========================================================
+# ✍️ Registro al producir artefactos
+# ==========================================================
+def registrar_artefacto(ruta, tipo=None, portal="", numero_documento="", trabajo_id=None):
+    """Registra (o actualiza) un archivo recién escrito."""
+    if not os.path.isfile(ruta) or not catalogable(ruta):
+        return
+    try:
+        _guardar([_nuevo(ruta, tipo, portal, numero_documento, _trabajo_existente(trabajo_id))])
+    except Exception as e:
+        logging.error(f"Catálogo - No se pudo registrar {ruta}: {e}")
+
+
+def registrar_portal(ctx, pagina):
+    """Registra las capturas y archivos que un portal dejó en el contexto."""
+    capturas, archivos = ctx.artefactos_portal(pagina)
+    trabajo_id = _trabajo_existente(ctx.id)
+
+    artefactos = [
+        _nuevo(ruta, tipo, pagina, ctx.numero_documento, trabajo_id, ctx.contenidos.get(ruta, ""))
+        for tipo, rutas in ((Artefacto.CAPTURA, capturas), (None, archivos))
+        for ruta in rutas
+        if os.path.isfile(ruta) and catalogable(ruta)
+    ]
+    try:
+        _guardar(artefactos)
+    except Exception as e:
+        logging.error(f"{pagina} - No se pudieron catalogar los artefactos: {e}")
+
+
+def marcar_acceso(artefactos):
+    """Actualiza el último uso (orden de desalojo de la retención por cuota)."""
+    artefactos.update(accedido=timezone.now())
+
+
+def eliminar_artefacto(artefacto):
+    """Borra el archivo y su registro; retorna ``True`` si el archivo existía."""
+    ruta = ruta_absoluta(artefacto.ruta)
+    existia = os.path.exists(ruta)
+    if existia:
+        os.remove(ruta)
+    artefacto.delete()
+    return existia
+
+
+# ==========================================================
+# 🔄 Reconciliación catálogo ↔ disco
+# ==========================================================
+def _inferir(relativa, trabajos):
+    """Documento, portal y trabajo a partir de la ubicación del archivo."""
+    partes = relativa.split("/")[1:]  # sin "descargas"
+    nombre = partes[-1]
+    trabajo_id, documento, portal = None, "", ""
+
+    if partes[0] == "trabajos":
+        # trabajos/AAAA/MM/DD/<documento>/<trabajo>/[<portal>/]archivo
+        for i, parte in enumerate(partes[1:-1], start=1):
+            if parte in trabajos:
+                trabajo_id, documento = trabajos[parte]
+                if i + 2 < len(partes):
+                    portal = partes[i + 1]
+                break
+    es_informe = tipo_por_nombre(nombre) == Artefacto.INFORME
+    if not portal and not es_informe and "_" in nombre and not nombre[0].isdigit():
+        portal = nombre.split("_")[0].lower()
+    if not documento and es_informe and "_" in nombre:
+        documento = os.path.splitext(nombre)[0].rsplit("_", 1)[-1]
+
+    return trabajo_id, documento, portal
+
+
+def reconciliar(carpeta=CARPETA_DESCARGAS, agregar=True, quitar=True, simular=False):
+    """
+    Sincroniza ``Artefacto`` con los archivos en disco: agrega los que
+    faltan en la tabla, actualiza tamaños y quita registros huérfanos.
+    Los archivos a medio escribir (``es_temporal``) se ignoran. Retorna
+    un resumen con los conteos.
+    """
+    registrados = dict(Artefacto.objects.values_list("ruta", "tamano"))
+    trabajos = {
+        pk.hex: (pk, doc)
+        for pk, doc in Trabajo.objects.values_list("pk", "numero_documento")
+    }
+
+    nuevos, actualizados, vistos = [], [], set()
+    for raiz, carpetas, nombres in os.walk(carpeta):
+        if os.path.abspath(raiz) == os.path.abspath(CARPETA_DESCARGAS):
+            carpetas[:] = [c for c in carpetas if c not in CARPETAS_EXCLUIDAS]
+
+        for nombre in nombres:
+            if nombre == NOMBRE_MANIFIESTO or es_temporal(nombre):
+                continue
+            ruta = os.path.join(raiz, nombre)
+            relativa = ruta_relativa(ruta)
+            vistos.add(relativa)
+
+            if relativa not in registrados:
+                if agregar:
+                    trabajo_id, documento, portal = _inferir(relativa, trabajos)
+                    nuevos.append(_nuevo(ruta, None, portal, documento, trabajo_id))
+            elif registrados[relativa] != os.path.getsize(ruta):
+                actualizados.append((relativa, os.path.getsize(ruta)))
+
+    prefijo = ruta_relativa(carpeta) + "/"
+    huerfanos = [r for r in registrados if r.startswith(prefijo) and r not in vistos] if quitar else []
+
+    if not simular:
+        _guardar(nuevos)
+        for relativa, tamano in actualizados:
+            Artefacto.objects.filter(ruta=relativa).update(tamano=tamano)
+        for i in range(0, len(huerfanos), TAMANO_LOTE):
+            Artefacto.objects.filter(ruta__in=huerfanos[i:i + TAMANO_LOTE]).delete()
+
+    return {
+        "agregados": len(nuevos),
+        "actualizados": len(actualizados),
+        "eliminados": len(huerfanos),
+        "revisado": timezone.now().isoformat(),
+    }
@@ -0,0 +1,213 @@
+import time
+import random
+import logging
+import threading
+from collections import deque
+
+from django.conf import settings
+
+from .metricas import Contador, Medidor
+
+
+# ===================================================
+# 🔌 CORTACIRCUITOS POR PORTAL
+# ===================================================
+#
+# Compartido por todos los trabajos del proceso. Tras ``umbral`` fallos
+# seguidos el circuito se abre y las consultas siguientes omiten el
+# portal de inmediato (el informe lo marca como no disponible). Pasada
+# la espera, una sola consulta prueba el portal (semiabierto): si
+# funciona el circuito se cierra; si falla, se vuelve a abrir con el
+# doble de espera (hasta ``espera_max``).
+#
+# Cada portal puede ajustar los valores en ``paginas``:
+#
+#     "circuito": {"umbral": 3, "espera": 60, "espera_max": 600},
+
+CIRCUITO_UMBRAL = getattr(settings, "CIVI_CIRCUITO_UMBRAL", 3)
+CIRCUITO_ESPERA = getattr(settings, "CIVI_CIRCUITO_ESPERA", 60)
+CIRCUITO_ESPERA_MAX = getattr(settings, "CIVI_CIRCUITO_ESPERA_MAX", 600)
+CIRCUITO_VENTANA = 20
+
+REINTENTOS = getattr(settings, "CIVI_REINTENTOS", 2)
+REINTENTO_BASE = getattr(settings, "CIVI_REINTENTO_BASE", 1.0)
+REINTENTO_TOPE = getattr(settings, "CIVI_REINTENTO_TOPE", 8.0)
+
+CERRADO = "cerrado"
+ABIERTO = "abierto"
+SEMIABIERTO = "semiabierto"
+
+# Errores de red de Chrome que vale la pena reintentar
+ERRORES_RED = (
+    "net::ERR_CONNECTION", "net::ERR_TIMED_OUT", "net::ERR_NAME_NOT_RESOLVED",
+    "net::ERR_INTERNET_DISCONNECTED", "net::ERR_NETWORK_CHANGED", "net::ERR_EMPTY_RESPONSE",
+    "net::ERR_SSL_PROTOCOL_ERROR", "net::ERR_HTTP2_PROTOCOL_ERROR",
+)
+
+
+class ErrorPortal(Exception):
+    """Falla del portal (no del navegador ni del plazo); cuenta para el circuito."""
+
+    def __init__(self, mensaje, transitorio=False):
+        super().__init__(mensaje)
+        self.transitorio = transitorio
+
+
+def es_transitorio(error):
+    if isinstance(error, ErrorPortal):
+        return error.transitorio
+    if isinstance(error, ConnectionError):
+        return True
+    mensaje = str(error)
+    return any(codigo in mensaje for codigo in ERRORES_RED)
+
+
+class CircuitoPortal:
+    def __init__(self, nombre, umbral=CIRCUITO_UMBRAL, espera=CIRCUITO_ESPERA,
+                 espera_max=CIRCUITO_ESPERA_MAX):
+        self.nombre = nombre
+        self.umbral = umbral
+        self.espera_base = espera
+        self.espera_max = espera_max
+        self.estado = CERRADO
+        self.fallos_seguidos = 0
+        self.espera = espera
+        self.abierto_hasta = 0.0
+        self._sondeo = False
+        self._historial = deque(maxlen=CIRCUITO_VENTANA)
+        self._lock = threading.Lock()
+
+    def permitir(self):
+        """``True`` si la consulta puede ir al portal; en semiabierto solo pasa un sondeo a la vez."""
+        with self._lock:
+            if self.estado == ABIERTO and time.monotonic() >= self.abierto_hasta:
+                self.estado = SEMIABIERTO
+                print(f"🔌 Circuito de {self.nombre} semiabierto: se probará el portal")
+            if self.estado == CERRADO:
+                return True
+            if self.estado == SEMIABIERTO and not self._sondeo:
+                self._sondeo = True
+                return True
+            RECHAZOS_TOTAL.inc(self.nombre)
+            return False
+
+    def exito(self):
+        with self._lock:
+            self._historial.append(True)
+            self.fallos_seguidos = 0
+            self._sondeo = False
+            if self.estado != CERRADO:
+                print(f"🔌 Circuito de {self.nombre} cerrado: el portal respondió")
+            self.estado = CERRADO
+            self.espera = self.espera_base
+
+    def fallo(self, motivo=""):
+        with self._lock:
+            self._historial.append(False)
+            self.fallos_seguidos += 1
+            if self.estado == SEMIABIERTO:
+                # El sondeo falló: se vuelve a abrir con más espera
+                self.espera = min(self.espera * 2, self.espera_max)
+                self._abrir(motivo)
+            elif self.estado == CERRADO and self.fallos_seguidos >= self.umbral:
+                self._abrir(motivo)
+
+    def cancelar(self):
+        """La consulta no llegó a un resultado (plazo, sin navegador): no cuenta, pero libera el sondeo."""
+        with self._lock:
+            self._sondeo = False
+
+    def tasa_fallos(self):
+        with self._lock:
+            if not self._historial:
+                return 0.0
+            return self._historial.count(False) / len(self._historial)
+
+    def reintentar_en(self):
+        """Segundos que faltan para el próximo sondeo (0 si no está abierto)."""
+        with self._lock:
+            if self.estado != ABIERTO:
+                return 0
+            return max(0, int(self.abierto_hasta - time.monotonic()))
+
+    def _abrir(self, motivo):
+        self.estado = ABIERTO
+        self._sondeo = False
+        self.abierto_hasta = time.monotonic() + self.espera
+        logging.error(
+            f"{self.nombre} - Circuito abierto por {self.espera}s tras "
+            f"{self.fallos_seguidos} fallo(s) seguidos: {motivo}"
+        )
+
+
+_circuitos = {}
+_circuitos_lock = threading.Lock()
+
+
+def obtener_circuito(pagina, config=None):
+    with _circuitos_lock:
+        circuito = _circuitos.get(pagina)
+        if circuito is None:
+            opciones = (config or {}).get("circuito", {})
+            circuito = CircuitoPortal(
+                pagina,
+                umbral=opciones.get("umbral", CIRCUITO_UMBRAL),
+                espera=opciones.get("espera", CIRCUITO_ESPERA),
+                espera_max=opciones.get("espera_max", CIRCUITO_ESPERA_MAX),
+            )
+            _circuitos[pagina] = circuito
+        return circuito
+
+
+def estado_circuitos():
+    return {
+        nombre: {
+            "estado": c.estado,
+            "fallos_seguidos": c.fallos_seguidos,
+            "tasa_fallos": round(c.tasa_fallos(), 2),
+            "reintentar_en": c.reintentar_en(),
+        }
+        for nombre, c in list(_circuitos.items())
+    }
+
+
+# ===================================================
+# 🔁 REINTENTOS CON ESPERA EXPONENCIAL Y JITTER
+# ===================================================
+
+def pausa_reintento(intento, base=REINTENTO_BASE, tope=REINTENTO_TOPE):
+    """Espera antes del reintento ``intento`` (0, 1, ...): aleatoria entre 0 y base·2^intento."""
+    return random.uniform(0, min(tope, base * 2 ** intento))
+
+
+def reintentar(funcion, plazo, pagina="", intentos=REINTENTOS):
+    """
+    Ejecuta ``funcion`` y la repite ante errores transitorios mientras
+    queden intentos y plazo; cualquier otro error se propaga enseguida.
+    """
+    for intento in range(intentos + 1):
+        try:
+            return funcion()
+        except Exception as e:
+            if intento == intentos or not es_transitorio(e):
+                raise
+            pausa = plazo.limitar(pausa_reintento(intento))
+            if plazo.restante() - pausa <= 0:
+                raise
+            logging.warning(f"{pagina} - Error transitorio, reintento {intento + 1} en {pausa:.1f}s: {e}")
+            time.sleep(pausa)
+
+
+# ===================================================
+# 📈 MÉTRICAS
+# ===================================================
+
+_VALOR_ESTADO = {CERRADO: 0, SEMIABIERTO: 1, ABIERTO: 2}
+
+RECHAZOS_TOTAL = Contador(
+    "civi_circuito_rechazos_total", "Consultas que omitieron el portal por circuito abierto", ("portal",),
+)
+ESTADO_CIRCUITO = Medidor(
+    "civi_circuito_estado", "Estado del circuito por portal (0 cerrado, 1 semiabierto, 2 abierto)",
+    ("portal",), funcion=lambda: {(n,): _VALOR_ESTADO[c.estado] for n, c in list(_circuitos.items())},
+)
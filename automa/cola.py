@@ -0,0 +1,286 @@
+import time
+import logging
+import threading
+import traceback
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .almacen import carpeta_trabajo
+from .catalogo import ruta_relativa
+from .ejecutor import EjecutorAcotado, Saturado
+from .eventos import publicar
+from .models import Lote, Trabajo
+from .informes import generar_informe_consulta
+from .metricas import TRABAJO_SEGUNDOS, TRABAJOS_EN_CURSO, TRABAJOS_TOTAL, tramo
+from .navegadores import CARPETA_DESCARGAS
+from .plazo import PLAZO_TRABAJO, Plazo
+from .recursos import resumen_bloqueos
+from .selenium_script import ejecutar_consulta
+
+
+# ==========================================================
+# ⚙️ Cola de trabajos en segundo plano
+# ==========================================================
+COLA_WORKERS = getattr(settings, "CIVI_COLA_WORKERS", 2)
+COLA_MAX_PENDIENTES = getattr(settings, "CIVI_COLA_MAX_PENDIENTES", 200)
+LOTE_MAX_PENDIENTES = getattr(settings, "CIVI_LOTE_MAX_PENDIENTES", 10000)
+
+# Acotado: con la cola llena ``encolar_consulta`` lanza ``Saturado`` y la
+# vista responde 429 en lugar de aceptar trabajo que no alcanzará a correr.
+_executor = EjecutorAcotado(COLA_WORKERS, COLA_MAX_PENDIENTES, "civi-cola")
+
+# Los trabajos de lote esperan en la base de datos y entran al ejecutor
+# de a pocos, con el mismo cupo que las consultas sueltas: un lote grande
+# no deja sin lugar a las consultas individuales.
+LOTE_EN_EJECUTOR = 2 * COLA_WORKERS
+
+CANCELADA = "Cancelada por el cliente"
+INTERRUMPIDA = "Interrumpida: el servidor se reinició durante la consulta"
+
+# Trabajos aceptados y aún no terminados: su Future (para descartarlos si
+# no empezaron) y su Plazo (para cortar los que ya están consultando)
+_futuros = {}
+_plazos = {}
+_activos_lock = threading.Lock()
+
+# Trabajos de lote ya enviados al ejecutor y ``forzar`` de cada lote
+_lote_enviados = set()
+_lote_forzar = {}
+_lote_lock = threading.RLock()
+
+
+def actualizar_trabajo(trabajo_id, **campos):
+    Trabajo.objects.filter(pk=trabajo_id).update(**campos)
+    publicar(trabajo_id.hex, "estado", **{
+        clave: campos[clave] for clave in ("estado", "etapa", "progreso") if clave in campos
+    })
+
+
+def encolar_consulta(numero_doc, forzar=False):
+    """Registra el trabajo y lo envía a la cola; retorna el ``Trabajo`` creado."""
+    trabajo = Trabajo.objects.create(numero_documento=numero_doc, etapa="En cola")
+    try:
+        _enviar(trabajo.pk, forzar)
+    except Saturado:
+        trabajo.delete()
+        raise
+    return trabajo
+
+
+def encolar_lote(numeros, nombre="", forzar=False):
+    """
+    Crea un ``Lote`` con un trabajo por documento; sus trabajos pasan al
+    ejecutor a medida que hay cupo (ver ``alimentar_lotes``). Lanza
+    ``Saturado`` si los lotes pendientes más este superan
+    ``LOTE_MAX_PENDIENTES`` documentos.
+    """
+    en_espera = Trabajo.objects.filter(lote__isnull=False, estado=Trabajo.EN_COLA).count()
+    exceso = en_espera + len(numeros) - LOTE_MAX_PENDIENTES
+    if exceso > 0:
+        raise Saturado(_espera_lotes(exceso))
+
+    with transaction.atomic():
+        lote = Lote.objects.create(nombre=nombre, total=len(numeros))
+        Trabajo.objects.bulk_create([
+            Trabajo(lote=lote, numero_documento=numero, etapa="En cola")
+            for numero in numeros
+        ])
+
+    with _lote_lock:
+        _lote_forzar[lote.pk] = forzar
+    alimentar_lotes()
+    return lote
+
+
+def alimentar_lotes():
+    """
+    Envía al ejecutor los siguientes trabajos de lote (los más antiguos
+    primero) hasta tener ``LOTE_EN_EJECUTOR`` o hasta que no haya cupo.
+    Se llama al crear un lote y cada vez que un trabajo deja la cola.
+    """
+    with _lote_lock:
+        hueco = LOTE_EN_EJECUTOR - len(_lote_enviados)
+        if hueco <= 0:
+            return
+        siguientes = list(
+            Trabajo.objects.filter(lote__isnull=False, estado=Trabajo.EN_COLA)
+            .exclude(pk__in=_lote_enviados)
+            .order_by("creado", "pk")
+            .values_list("pk", "lote_id")[:hueco]
+        )
+        if len(siguientes) < hueco:
+            # No queda nada de lotes por enviar: ``forzar`` ya no se necesita
+            _lote_forzar.clear()
+        for trabajo_id, lote_id in siguientes:
+            # Se marca antes de enviarlo: si termina enseguida, ``_al_salir`` lo quita
+            _lote_enviados.add(trabajo_id)
+            try:
+                _enviar(trabajo_id, _lote_forzar.get(lote_id, False))
+            except Saturado:
+                # Se reintenta cuando termine alguno de los trabajos en curso
+                _lote_enviados.discard(trabajo_id)
+                break
+
+
+def _espera_lotes(exceso):
+    """Segundos estimados hasta que se procesen ``exceso`` documentos de lote."""
+    datos = _executor.estadisticas()
+    return max(1, int((datos["duracion_media"] or 30) * exceso / datos["workers"]))
+
+
+def recuperar_pendientes():
+    """
+    La cola vive en memoria: al arrancar el proceso que la atiende, las
+    consultas sueltas que quedaron en cola se vuelven a encolar, los
+    lotes se retoman por ``alimentar_lotes`` y los trabajos que estaban
+    en proceso se marcan con error (pudieron quedar a medio consultar).
+    Supone un solo proceso con cola, como el bus de eventos.
+    """
+    try:
+        interrumpidos = Trabajo.objects.filter(estado=Trabajo.EN_PROCESO).update(
+            estado=Trabajo.ERROR, etapa="Error", error=INTERRUMPIDA,
+        )
+        pendientes = list(
+            Trabajo.objects.filter(estado=Trabajo.EN_COLA, lote__isnull=True)
+            .order_by("creado").values_list("pk", flat=True)
+        )
+        de_lotes = Trabajo.objects.filter(estado=Trabajo.EN_COLA, lote__isnull=False).count()
+    except Exception as e:
+        logging.warning(f"Cola - No se pudieron recuperar los trabajos pendientes: {e}")
+        return
+
+    # Ya habían sido aceptados: no se rechazan por cupo
+    for trabajo_id in pendientes:
+        _enviar(trabajo_id, False, acotado=False)
+    alimentar_lotes()
+    if interrumpidos or pendientes or de_lotes:
+        print(
+            f"♻️ Cola recuperada: {len(pendientes)} trabajo(s) reencolado(s), "
+            f"{de_lotes} de lotes pendientes, {interrumpidos} interrumpido(s)"
+        )
+
+
+def _enviar(trabajo_id, forzar, acotado=True):
+    with _activos_lock:
+        # El plazo empieza a correr cuando el trabajo sale de la cola
+        _plazos[trabajo_id] = Plazo(fin=float("inf"))
+        try:
+            futuro = _executor.enviar(procesar_trabajo, trabajo_id, forzar, acotado=acotado)
+        except Saturado:
+            del _plazos[trabajo_id]
+            raise
+        _futuros[trabajo_id] = futuro
+    # Se registra después del callback del ejecutor: al correr, el cupo ya se liberó
+    futuro.add_done_callback(lambda _: _al_salir(trabajo_id))
+
+
+def _al_salir(trabajo_id):
+    """El trabajo terminó o se descartó: su lugar pasa al siguiente de los lotes."""
+    with _lote_lock:
+        _lote_enviados.discard(trabajo_id)
+    try:
+        alimentar_lotes()
+    except Exception as e:
+        logging.error(f"Cola - No se pudo continuar con los lotes: {e}")
+
+
+def cancelar_trabajo(trabajo_id):
+    """
+    Cancela un trabajo aceptado (p. ej. el cliente que lo esperaba se
+    desconectó). Si aún no empezó se descarta; si ya está consultando se
+    agota su plazo y termina en cuanto el paso en curso lo note.
+    Retorna ``False`` si el trabajo ya había terminado.
+    """
+    with _activos_lock:
+        futuro = _futuros.get(trabajo_id)
+        plazo = _plazos.get(trabajo_id)
+    if futuro is None:
+        return False
+
+    if futuro.cancel():
+        with _activos_lock:
+            _futuros.pop(trabajo_id, None)
+            _plazos.pop(trabajo_id, None)
+        actualizar_trabajo(trabajo_id, estado=Trabajo.ERROR, etapa="Cancelado", error=CANCELADA)
+        publicar(trabajo_id.hex, "fin", estado=Trabajo.ERROR, error=CANCELADA)
+        TRABAJOS_TOTAL.inc("cancelado")
+    elif plazo is not None:
+        plazo.cancelar()
+    print(f"🛑 Trabajo {trabajo_id} cancelado por el cliente")
+    return True
+
+
+def procesar_trabajo(trabajo_id, forzar=False):
+    close_old_connections()
+    with _activos_lock:
+        plazo = _plazos.get(trabajo_id) or Plazo(fin=float("inf"))
+    plazo.fin = time.monotonic() + PLAZO_TRABAJO
+    TRABAJOS_EN_CURSO.inc()
+    inicio_trabajo = time.perf_counter()
+    estado = Trabajo.ERROR
+    try:
+        trabajo = Trabajo.objects.get(pk=trabajo_id)
+        numero_doc = trabajo.numero_documento
+        carpeta = carpeta_trabajo(CARPETA_DESCARGAS, trabajo_id.hex, numero_doc, trabajo.creado)
+        actualizar_trabajo(
+            trabajo_id,
+            estado=Trabajo.EN_PROCESO,
+            etapa="Consultando portales",
+            carpeta=ruta_relativa(carpeta),
+        )
+
+        def al_avanzar(pagina, completados, total):
+            actualizar_trabajo(
+                trabajo_id,
+                etapa=f"Portal {pagina} finalizado ({completados}/{total})",
+                progreso=int(completados * 90 / total),
+            )
+
+        inicio = time.time()
+        resultado = ejecutar_consulta(
+            numero_doc, trabajo_id=trabajo_id.hex, al_avanzar=al_avanzar,
+            forzar=forzar, carpeta=carpeta, plazo=plazo,
+        )
+        duracion = time.time() - inicio
+        if plazo.cancelado:
+            raise RuntimeError(CANCELADA)
+
+        actualizar_trabajo(trabajo_id, etapa="Generando informe PDF", progreso=90)
+        with tramo("informe_consulta", trabajo=trabajo_id.hex):
+            url_pdf = generar_informe_consulta(numero_doc, resultado, duracion)
+
+        final = {
+            "tiempo": f"{duracion:.2f} segundos",
+            "informe_pdf": url_pdf,
+            "recursos_bloqueados": resumen_bloqueos(resultado.get("datos", {})),
+            "portales_no_disponibles": {
+                pagina: datos["no_disponible"]
+                for pagina, datos in resultado.get("datos", {}).items()
+                if datos.get("no_disponible")
+            },
+        }
+        actualizar_trabajo(
+            trabajo_id,
+            estado=Trabajo.COMPLETADO,
+            etapa="Completado",
+            progreso=100,
+            resultado=final,
+        )
+        estado = Trabajo.COMPLETADO
+        publicar(trabajo_id.hex, "fin", estado=estado, **final)
+
+    except Exception as e:
+        print("🧨 ERROR EN procesar_trabajo():", traceback.format_exc())
+        logging.error(f"Trabajo {trabajo_id} - Error: {e}")
+        actualizar_trabajo(trabajo_id, estado=Trabajo.ERROR, etapa="Error", error=str(e))
+        publicar(trabajo_id.hex, "fin", estado=Trabajo.ERROR, error=str(e))
+
+    finally:
+        with _activos_lock:
+            _futuros.pop(trabajo_id, None)
+            _plazos.pop(trabajo_id, None)
+        TRABAJOS_EN_CURSO.dec()
+        TRABAJOS_TOTAL.inc(estado)
+        TRABAJO_SEGUNDOS.observar(valor=time.perf_counter() - inicio_trabajo)
+        close_old_connections()
@@ -0,0 +1,132 @@
+import os
+import uuid
+import threading
+
+from django.conf import settings
+
+from .almacen import carpeta_trabajo, guardar_blob, guardar_manifiesto
+from .eventos import publicar
+
+
+# ===================================================
+# 🧾 CONTEXTO DE TRABAJO
+# ===================================================
+
+class ContextoTrabajo:
+    """
+    Estado de una consulta en curso: documento, carpeta propia y
+    artefactos generados. Reemplaza las variables globales del módulo
+    para que varias consultas puedan correr a la vez.
+    """
+
+    def __init__(self, numero_documento, carpeta_base, trabajo_id=None, carpeta=None):
+        self.id = trabajo_id or uuid.uuid4().hex
+        # Solo los trabajos de la cola tienen quien escuche sus eventos
+        self.canal = trabajo_id
+        self.numero_documento = str(numero_documento)
+        self.carpeta_base = carpeta_base
+        self.carpeta = carpeta or carpeta_trabajo(carpeta_base, self.id, self.numero_documento)
+        self.capturas = []
+        self.archivos = []
+        self.por_portal = {}
+        self.hashes = {}
+        self.contenidos = {}
+        self.datos = {}
+        self.pendientes = []
+        self._lock = threading.Lock()
+        os.makedirs(self.carpeta, exist_ok=True)
+
+    def carpeta_descargas(self, pagina):
+        """Carpeta de descargas exclusiva de un portal dentro del trabajo."""
+        carpeta = os.path.join(self.carpeta, pagina)
+        os.makedirs(carpeta, exist_ok=True)
+        return carpeta
+
+    def agregar_captura(self, pagina, ruta):
+        with self._lock:
+            self.capturas.append(ruta)
+            self._portal(pagina)["capturas"].append(ruta)
+        self._avisar_artefacto(pagina, "captura", ruta)
+
+    def agregar_archivo(self, pagina, ruta):
+        with self._lock:
+            self.archivos.append(ruta)
+            self._portal(pagina)["archivos"].append(ruta)
+        self._avisar_artefacto(pagina, "archivo", ruta)
+
+    def agregar_dato(self, pagina, clave, valor):
+        """Guarda un dato extraído del portal (p. ej. el texto del resultado)."""
+        with self._lock:
+            self.datos.setdefault(pagina, {})[clave] = valor
+
+    def artefactos_portal(self, pagina):
+        with self._lock:
+            datos = self._portal(pagina)
+            return list(datos["capturas"]), list(datos["archivos"])
+
+    def registrar_hash(self, digest, ruta):
+        """Registra el hash de un archivo; si ya existía retorna la ruta previa."""
+        with self._lock:
+            existente = self.hashes.get(digest)
+            if existente is None:
+                self.hashes[digest] = ruta
+            return existente
+
+    def registrar_pendiente(self, futuro):
+        with self._lock:
+            self.pendientes.append(futuro)
+
+    def esperar_pendientes(self):
+        """Espera las escrituras en segundo plano (capturas) del trabajo."""
+        with self._lock:
+            pendientes, self.pendientes = self.pendientes, []
+        for futuro in pendientes:
+            futuro.result()
+
+    def consolidar(self, pagina):
+        """
+        Pasa los artefactos propios del portal al almacén por contenido
+        (los de la caché ya viven fuera de la carpeta del trabajo).
+        """
+        capturas, archivos = self.artefactos_portal(pagina)
+        for ruta in capturas + archivos:
+            if ruta in self.contenidos or not ruta.startswith(self.carpeta + os.sep):
+                continue
+            if os.path.isfile(ruta):
+                digest = guardar_blob(self.carpeta_base, ruta)
+                with self._lock:
+                    self.contenidos[ruta] = digest
+
+    def guardar_manifiesto(self):
+        """Escribe ``manifiesto.json`` con los artefactos de cada portal."""
+        with self._lock:
+            portales = {
+                pagina: {"capturas": list(d["capturas"]), "archivos": list(d["archivos"])}
+                for pagina, d in self.por_portal.items()
+            }
+            contenidos = dict(self.contenidos)
+        guardar_manifiesto(self.carpeta, self.numero_documento, portales, contenidos)
+
+    def _avisar_artefacto(self, pagina, tipo, ruta):
+        """El cliente puede mostrar el artefacto apenas está en disco."""
+        publicar(self.canal, "artefacto", portal=pagina, tipo=tipo,
+                 nombre=os.path.basename(ruta), url=url_media(ruta))
+
+    def _portal(self, pagina):
+        return self.por_portal.setdefault(pagina, {"capturas": [], "archivos": []})
+
+    def resultado(self):
+        with self._lock:
+            return {
+                "trabajo": self.id,
+                "carpeta": self.carpeta,
+                "capturas": list(self.capturas),
+                "archivos": list(self.archivos),
+                "datos": dict(self.datos),
+            }
+
+
+def url_media(ruta):
+    """Convierte una ruta dentro de MEDIA_ROOT en su URL pública."""
+    relativa = os.path.relpath(ruta, settings.MEDIA_ROOT).replace(os.sep, "/")
+    return f"{settings.MEDIA_URL}{relativa}"
@@ -0,0 +1,274 @@
+import json
+import logging
+import threading
+import urllib.request
+
+import websocket
+from selenium import webdriver
+from selenium.webdriver.chromium.remote_connection import ChromiumRemoteConnection
+from selenium.webdriver.remote.command import Command
+from django.conf import settings
+
+from .esperas import SCRIPT_MONITOR_RED
+from .memoria import gobernador, pid_driver, rss_arbol
+from .metricas import tramo
+from .navegadores import (
+    CARPETA_DESCARGAS, POOL_MAX_USOS, POOL_TIMEOUT, PoolNavegadores, configurar_descargas, crear_driver,
+)
+from .recursos import activar_registro, leer_bloqueos
+
+
+# ===================================================
+# 🧩 CONTEXTOS AISLADOS EN UN SOLO CHROME
+# ===================================================
+#
+# Con CIVI_CONTEXTOS = True un único Chrome (y un único chromedriver)
+# atiende a todos los trabajos: cada driver que entrega el pool es una
+# sesión de Selenium enganchada por ``debuggerAddress`` a una pestaña de
+# su propio contexto de navegación (Target.createBrowserContext), con
+# cookies, almacenamiento, caché y carpeta de descargas separados. Un
+# contexto cuesta un proceso de render, no un navegador completo.
+#
+# Al devolverse al pool el contexto se descarta y se crea uno nuevo en
+# la misma sesión: es más barato que limpiar cookies y almacenamiento
+# origen por origen, y no queda nada del trabajo anterior.
+
+CONTEXTOS_TAMANO = getattr(settings, "CIVI_CONTEXTOS_TAMANO", 8)
+CONTEXTOS_MAX_USOS = getattr(settings, "CIVI_CONTEXTOS_MAX_USOS", POOL_MAX_USOS)
+CONTEXTOS_MAX_MB = getattr(settings, "CIVI_CONTEXTOS_MAX_MB", 2048)
+CONTEXTO_ESTIMADO_MB = 80  # un proceso de render, no un navegador completo
+CDP_TIMEOUT = 30
+
+ANCHO, ALTO = 1920, 1080
+
+
+class ClienteCDP:
+    """Conexión DevTools al navegador (no a una pestaña), para los comandos ``Target.*``."""
+
+    def __init__(self, url_ws):
+        # Sin cabecera Origin: Chrome rechaza orígenes no permitidos
+        self._ws = websocket.create_connection(url_ws, timeout=CDP_TIMEOUT, suppress_origin=True)
+        self._siguiente_id = 1
+        self._lock = threading.Lock()
+
+    def enviar(self, metodo, **parametros):
+        with self._lock:
+            id_mensaje = self._siguiente_id
+            self._siguiente_id += 1
+            self._ws.send(json.dumps({"id": id_mensaje, "method": metodo, "params": parametros}))
+            while True:
+                respuesta = json.loads(self._ws.recv())
+                if respuesta.get("id") != id_mensaje:
+                    continue  # eventos: no se usan
+                if "error" in respuesta:
+                    raise RuntimeError(f"{metodo}: {respuesta['error'].get('message')}")
+                return respuesta.get("result", {})
+
+    def cerrar(self):
+        try:
+            self._ws.close()
+        except Exception:
+            pass
+
+
+class DriverContexto(webdriver.Remote):
+    """Sesión enganchada a un Chrome existente; expone lo que usa el resto del código."""
+
+    def get_log(self, log_type):
+        return self.execute(Command.GET_LOG, {"type": log_type})["value"]
+
+
+class ChromeCompartido:
+    """
+    El Chrome de fondo: lo arranca una sesión normal de chromedriver
+    (``anfitrion``) y las sesiones de cada contexto se crean en ese
+    mismo chromedriver. Si el navegador muere se vuelve a arrancar al
+    pedir el siguiente contexto.
+
+    Los contextos no tienen procesos propios que el gobernador pueda
+    medir o matar: se recicla el Chrome entero cuando pasa
+    ``CIVI_CONTEXTOS_MAX_MB`` y ningún contexto está prestado. Los
+    contextos libres quedan muertos y el pool los descarta al revisarlos.
+    """
+
+    def __init__(self, fabrica=crear_driver):
+        self._fabrica = fabrica
+        self.anfitrion = None
+        self.cdp = None
+        self.direccion = None
+        self.contextos = {}  # id(driver) -> (contexto, pestaña); se modifica con ``_lock``
+        self.prestados = 0
+        self._lock = threading.Lock()
+
+    # ---------- navegador ----------
+
+    def asegurar(self):
+        with self._lock:
+            if self.anfitrion is not None and PoolNavegadores._esta_sano(self.anfitrion):
+                return
+            self._detener()
+            with tramo("arranque_driver"):
+                self.anfitrion = self._fabrica(CARPETA_DESCARGAS)
+            gobernador.registrar(self.anfitrion)  # su árbol incluye todos los contextos
+            self.direccion = self.anfitrion.capabilities["goog:chromeOptions"]["debuggerAddress"]
+            with urllib.request.urlopen(f"http://{self.direccion}/json/version", timeout=CDP_TIMEOUT) as r:
+                self.cdp = ClienteCDP(json.load(r)["webSocketDebuggerUrl"])
+            print(f"🚀 Chrome compartido en {self.direccion} (contextos aislados)")
+
+    def cerrar(self):
+        with self._lock:
+            self._detener()
+
+    def prestar(self):
+        with self._lock:
+            self.prestados += 1
+
+    def devolver(self):
+        """Fin de un préstamo; sin préstamos, recicla el navegador si pasó su límite de memoria."""
+        with self._lock:
+            self.prestados -= 1
+            if self.prestados or self.anfitrion is None:
+                return
+            usado = rss_arbol(pid_driver(self.anfitrion))
+            if usado <= CONTEXTOS_MAX_MB * 1024 * 1024:
+                return
+            print(f"🧠 Chrome compartido reciclado por memoria ({usado // 1048576} MB)")
+            gobernador.contar_reciclado("memoria_compartido")
+            self._detener()
+
+    def _detener(self):
+        if self.cdp is not None:
+            self.cdp.cerrar()
+        if self.anfitrion is not None:
+            gobernador.olvidar(self.anfitrion)
+            gobernador.cerrar_driver(self.anfitrion)
+        self.anfitrion = self.cdp = self.direccion = None
+        self.contextos.clear()
+
+    # ---------- contextos ----------
+
+    def cantidad_contextos(self):
+        with self._lock:
+            return len(self.contextos)
+
+    def abrir(self, carpeta, estrategia="normal"):
+        """Nuevo contexto con su pestaña y una sesión de Selenium enganchada a ella."""
+        self.asegurar()
+        opciones = webdriver.ChromeOptions()
+        opciones.debugger_address = self.direccion
+        opciones.page_load_strategy = estrategia
+        activar_registro(opciones)
+        conexion = ChromiumRemoteConnection(
+            remote_server_addr=self.anfitrion.service.service_url,
+            vendor_prefix="goog", browser_name="chrome",
+        )
+        driver = DriverContexto(command_executor=conexion, options=opciones)
+        try:
+            self._nueva_pestana(driver, carpeta)
+        except Exception:
+            driver.quit()
+            raise
+        return driver
+
+    def renovar(self, driver, carpeta):
+        """Descarta el contexto del driver y lo pasa a uno nuevo, en la misma sesión."""
+        self.descartar(driver)
+        self._nueva_pestana(driver, carpeta)
+
+    def descartar(self, driver):
+        with self._lock:
+            contexto, _ = self.contextos.pop(id(driver), (None, None))
+            cdp = self.cdp
+        if contexto is not None and cdp is not None:
+            try:
+                # Cierra también sus pestañas y borra cookies, almacenamiento y caché
+                cdp.enviar("Target.disposeBrowserContext", browserContextId=contexto)
+            except Exception as e:
+                logging.warning(f"Contextos - No se pudo descartar el contexto {contexto}: {e}")
+
+    def _nueva_pestana(self, driver, carpeta):
+        with self._lock:
+            cdp = self.cdp
+        if cdp is None:
+            raise RuntimeError("El Chrome compartido no está disponible")
+        contexto = cdp.enviar("Target.createBrowserContext", disposeOnDetach=False)["browserContextId"]
+        try:
+            cdp.enviar(
+                "Browser.setDownloadBehavior", behavior="allow",
+                downloadPath=carpeta, browserContextId=contexto,
+            )
+            pestana = cdp.enviar(
+                "Target.createTarget", url="about:blank", browserContextId=contexto,
+                width=ANCHO, height=ALTO,
+            )["targetId"]
+        except Exception:
+            cdp.enviar("Target.disposeBrowserContext", browserContextId=contexto)
+            raise
+        with self._lock:
+            self.contextos[id(driver)] = (contexto, pestana)
+
+        # La sesión ve las pestañas de todos los contextos: se fija en la suya
+        handle = next(h for h in driver.window_handles if h.endswith(pestana))
+        driver.switch_to.window(handle)
+        driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": SCRIPT_MONITOR_RED})
+        configurar_descargas(driver, carpeta)
+
+
+class PoolContextos(PoolNavegadores):
+    """
+    ``PoolNavegadores`` cuyos drivers son contextos del Chrome compartido.
+    Entrega, revisa y limita igual que el pool de procesos; solo cambia
+    cómo se crea, se limpia y se cierra cada driver.
+    """
+
+    def __init__(self, compartido, estrategia="normal", tamano=CONTEXTOS_TAMANO,
+                 max_usos=CONTEXTOS_MAX_USOS, carpeta_descarga=CARPETA_DESCARGAS, cupo=None):
+        super().__init__(
+            tamano=tamano, max_usos=max_usos, carpeta_descarga=carpeta_descarga,
+            fabrica=lambda carpeta: compartido.abrir(carpeta, estrategia), cupo=cupo,
+        )
+        self.compartido = compartido
+
+    def adquirir(self, timeout=POOL_TIMEOUT):
+        # Se cuenta antes de sacar el driver: el Chrome no se recicla mientras tanto
+        self.compartido.prestar()
+        try:
+            return super().adquirir(timeout)
+        except Exception:
+            self.compartido.devolver()
+            raise
+
+    def liberar(self, driver, descartar=False):
+        try:
+            super().liberar(driver, descartar)
+        finally:
+            self.compartido.devolver()
+
+    def estadisticas(self):
+        datos = super().estadisticas()
+        datos["contextos"] = self.compartido.cantidad_contextos()
+        return datos
+
+    def _cabe_otro(self):
+        # El Chrome compartido ya cuenta en el total; cada contexto suma poco
+        return gobernador.admite_nuevo(CONTEXTO_ESTIMADO_MB, promedio=False) and self._reservar_cupo()
+
+    def _destruir(self, driver):
+        self.compartido.descartar(driver)
+        super()._destruir(driver)  # en modo enganchado ``quit`` no cierra Chrome
+
+    def _reiniciar(self, driver):
+        self.compartido.renovar(driver, self.carpeta_descarga)
+        leer_bloqueos(driver)  # Descarta lo que quedó en el registro de red
+
+
+_compartido = None
+_compartido_lock = threading.Lock()
+
+
+def obtener_compartido():
+    global _compartido
+    with _compartido_lock:
+        if _compartido is None:
+            _compartido = ChromeCompartido()
+        return _compartido
@@ -0,0 +1,127 @@
+import os
+import time
+import errno
+import ctypes
+import select
+import logging
+import ctypes.util
+
+
+# ===================================================
+# 📥 DETECCIÓN DE DESCARGAS POR TRABAJO
+# ===================================================
+#
+# Chrome escribe primero un archivo parcial (``.crdownload``) y lo
+# renombra al terminar. En Linux se usa inotify para despertar apenas
+# cambia la carpeta; en otros sistemas se revisa cada ``INTERVALO_SONDEO``.
+
+SUFIJOS_PARCIALES = (".crdownload", ".part", ".partial", ".download", ".tmp")
+INTERVALO_SONDEO = 0.2
+
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_NONBLOCK = getattr(os, "O_NONBLOCK", 0)
+_IN_CLOEXEC = getattr(os, "O_CLOEXEC", 0)
+
+_libc = None
+if hasattr(select, "poll") and ctypes.util.find_library("c"):
+    try:
+        _libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        _libc.inotify_init1
+    except (OSError, AttributeError):
+        _libc = None
+
+
+def es_parcial(nombre):
+    return nombre.startswith(".") or nombre.lower().endswith(SUFIJOS_PARCIALES)
+
+
+class VigilanteCarpeta:
+    """Espera cambios en una carpeta con inotify o, si no está disponible, sondeando."""
+
+    def __init__(self, carpeta):
+        self.fd = None
+        if _libc is None:
+            return
+
+        fd = _libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if fd < 0:
+            logging.warning(f"inotify no disponible: {os.strerror(ctypes.get_errno())}")
+            return
+
+        mascara = _IN_CREATE | _IN_MOVED_TO | _IN_CLOSE_WRITE
+        if _libc.inotify_add_watch(fd, os.fsencode(carpeta), mascara) < 0:
+            logging.warning(f"inotify no pudo vigilar {carpeta}: {os.strerror(ctypes.get_errno())}")
+            os.close(fd)
+            return
+
+        self.fd = fd
+        self._poll = select.poll()
+        self._poll.register(fd, select.POLLIN)
+
+    def esperar(self, segundos):
+        """Bloquea hasta que haya un cambio en la carpeta o pasen ``segundos``."""
+        if self.fd is None:
+            time.sleep(min(segundos, INTERVALO_SONDEO))
+            return
+
+        if self._poll.poll(max(segundos, 0) * 1000):
+            try:
+                # Solo interesa despertar; se vacía el buffer de eventos
+                while os.read(self.fd, 4096):
+                    pass
+            except OSError as e:
+                if e.errno != errno.EAGAIN:
+                    raise
+
+    def cerrar(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+
+def escanear(carpeta, ignorar=()):
+    """Devuelve (completos, parciales) presentes en la carpeta, sin los de ``ignorar``."""
+    completos, parciales = [], []
+    with os.scandir(carpeta) as entradas:
+        for entrada in entradas:
+            if not entrada.is_file() or entrada.path in ignorar:
+                continue
+            (parciales if es_parcial(entrada.name) else completos).append(entrada.path)
+    return completos, parciales
+
+
+def esperar_descarga(carpeta, ignorar=(), timeout=15, gracia=3):
+    """
+    Espera a que termine una descarga en ``carpeta`` y retorna su ruta.
+
+    Retorna ``None`` si no aparece ningún archivo (ni parcial) durante
+    ``gracia`` segundos, o si la descarga no termina antes de ``timeout``.
+    """
+    inicio = time.monotonic()
+    fin = inicio + timeout
+
+    with VigilanteCarpeta(carpeta) as vigilante:
+        while True:
+            completos, parciales = escanear(carpeta, ignorar)
+            if completos and not parciales:
+                return max(completos, key=os.path.getmtime)
+
+            ahora = time.monotonic()
+            if not completos and not parciales and ahora - inicio >= gracia:
+                logging.info(f"Sin descargas iniciadas en {carpeta} tras {gracia}s")
+                return None
+            if ahora >= fin:
+                if parciales:
+                    logging.warning(f"Descarga incompleta en {carpeta}: {parciales}")
+                return None
+
+            limite = fin if (completos or parciales) else min(fin, inicio + gracia)
+            vigilante.esperar(limite - ahora)
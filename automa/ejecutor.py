@@ -0,0 +1,112 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .metricas import Medidor
+
+
+# ===================================================
+# 🚦 EJECUTOR ACOTADO (CON CONTRAPRESIÓN)
+# ===================================================
+#
+# ThreadPoolExecutor con un máximo de tareas pendientes (en cola + en
+# curso). Cuando está lleno, ``enviar`` lanza ``Saturado`` con una
+# estimación de cuándo reintentar, y las vistas responden 429 con
+# Retry-After en lugar de acumular trabajo sin límite.
+
+class Saturado(Exception):
+    def __init__(self, reintentar_en):
+        super().__init__(f"Sin cupo; reintentar en {reintentar_en}s")
+        self.reintentar_en = reintentar_en
+
+
+class EjecutorAcotado:
+    def __init__(self, max_workers, max_pendientes, nombre="civi"):
+        self.max_workers = max_workers
+        self.max_pendientes = max_pendientes
+        self.nombre = nombre
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=nombre)
+        self._pendientes = 0
+        self._en_curso = 0
+        self._duracion_media = None
+        self._lock = threading.Lock()
+        EJECUTORES.append(self)
+
+    def enviar(self, funcion, *args, acotado=True, **kwargs):
+        """
+        Envía la tarea y retorna su ``Future``. Con ``acotado=False`` se
+        admite aunque no haya cupo (p. ej. los documentos de un lote ya
+        aceptado), pero igual cuenta como pendiente.
+        """
+        with self._lock:
+            if acotado and self._pendientes >= self.max_pendientes:
+                raise Saturado(self._estimar_espera())
+            self._pendientes += 1
+
+        try:
+            futuro = self._executor.submit(self._correr, funcion, *args, **kwargs)
+        except BaseException:
+            with self._lock:
+                self._pendientes -= 1
+            raise
+        futuro.add_done_callback(self._al_terminar)
+        return futuro
+
+    def libres(self):
+        with self._lock:
+            return max(0, self.max_pendientes - self._pendientes)
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "max_pendientes": self.max_pendientes,
+                "pendientes": self._pendientes,
+                "en_curso": self._en_curso,
+                "duracion_media": round(self._duracion_media or 0, 2),
+            }
+
+    # ---------- utilitarios internos ----------
+
+    def _correr(self, funcion, *args, **kwargs):
+        inicio = time.monotonic()
+        with self._lock:
+            self._en_curso += 1
+        try:
+            return funcion(*args, **kwargs)
+        finally:
+            duracion = time.monotonic() - inicio
+            with self._lock:
+                self._en_curso -= 1
+                # Media móvil exponencial para estimar el Retry-After
+                if self._duracion_media is None:
+                    self._duracion_media = duracion
+                else:
+                    self._duracion_media = 0.8 * self._duracion_media + 0.2 * duracion
+
+    def _al_terminar(self, futuro):
+        with self._lock:
+            self._pendientes -= 1
+
+    def _estimar_espera(self):
+        """Segundos hasta que se libere un cupo, según la duración media de las tareas."""
+        media = self._duracion_media or 30
+        return max(1, int(media * max(1, self._pendientes - self.max_pendientes + 1) / self.max_workers))
+
+
+EJECUTORES = []
+
+
+def _estado_ejecutores():
+    estado = {}
+    for ejecutor in list(EJECUTORES):
+        datos = ejecutor.estadisticas()
+        estado[(ejecutor.nombre, "pendientes")] = datos["pendientes"]
+        estado[(ejecutor.nombre, "en_curso")] = datos["en_curso"]
+    return estado
+
+
+EJECUTOR_TAREAS = Medidor(
+    "civi_ejecutor_tareas", "Tareas por ejecutor (pendientes incluye las en curso)",
+    ("ejecutor", "estado"), funcion=_estado_ejecutores,
+)
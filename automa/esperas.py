@@ -0,0 +1,183 @@
+import time
+import logging
+from contextlib import contextmanager
+
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
+
+from .plazo import SIN_LIMITE
+
+
+# ===================================================
+# ⏱️ MOTOR DE ESPERAS POR CONDICIÓN
+# ===================================================
+#
+# Cada evento de ``paginas`` puede declarar en "esperar" la lista de
+# condiciones que indican que terminó, por ejemplo:
+#
+#     {"tipo": "click", "selector": "...",
+#      "esperar": [{"tipo": "cambio_url"}, {"tipo": "red_inactiva", "ms": 500}]}
+#
+# Tipos soportados:
+#   visible      -> el elemento "selector" es visible
+#   oculto       -> el elemento "selector" desaparece o se oculta
+#   dom_quieto   -> el DOM no cambia durante "ms" milisegundos
+#   red_inactiva -> sin peticiones fetch/XHR pendientes durante "ms" milisegundos
+#   cambio_url   -> la URL cambia respecto a la de antes del evento
+#   retraso      -> pausa fija de "valor" segundos (último recurso)
+#
+# Todas aceptan "timeout" (segundos), que se recorta a lo que quede del
+# plazo del trabajo. Vencer el timeout no es un error: se registra en el
+# log y la ejecución continúa.
+
+TIMEOUT_CONDICION = 10
+
+# Condiciones usadas cuando el evento no declara "esperar"
+ESPERAS_POR_DEFECTO = {
+    "click": [{"tipo": "dom_quieto", "ms": 300}],
+    "espera_y_click": [{"tipo": "dom_quieto", "ms": 300}],
+    "escribir": [{"tipo": "dom_quieto", "ms": 150}],
+    "teclado": [{"tipo": "red_inactiva", "ms": 500}],
+}
+
+# Se instala en cada documento nuevo (ver navegadores.crear_driver) y
+# lleva la cuenta de peticiones fetch/XHR en curso.
+SCRIPT_MONITOR_RED = """
+(() => {
+    if (window.__civiPendientes !== undefined) return;
+    window.__civiPendientes = 0;
+    window.__civiUltimaRed = Date.now();
+    const marcar = (delta) => {
+        window.__civiPendientes = Math.max(0, window.__civiPendientes + delta);
+        window.__civiUltimaRed = Date.now();
+    };
+    const fetchOriginal = window.fetch;
+    if (fetchOriginal) {
+        window.fetch = function () {
+            marcar(1);
+            return fetchOriginal.apply(this, arguments).finally(() => marcar(-1));
+        };
+    }
+    const sendOriginal = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        marcar(1);
+        this.addEventListener("loadend", () => marcar(-1), {once: true});
+        return sendOriginal.apply(this, arguments);
+    };
+})();
+"""
+
+_SCRIPT_DOM_QUIETO = """
+const [ms, limite, listo] = [arguments[0], arguments[1], arguments[arguments.length - 1]];
+const inicio = Date.now();
+let ultimo = Date.now();
+const observer = new MutationObserver(() => { ultimo = Date.now(); });
+observer.observe(document, {childList: true, subtree: true, attributes: true, characterData: true});
+const revisar = () => {
+    const ahora = Date.now();
+    if (ahora - ultimo >= ms || ahora - inicio >= limite) {
+        observer.disconnect();
+        listo(ahora - ultimo >= ms);
+    } else {
+        setTimeout(revisar, 50);
+    }
+};
+setTimeout(revisar, 50);
+"""
+
+_SCRIPT_RED_INACTIVA = """
+const [ms, limite, listo] = [arguments[0], arguments[1], arguments[arguments.length - 1]];
+const inicio = Date.now();
+let recursos = performance.getEntriesByType("resource").length;
+let ultimo = Date.now();
+const revisar = () => {
+    const ahora = Date.now();
+    const actuales = performance.getEntriesByType("resource").length;
+    if (actuales !== recursos) { recursos = actuales; ultimo = ahora; }
+    if (window.__civiUltimaRed) { ultimo = Math.max(ultimo, window.__civiUltimaRed); }
+    const inactiva = document.readyState === "complete"
+        && !window.__civiPendientes
+        && ahora - ultimo >= ms;
+    if (inactiva || ahora - inicio >= limite) {
+        listo(inactiva);
+    } else {
+        setTimeout(revisar, 50);
+    }
+};
+revisar();
+"""
+
+_SCRIPT_CUADRO_PINTADO = """
+const listo = arguments[arguments.length - 1];
+requestAnimationFrame(() => requestAnimationFrame(() => listo(true)));
+"""
+
+
+def metodo_selector(selector):
+    return By.XPATH if selector.startswith("//") else By.CSS_SELECTOR
+
+
+def esperar_condicion(driver, condicion, url_antes=None, pagina="", plazo=SIN_LIMITE):
+    tipo = condicion["tipo"]
+    timeout = plazo.limitar(condicion.get("timeout", TIMEOUT_CONDICION))
+    ms = condicion.get("ms", 300)
+
+    if timeout <= 0:
+        logging.warning(f"{pagina} - Espera '{tipo}' omitida: plazo agotado")
+        return
+
+    try:
+        if tipo == "visible":
+            selector = condicion["selector"]
+            WebDriverWait(driver, timeout).until(
+                EC.visibility_of_element_located((metodo_selector(selector), selector))
+            )
+
+        elif tipo == "oculto":
+            selector = condicion["selector"]
+            WebDriverWait(driver, timeout).until(
+                EC.invisibility_of_element_located((metodo_selector(selector), selector))
+            )
+
+        elif tipo in ("dom_quieto", "red_inactiva"):
+            script = _SCRIPT_DOM_QUIETO if tipo == "dom_quieto" else _SCRIPT_RED_INACTIVA
+            driver.set_script_timeout(timeout + 1)
+            if not driver.execute_async_script(script, ms, timeout * 1000):
+                raise TimeoutException(f"{tipo} ({ms} ms)")
+
+        elif tipo == "cambio_url":
+            WebDriverWait(driver, timeout).until(EC.url_changes(url_antes))
+
+        elif tipo == "retraso":
+            time.sleep(plazo.limitar(condicion["valor"]))
+
+        else:
+            logging.warning(f"{pagina} - Condición de espera desconocida: {tipo}")
+
+    except TimeoutException as e:
+        logging.warning(f"{pagina} - Espera '{tipo}' vencida tras {timeout}s: {e}")
+
+
+@contextmanager
+def esperar_tras(driver, condiciones, pagina="", plazo=SIN_LIMITE):
+    """
+    Ejecuta el bloque y luego espera las ``condiciones`` en orden.
+    La URL previa se guarda antes del bloque para ``cambio_url``.
+    """
+    condiciones = condiciones or []
+    url_antes = None
+    if any(c["tipo"] == "cambio_url" for c in condiciones):
+        url_antes = driver.current_url
+
+    yield
+
+    for condicion in condiciones:
+        esperar_condicion(driver, condicion, url_antes, pagina, plazo)
+
+
+def esperar_pintado(driver):
+    """Espera a que el navegador pinte el siguiente cuadro (dos requestAnimationFrame)."""
+    driver.set_script_timeout(5)
+    driver.execute_async_script(_SCRIPT_CUADRO_PINTADO)
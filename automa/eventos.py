@@ -0,0 +1,116 @@
+import time
+import asyncio
+import threading
+from collections import deque
+
+
+# ===================================================
+# 📡 BUS DE EVENTOS POR TRABAJO
+# ===================================================
+#
+# Los hilos que consultan los portales publican el avance del trabajo
+# (etapa, portal, paso, artefacto listo, fin) y las vistas SSE lo
+# reciben sin consultar la base de datos. Cada trabajo guarda sus
+# últimos eventos para que un cliente que se conecta tarde (o que se
+# reconecta con Last-Event-ID) no pierda lo ya ocurrido.
+#
+# El bus vive en memoria del proceso: la vista SSE debe servirse desde
+# el mismo proceso que corre la cola (runserver o un solo worker ASGI).
+
+HISTORIAL_MAX = 200
+RETENCION_TERMINADOS = 300  # segundos que se conserva un trabajo terminado
+INACTIVIDAD_MAX = 3600      # canal sin eventos ni clientes (su "fin" nunca llegó)
+FINALES = ("fin",)
+
+
+class CanalTrabajo:
+    def __init__(self):
+        self.historial = deque(maxlen=HISTORIAL_MAX)
+        self.suscriptores = set()
+        self.siguiente_id = 1
+        self.terminado_en = None
+        self.actualizado = time.monotonic()
+
+
+class Suscripcion:
+    """Cola asyncio de un cliente; los hilos publican con ``call_soon_threadsafe``."""
+
+    def __init__(self, trabajo_id, loop):
+        self.trabajo_id = trabajo_id
+        self.loop = loop
+        self.cola = asyncio.Queue()
+
+    def entregar(self, evento):
+        try:
+            self.loop.call_soon_threadsafe(self.cola.put_nowait, evento)
+        except RuntimeError:
+            # El loop del cliente ya cerró; se limpia al cancelar
+            pass
+
+    async def siguiente(self, timeout):
+        """Próximo evento o ``None`` si no llegó ninguno en ``timeout`` segundos."""
+        try:
+            return await asyncio.wait_for(self.cola.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+_canales = {}
+_lock = threading.Lock()
+
+
+def _canal(trabajo_id):
+    canal = _canales.get(trabajo_id)
+    if canal is None:
+        _purgar()
+        canal = _canales[trabajo_id] = CanalTrabajo()
+    return canal
+
+
+def _purgar():
+    ahora = time.monotonic()
+    for trabajo_id in [t for t, c in _canales.items() if not c.suscriptores and (
+        (c.terminado_en and c.terminado_en < ahora - RETENCION_TERMINADOS)
+        or c.actualizado < ahora - INACTIVIDAD_MAX
+    )]:
+        del _canales[trabajo_id]
+
+
+def publicar(trabajo_id, evento, /, **datos):
+    """Publica ``evento`` con ``datos`` para el trabajo; nunca bloquea al hilo que lo llama."""
+    if not trabajo_id:
+        return
+    with _lock:
+        canal = _canal(trabajo_id)
+        registro = {"id": canal.siguiente_id, "tipo": evento, "datos": datos}
+        canal.siguiente_id += 1
+        canal.actualizado = time.monotonic()
+        canal.historial.append(registro)
+        if evento in FINALES:
+            canal.terminado_en = time.monotonic()
+            _purgar()
+        suscriptores = list(canal.suscriptores)
+
+    for suscripcion in suscriptores:
+        suscripcion.entregar(registro)
+
+
+def suscribir(trabajo_id, desde=0):
+    """
+    Registra un cliente (desde una vista async) y retorna
+    ``(suscripcion, pendientes)`` con los eventos guardados cuyo id es
+    mayor que ``desde``.
+    """
+    suscripcion = Suscripcion(trabajo_id, asyncio.get_running_loop())
+    with _lock:
+        canal = _canal(trabajo_id)
+        canal.suscriptores.add(suscripcion)
+        pendientes = [e for e in canal.historial if e["id"] > desde]
+    return suscripcion, pendientes
+
+
+def cancelar(suscripcion):
+    with _lock:
+        canal = _canales.get(suscripcion.trabajo_id)
+        if canal is not None:
+            canal.suscriptores.discard(suscripcion)
@@ -0,0 +1,305 @@
+import os
+import tempfile
+
+from django.conf import settings
+
+from .almacen import _segmento, leer_manifiesto
+from .catalogo import registrar_artefacto, ruta_relativa
+from .models import Artefacto
+from .pdf_nativo import DocumentoPDF
+from .metricas import tramo
+from .pdf_union import unir_pdfs, unir_pdfs_en_flujo
+
+COMPRIMIR_PDF = getattr(settings, "CIVI_PDF_COMPRIMIR", True)
+
+
+# ==========================================================
+# 🖼️ Capturas específicas que se incluirán en el informe
+# ==========================================================
+CAPTURAS_INFORME = [
+    "ofac_final",
+    "contraloria_final",
+]
+
+
+def nombre_captura(ruta):
+    """Nombre del cuadro sin carpeta ni extensión (png, jpg o webp)."""
+    return os.path.splitext(os.path.basename(ruta))[0]
+
+
+# ==========================================================
+# 🧾 Informe PDF de una consulta
+# ==========================================================
+def construir_informe_consulta(numero_doc, resultado, duracion):
+    """Arma el ``DocumentoPDF`` del informe con las capturas seleccionadas."""
+    # 🔁 Filtrar solo las capturas deseadas que existan
+    capturas_seleccionadas = [
+        c for c in resultado.get("capturas", [])
+        if nombre_captura(c) in CAPTURAS_INFORME and os.path.exists(c)
+    ]
+
+    doc = DocumentoPDF()
+
+    # Título principal
+    doc.titulo(f"Informe de Consulta - {numero_doc}")
+    doc.parrafo(f"Duración: {duracion:.2f} segundos")
+
+    # Portales omitidos o caídos: el informe no debe parecer completo
+    for pagina, datos in resultado.get("datos", {}).items():
+        if datos.get("no_disponible"):
+            doc.titulo(f"{pagina.upper()} - PORTAL NO DISPONIBLE", tamano=13)
+            doc.parrafo(f"No se pudo consultar: {datos['no_disponible']}")
+
+    # Resultados en texto de los portales consultados por HTTP
+    for pagina, datos in resultado.get("datos", {}).items():
+        if datos.get("resultado"):
+            doc.titulo(pagina.upper(), tamano=13)
+            doc.parrafo(datos["resultado"])
+
+    # Solo agregar título de capturas si existen
+    if capturas_seleccionadas:
+        doc.parrafo("Capturas incluidas en este informe:")
+
+        for ruta in capturas_seleccionadas:
+            doc.agregar_pagina()
+            doc.titulo(os.path.basename(ruta), tamano=13)
+            doc.imagen(ruta)
+
+    return doc
+
+
+def generar_informe_consulta(numero_doc, resultado, duracion):
+    """
+    Construye el informe PDF de una consulta con las capturas
+    seleccionadas y devuelve su URL pública.
+    """
+    doc = construir_informe_consulta(numero_doc, resultado, duracion)
+
+    # 📂 Guardar el PDF en la carpeta del trabajo (dos trabajos del mismo
+    # documento no se pisan el informe)
+    carpeta_salida = resultado["carpeta"]
+    os.makedirs(carpeta_salida, exist_ok=True)
+    destino = os.path.join(carpeta_salida, f"informe_{_segmento(numero_doc)}.pdf")
+    with open(destino, "wb") as salida:
+        doc.guardar(salida)
+    registrar_artefacto(
+        destino, Artefacto.INFORME, numero_documento=numero_doc, trabajo_id=resultado.get("trabajo"),
+    )
+
+    # 🌐 URL pública del PDF generado
+    return settings.MEDIA_URL + ruta_relativa(destino)
+
+
+# ==========================================================
+# 📚 Informe completo (capturas + certificados descargados)
+# ==========================================================
+NOMBRE_BASE = "INFORME DE CONSULTAS"
+
+# Orden de las capturas en el informe completo
+ORDEN_CAPTURAS = [
+    "ofac_final",
+    "contraloria_final",
+    "rues_evento_2",
+    "rues_evento_5",
+    "rues_evento_7",
+    "rues_evento_9",
+    "rues_evento_10",
+    "rues_final"
+]
+
+EXTENSIONES_IMAGEN = (".png", ".jpg", ".jpeg")
+
+
+def numero_inicial(ruta):
+    """Dígitos con los que empieza el nombre del archivo ("" si no empieza por dígito)."""
+    nombre = os.path.splitext(os.path.basename(ruta))[0]
+    num = ""
+    for c in nombre:
+        if not c.isdigit():
+            break
+        num += c
+    return num
+
+
+def listar_artefactos(carpeta):
+    """Recorre la carpeta (y subcarpetas) y separa imágenes y PDFs."""
+    imagenes, pdfs = [], []
+    for raiz, _, nombres in os.walk(carpeta):
+        for nombre in nombres:
+            ruta = os.path.join(raiz, nombre)
+            if nombre.lower().endswith(EXTENSIONES_IMAGEN):
+                imagenes.append(ruta)
+            elif nombre.lower().endswith(".pdf"):
+                pdfs.append(ruta)
+    return imagenes, pdfs
+
+
+def generar_pdf_base(capturas, salida_pdf, orden=ORDEN_CAPTURAS):
+    """Informe con una página por captura, en el orden indicado."""
+    with tramo("informe_base"):
+        return _generar_pdf_base(capturas, salida_pdf, orden)
+
+
+def _generar_pdf_base(capturas, salida_pdf, orden):
+    por_nombre = {nombre_captura(r): r for r in capturas}
+    doc = DocumentoPDF(margen=36)
+    doc.titulo(NOMBRE_BASE)
+
+    for nombre in orden:
+        ruta = por_nombre.get(nombre)
+        if ruta is None:
+            continue
+
+        if doc.paginas and doc.paginas[-1]["imagenes"]:
+            doc.agregar_pagina()
+        doc.titulo(nombre.replace("_final", "").replace("_", " ").upper(), tamano=14)
+        try:
+            doc.imagen(ruta)
+        except Exception as e:
+            print(f"[ERROR] No se pudo insertar {ruta}: {e}")
+
+    with open(salida_pdf, "wb") as salida:
+        doc.guardar(salida)
+    print(f"[OK] PDF generado: {salida_pdf}")
+    return salida_pdf
+
+
+def artefactos_trabajo(carpeta):
+    """
+    Capturas y certificados PDF de un trabajo, tomados de su manifiesto.
+    Carpetas sin manifiesto (sueltas o anteriores) se recorren y los
+    PDFs se eligen por el número con que empieza el nombre.
+    """
+    manifiesto = leer_manifiesto(carpeta)
+    if manifiesto is None:
+        capturas, pdfs = listar_artefactos(carpeta)
+        return capturas, seleccionar_pdfs_numericos(pdfs)
+
+    capturas, pdfs = [], []
+    for portal in sorted(manifiesto):
+        datos = manifiesto[portal]
+        capturas += [r for r in datos.get("capturas", []) if os.path.exists(r)]
+        pdfs += [
+            r for r in datos.get("archivos", [])
+            if r.lower().endswith(".pdf") and os.path.exists(r)
+        ]
+    return capturas, pdfs
+
+
+def seleccionar_pdfs_numericos(pdfs):
+    """PDFs descargados cuyo nombre empieza por dígitos, ordenados por ese número."""
+    numericos = [
+        p for p in pdfs
+        if numero_inicial(p)
+        and not os.path.basename(p).startswith(NOMBRE_BASE)
+    ]
+    return sorted(numericos, key=lambda p: int(numero_inicial(p)))
+
+
+def combinar_pdfs(carpeta, pdf_base, pdfs_numericos, numero=None):
+    """Une el informe base con los certificados; retorna la ruta del PDF final."""
+    if not pdfs_numericos and numero is None:
+        print("No se encontraron PDFs numéricos.")
+        return None
+
+    numero = numero or numero_inicial(pdfs_numericos[0])
+    salida_final = os.path.join(carpeta, f"{NOMBRE_BASE}_{numero}.pdf")
+
+    # Unión en flujo: las páginas se escriben a medida que se leen
+    with tramo("union_pdf"):
+        unir_pdfs([pdf_base, *pdfs_numericos], salida_final, comprimir=COMPRIMIR_PDF)
+
+    print(f"[OK] PDF final generado: {salida_final}")
+    return salida_final
+
+
+def preparar_informe_completo(carpeta, numero=None):
+    """
+    Genera el PDF base de la carpeta y decide qué se va a combinar.
+    Retorna ``(pdf_base, pdfs_numericos, numero)`` o ``None`` si no hay
+    nada que combinar. El PDF base es temporal: quien lo combina lo borra.
+    """
+    capturas, pdfs_numericos = artefactos_trabajo(carpeta)
+    if not pdfs_numericos and numero is None:
+        print("No se encontraron PDFs numéricos.")
+        return None
+
+    descriptor, pdf_base = tempfile.mkstemp(prefix=f"{NOMBRE_BASE}_base_", suffix=".pdf", dir=carpeta)
+    os.close(descriptor)
+    try:
+        generar_pdf_base(capturas, pdf_base)
+    except Exception:
+        os.remove(pdf_base)
+        raise
+    # En el almacén la carpeta padre del trabajo es la del documento
+    numero = numero or numero_inicial(pdfs_numericos[0]) or os.path.basename(os.path.dirname(carpeta))
+    return pdf_base, pdfs_numericos, numero
+
+
+def trabajo_de_carpeta(carpeta):
+    """Id del trabajo dueño de la carpeta (la última parte de ``carpeta_trabajo``)."""
+    return os.path.basename(os.path.normpath(carpeta))
+
+
+def informe_completo_en_flujo(carpeta, numero=None):
+    """
+    Variante para descargas: retorna ``(nombre, trozos)`` donde ``trozos``
+    produce el PDF final por partes mientras se combina, de modo que el
+    navegador empieza a recibirlo sin esperar al archivo completo. La
+    copia en disco se publica y registra solo si el flujo termina.
+    Capturas y certificados se conservan (los borra la retención), así
+    que el informe se puede volver a generar completo.
+    """
+    preparado = preparar_informe_completo(carpeta, numero)
+    if preparado is None:
+        return None, None
+
+    pdf_base, pdfs_numericos, numero = preparado
+    salida_final = os.path.join(carpeta, f"{NOMBRE_BASE}_{numero}.pdf")
+
+    def trozos():
+        # La copia se escribe con otro nombre y solo se publica completa: si
+        # el cliente corta la descarga no queda un informe a medias
+        descriptor, parcial = tempfile.mkstemp(prefix=f"{NOMBRE_BASE}_", suffix=".parcial", dir=carpeta)
+        os.close(descriptor)
+        completo = False
+        try:
+            with tramo("union_pdf"):
+                yield from unir_pdfs_en_flujo(
+                    [pdf_base, *pdfs_numericos], copia=parcial, comprimir=COMPRIMIR_PDF
+                )
+            os.replace(parcial, salida_final)
+            completo = True
+        finally:
+            os.remove(pdf_base)
+            if not completo and os.path.exists(parcial):
+                os.remove(parcial)
+        print(f"[OK] PDF final generado: {salida_final}")
+        registrar_artefacto(
+            salida_final, Artefacto.INFORME, numero_documento=numero, trabajo_id=trabajo_de_carpeta(carpeta),
+        )
+
+    return os.path.basename(salida_final), trozos()
+
+
+def generar_informe_completo(carpeta, numero=None):
+    """
+    Genera el informe completo de una carpeta de trabajo: PDF con las
+    capturas más los certificados descargados. Retorna la ruta final
+    o ``None`` si no hay nada que combinar.
+    """
+    preparado = preparar_informe_completo(carpeta, numero)
+    if preparado is None:
+        return None
+
+    pdf_base, pdfs_numericos, numero = preparado
+    try:
+        archivo_final = combinar_pdfs(carpeta, pdf_base, pdfs_numericos, numero)
+    finally:
+        os.remove(pdf_base)
+    if archivo_final is None:
+        return None
+    registrar_artefacto(
+        archivo_final, Artefacto.INFORME, numero_documento=numero, trabajo_id=trabajo_de_carpeta(carpeta),
+    )
+    return archivo_final
@@ -0,0 +1,72 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from automa.simulados.benchmark import (
+    CARPETA_RESULTADOS, cargar_resultado, comparar, ejecutar_benchmark, guardar_resultado,
+)
+from automa.simulados.servidor import ServidorSimulado
+
+
+class Command(BaseCommand):
+    help = "Mide la consulta completa (portales + informe) contra los portales simulados."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--consultas", type=int, default=10, help="Consultas a ejecutar")
+        parser.add_argument("--concurrencia", type=int, default=2, help="Consultas simultáneas")
+        parser.add_argument("--latencia", type=int, default=200, help="Latencia simulada de los portales (ms)")
+        parser.add_argument("--sin-informe", action="store_true", help="No generar el informe PDF")
+        parser.add_argument("--etiqueta", default="", help="Nombre de la corrida (p. ej. la rama)")
+        parser.add_argument("--comparar", nargs="?", const="ultimo", default=None,
+                            help="Comparar con una corrida guardada (por defecto la última)")
+        parser.add_argument("--carpeta", default=CARPETA_RESULTADOS, help="Dónde guardar los resultados")
+        parser.add_argument("--conservar", action="store_true", help="No borrar los artefactos generados")
+        parser.add_argument("--puerto", type=int, default=0, help="Puerto del servidor simulado")
+        parser.add_argument("--solo-servidor", action="store_true",
+                            help="Solo levantar los portales simulados (para probar a mano)")
+
+    def handle(self, *args, **opciones):
+        latencia = opciones["latencia"] / 1000
+
+        if opciones["solo_servidor"]:
+            with ServidorSimulado(opciones["puerto"], latencia) as servidor:
+                self.stdout.write(f"🧪 Portales simulados en {servidor.url}/rues/, /ofac/, /contraloria/ (Ctrl+C para salir)")
+                try:
+                    while True:
+                        time.sleep(3600)
+                except KeyboardInterrupt:
+                    return
+
+        datos = ejecutar_benchmark(
+            consultas=opciones["consultas"],
+            concurrencia=opciones["concurrencia"],
+            latencia=latencia,
+            informe=not opciones["sin_informe"],
+            puerto=opciones["puerto"],
+            conservar=opciones["conservar"],
+        )
+        ruta = guardar_resultado(datos, opciones["etiqueta"], opciones["carpeta"])
+
+        latencias = datos["latencia_s"]
+        self.stdout.write(
+            f"\n✅ {datos['parametros']['consultas']} consultas, concurrencia {datos['parametros']['concurrencia']}, "
+            f"{datos['errores']} error(es) en {datos['duracion_s']}s"
+        )
+        self.stdout.write(
+            f"   p50 {latencias['p50']}s · p90 {latencias['p90']}s · p95 {latencias['p95']}s · "
+            f"p99 {latencias['p99']}s · máx {latencias['max']}s"
+        )
+        self.stdout.write(f"   throughput: {datos['throughput_por_min']} consultas/min")
+        for paso, valores in datos["pasos"].items():
+            self.stdout.write(f"   {paso:<28} {valores['media']:>7.3f}s  (n={valores['n']})")
+        self.stdout.write(f"💾 Resultado guardado en {ruta}")
+
+        if opciones["comparar"]:
+            ruta_anterior = None if opciones["comparar"] == "ultimo" else opciones["comparar"]
+            anterior = cargar_resultado(ruta_anterior, opciones["carpeta"], excluir=ruta)
+            if anterior is None:
+                self.stdout.write("⚠️ No hay una corrida anterior para comparar.")
+                return
+            self.stdout.write(f"\n📊 Comparación con {anterior.get('etiqueta') or anterior['fecha']}:")
+            for linea in comparar(datos, anterior):
+                self.stdout.write(linea)
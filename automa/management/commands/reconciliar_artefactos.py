@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from automa.catalogo import CARPETA_DESCARGAS, reconciliar
+
+
+class Command(BaseCommand):
+    help = "Sincroniza el catálogo de artefactos con los archivos de /media/descargas."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--carpeta", default=CARPETA_DESCARGAS, help="Carpeta a revisar")
+        parser.add_argument("--solo-agregar", action="store_true", help="No quitar registros huérfanos")
+        parser.add_argument("--simular", action="store_true", help="Solo mostrar lo que cambiaría")
+
+    def handle(self, *args, **opciones):
+        resumen = reconciliar(
+            opciones["carpeta"],
+            quitar=not opciones["solo_agregar"],
+            simular=opciones["simular"],
+        )
+        prefijo = "🔎 (simulación) " if opciones["simular"] else "✅ "
+        self.stdout.write(
+            f"{prefijo}{resumen['agregados']} agregado(s), "
+            f"{resumen['actualizados']} actualizado(s), "
+            f"{resumen['eliminados']} eliminado(s) del catálogo."
+        )
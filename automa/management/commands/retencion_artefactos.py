@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from automa.retencion import pasada
+
+
+class Command(BaseCommand):
+    help = "Borra artefactos vencidos, aplica la cuota de disco y recoge blobs sin enlaces."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--simular", action="store_true", help="Solo mostrar lo que se borraría")
+        parser.add_argument(
+            "--todos-los-blobs", action="store_true",
+            help="Revisar todo el almacén de blobs (no solo la parte que toca en esta pasada)",
+        )
+
+    def handle(self, *args, **opciones):
+        resumen = pasada(simular=opciones["simular"], todos_los_blobs=opciones["todos_los_blobs"])
+        prefijo = "🔎 (simulación) " if opciones["simular"] else "✅ "
+        self.stdout.write(
+            f"{prefijo}{resumen['vencidos']} vencido(s), "
+            f"{resumen['desalojados']} desalojado(s) por cuota, "
+            f"{resumen['blobs']} blob(s) sin enlaces; "
+            f"{resumen['liberado_mb']} MB liberados, catálogo en {resumen['catalogo_mb']} MB."
+        )
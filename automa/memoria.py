@@ -0,0 +1,383 @@
+import os
+import time
+import signal
+import logging
+import threading
+
+from django.conf import settings
+
+from .metricas import Contador, Medidor
+from .plazo import PLAZO_TRABAJO
+
+try:
+    import psutil
+except ImportError:  # sin psutil se lee /proc directamente (solo Linux)
+    psutil = None
+
+
+# ===================================================
+# 🧠 GOBERNADOR DE MEMORIA DE LOS NAVEGADORES
+# ===================================================
+#
+# Cada driver es un árbol de procesos (chromedriver → Chrome → render,
+# GPU, red...). El gobernador mide la RSS de esos árboles y:
+#
+#   * no deja crear otro navegador si el total superaría el presupuesto
+#     (el pool espera a que se devuelva uno),
+#   * recicla al devolverse el navegador que pasó el umbral de memoria,
+#   * mata el árbol de un navegador prestado por demasiado tiempo
+#     (colgado) o cuyo ``quit`` no termina,
+#   * recoge procesos de Chrome huérfanos que quedaron de drivers muertos.
+
+MEMORIA_PRESUPUESTO_MB = getattr(settings, "CIVI_MEMORIA_PRESUPUESTO_MB", None)
+MEMORIA_MAX_NAVEGADOR_MB = getattr(settings, "CIVI_MEMORIA_MAX_NAVEGADOR_MB", 1024)
+MEMORIA_INTERVALO = getattr(settings, "CIVI_MEMORIA_INTERVALO", 30)
+MEMORIA_PRESTAMO_MAX = getattr(settings, "CIVI_MEMORIA_PRESTAMO_MAX", 3 * PLAZO_TRABAJO)
+QUIT_TIMEOUT = getattr(settings, "CIVI_QUIT_TIMEOUT", 20)
+
+PRESUPUESTO_FRACCION = 0.6   # del total del equipo, si no se fija el presupuesto
+ESTIMADO_NAVEGADOR_MB = 300  # costo supuesto de un navegador antes de medir alguno
+MB = 1024 * 1024
+
+
+# ===================================================
+# 🔎 PROCESOS (psutil o /proc)
+# ===================================================
+
+def _leer(ruta):
+    try:
+        with open(ruta, encoding="utf-8", errors="replace") as archivo:
+            return archivo.read()
+    except OSError:
+        return ""
+
+
+def _stat(pid):
+    """``(estado, ppid, inicio_en_ticks)`` de /proc/<pid>/stat, o ``None`` si ya no existe."""
+    datos = _leer(f"/proc/{pid}/stat")
+    if not datos:
+        return None
+    campos = datos.rsplit(")", 1)[1].split()
+    return campos[0], int(campos[1]), int(campos[19])
+
+
+def _pids():
+    return [int(n) for n in os.listdir("/proc") if n.isdigit()]
+
+
+def arbol(pid):
+    """``pid`` y todos sus descendientes."""
+    if psutil is not None:
+        try:
+            padre = psutil.Process(pid)
+            return [pid] + [p.pid for p in padre.children(recursive=True)]
+        except psutil.Error:
+            return []
+
+    hijos = {}
+    for otro in _pids():
+        stat = _stat(otro)
+        if stat:
+            hijos.setdefault(stat[1], []).append(otro)
+    resultado, pendientes = [], [pid]
+    while pendientes:
+        actual = pendientes.pop()
+        resultado.append(actual)
+        pendientes.extend(hijos.get(actual, []))
+    return resultado if _stat(pid) else []
+
+
+def rss(pid):
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).memory_info().rss
+        except psutil.Error:
+            return 0
+    campos = _leer(f"/proc/{pid}/statm").split()
+    return int(campos[1]) * os.sysconf("SC_PAGE_SIZE") if len(campos) > 1 else 0
+
+
+def rss_arbol(pid):
+    return sum(rss(p) for p in arbol(pid)) if pid else 0
+
+
+def memoria_equipo():
+    if psutil is not None:
+        return psutil.virtual_memory().total
+    for linea in _leer("/proc/meminfo").splitlines():
+        if linea.startswith("MemTotal:"):
+            return int(linea.split()[1]) * 1024
+    return 0
+
+
+def firma(pid):
+    """
+    Instante de arranque del proceso (``None`` si ya no existe o es un
+    zombi): distingue al proceso original de otro que reutilizó su pid.
+    """
+    if psutil is not None:
+        try:
+            proceso = psutil.Process(pid)
+            return None if proceso.status() == psutil.STATUS_ZOMBIE else proceso.create_time()
+        except psutil.Error:
+            return None
+    stat = _stat(pid)
+    return stat[2] if stat and stat[0] != "Z" else None
+
+
+def instantanea(pid):
+    """``[(pid, firma)]`` del árbol de ``pid``, para matarlo después sin tocar pids reutilizados."""
+    if not pid:
+        return []
+    procesos = []
+    for otro in arbol(pid):
+        inicio = firma(otro)
+        if inicio is not None:
+            procesos.append((otro, inicio))
+    return procesos
+
+
+def matar(procesos):
+    """SIGKILL a los procesos de una instantánea que siguen vivos, de las hojas a la raíz."""
+    for pid, inicio in reversed(procesos):
+        if firma(pid) != inicio:
+            continue  # ya terminó, o el pid es ahora de otro proceso
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+
+def matar_arbol(pid):
+    """SIGKILL al árbol completo, de las hojas a la raíz."""
+    matar(instantanea(pid))
+
+
+def pid_driver(driver):
+    """Pid del chromedriver del driver; ``None`` si no lanzó uno propio (contextos)."""
+    proceso = getattr(getattr(driver, "service", None), "process", None)
+    return getattr(proceso, "pid", None)
+
+
+# ===================================================
+# 🧠 GOBERNADOR
+# ===================================================
+
+class Gobernador:
+    def __init__(self, presupuesto_mb=MEMORIA_PRESUPUESTO_MB, max_navegador_mb=MEMORIA_MAX_NAVEGADOR_MB,
+                 intervalo=MEMORIA_INTERVALO, prestamo_max=MEMORIA_PRESTAMO_MAX):
+        if presupuesto_mb is None:
+            presupuesto_mb = memoria_equipo() * PRESUPUESTO_FRACCION / MB
+        self.presupuesto = int(presupuesto_mb * MB)
+        self.max_navegador = int(max_navegador_mb * MB)
+        self.intervalo = intervalo
+        self.prestamo_max = prestamo_max
+        self.usado = 0
+        self.reciclados = {}
+        self.huerfanos = 0
+        self._drivers = {}    # id(driver) -> driver
+        self._prestamos = {}  # id(driver) -> inicio del préstamo
+        self._lanzados = {}   # pid -> firma de los procesos de nuestros navegadores
+        self._cerrando = set()  # pids de drivers en ``cerrar_driver``
+        self._medido_en = 0.0
+        self._hilo = None
+        self._lock = threading.Lock()
+
+    # ---------- registro (lo llama el pool) ----------
+
+    def registrar(self, driver):
+        procesos = instantanea(pid_driver(driver))
+        with self._lock:
+            self._drivers[id(driver)] = driver
+            self._lanzados.update(procesos)
+
+    def olvidar(self, driver):
+        with self._lock:
+            self._drivers.pop(id(driver), None)
+            self._prestamos.pop(id(driver), None)
+
+    def prestado(self, driver):
+        with self._lock:
+            self._prestamos[id(driver)] = time.monotonic()
+        return driver
+
+    def devuelto(self, driver):
+        with self._lock:
+            self._prestamos.pop(id(driver), None)
+
+    # ---------- decisiones ----------
+
+    def medir(self, maximo_cache=2):
+        """RSS total de los navegadores registrados (se reutiliza la medición reciente)."""
+        if time.monotonic() - self._medido_en > maximo_cache:
+            with self._lock:
+                drivers = list(self._drivers.values())
+            self.usado = sum(rss_arbol(pid_driver(d)) for d in drivers)
+            self._medido_en = time.monotonic()
+            MEMORIA_BYTES.fijar("navegadores", valor=self.usado)
+        return self.usado
+
+    def admite_nuevo(self, estimado_mb=ESTIMADO_NAVEGADOR_MB, promedio=True):
+        """
+        ``True`` si otro navegador cabe en el presupuesto (el primero
+        siempre cabe). Con ``promedio`` se estima con lo que miden en
+        promedio los navegadores vivos, si es más que ``estimado_mb``.
+        """
+        with self._lock:
+            medibles = sum(1 for d in self._drivers.values() if pid_driver(d))
+        if not medibles:
+            return True
+        usado = self.medir()
+        estimado = estimado_mb * MB
+        if promedio:
+            estimado = max(estimado, usado // medibles)
+        return usado + estimado <= self.presupuesto
+
+    def motivo_reciclar(self, driver):
+        """``"memoria"`` si el árbol del driver pasó el umbral; ``None`` si puede seguir."""
+        if rss_arbol(pid_driver(driver)) > self.max_navegador:
+            return "memoria"
+        return None
+
+    def contar_reciclado(self, motivo):
+        with self._lock:
+            self.reciclados[motivo] = self.reciclados.get(motivo, 0) + 1
+        RECICLADOS_TOTAL.inc(motivo)
+
+    def cerrar_driver(self, driver):
+        """
+        ``driver.quit()`` con límite de tiempo. Si no termina, o si deja
+        procesos vivos del árbol, se matan.
+        """
+        pid = pid_driver(driver)
+        procesos = instantanea(pid)
+        with self._lock:
+            self._cerrando.update(p for p, _ in procesos)
+        try:
+            hilo = threading.Thread(target=self._quit, args=(driver,), daemon=True)
+            hilo.start()
+            hilo.join(QUIT_TIMEOUT)
+            if hilo.is_alive():
+                logging.error(f"Gobernador - quit() no terminó en {QUIT_TIMEOUT}s, se mata el navegador (pid {pid})")
+                self.contar_reciclado("quit_colgado")
+
+            # Solo lo que quedó vivo del árbol original (no pids reutilizados)
+            matar(procesos)
+            if pid:
+                try:
+                    driver.service.process.wait(5)  # sin zombis del chromedriver
+                except Exception:
+                    pass
+        finally:
+            with self._lock:
+                for p, _ in procesos:
+                    self._cerrando.discard(p)
+                    self._lanzados.pop(p, None)
+
+    @staticmethod
+    def _quit(driver):
+        try:
+            driver.quit()
+        except Exception as e:
+            logging.warning(f"Pool - Error al cerrar driver: {e}")
+
+    # ---------- vigilancia en segundo plano ----------
+
+    def iniciar(self):
+        with self._lock:
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._vigilar, name="civi-gobernador", daemon=True)
+                self._hilo.start()
+
+    def _vigilar(self):
+        while True:
+            time.sleep(self.intervalo)
+            try:
+                self.revisar()
+            except Exception as e:
+                logging.error(f"Gobernador - Error en la revisión: {e}")
+
+    def revisar(self):
+        self.medir(maximo_cache=0)
+        self.matar_colgados()
+        self.recoger_huerfanos()
+
+    def matar_colgados(self):
+        """Mata el árbol de los navegadores prestados hace más de ``prestamo_max`` segundos."""
+        limite = time.monotonic() - self.prestamo_max
+        with self._lock:
+            colgados = [self._drivers[i] for i, inicio in self._prestamos.items()
+                        if inicio < limite and i in self._drivers]
+        for driver in colgados:
+            pid = pid_driver(driver)
+            if not pid:
+                continue
+            logging.error(f"Gobernador - Navegador prestado hace más de {self.prestamo_max}s, se mata (pid {pid})")
+            matar_arbol(pid)
+            self.devuelto(driver)  # el trabajo falla y el pool lo descarta al devolverlo
+            self.contar_reciclado("colgado")
+
+    def recoger_huerfanos(self):
+        """
+        Mata los procesos que lanzaron nuestros navegadores y que ya no
+        pertenecen a ningún driver vivo (su driver murió sin cerrarlos).
+        Solo se consideran pids anotados al registrar o revisar nuestros
+        drivers, con la misma firma: nunca procesos de otras aplicaciones.
+        """
+        with self._lock:
+            drivers = list(self._drivers.values())
+        conocidos = {}
+        for driver in drivers:
+            conocidos.update(instantanea(pid_driver(driver)))
+
+        with self._lock:
+            self._lanzados.update(conocidos)  # hijos nuevos (render, GPU...) de drivers vivos
+            candidatos = [
+                (pid, inicio) for pid, inicio in self._lanzados.items()
+                if pid not in conocidos and pid not in self._cerrando
+            ]
+
+        for pid, inicio in candidatos:
+            if firma(pid) == inicio:
+                logging.warning(f"Gobernador - Proceso huérfano de Chrome recogido (pid {pid})")
+                matar([(pid, inicio)])
+                with self._lock:
+                    self.huerfanos += 1
+                HUERFANOS_TOTAL.inc()
+            with self._lock:
+                self._lanzados.pop(pid, None)
+
+    def estadisticas(self):
+        with self._lock:
+            navegadores = len(self._drivers)
+            prestados = len(self._prestamos)
+            reciclados = dict(self.reciclados)
+            huerfanos = self.huerfanos
+        return {
+            "presupuesto_mb": round(self.presupuesto / MB),
+            "usado_mb": round(self.medir() / MB),
+            "max_navegador_mb": round(self.max_navegador / MB),
+            "navegadores": navegadores,
+            "prestados": prestados,
+            "reciclados": reciclados,
+            "huerfanos_recogidos": huerfanos,
+            "psutil": psutil is not None,
+        }
+
+
+# ===================================================
+# 📈 MÉTRICAS
+# ===================================================
+
+MEMORIA_BYTES = Medidor(
+    "civi_memoria_bytes", "RSS de los árboles de procesos de los navegadores y presupuesto", ("tipo",),
+)
+RECICLADOS_TOTAL = Contador(
+    "civi_navegadores_reciclados_total", "Navegadores cerrados por el gobernador", ("motivo",),
+)
+HUERFANOS_TOTAL = Contador(
+    "civi_huerfanos_recogidos_total", "Procesos de Chrome huérfanos recogidos",
+)
+
+gobernador = Gobernador()
+MEMORIA_BYTES.fijar("presupuesto", valor=gobernador.presupuesto)
@@ -0,0 +1,216 @@
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+
+# ===================================================
+# 📈 MÉTRICAS (formato de texto de Prometheus)
+# ===================================================
+#
+# Contadores, medidores e histogramas en memoria del proceso, expuestos
+# en /metrics. Los tramos (``tramo``) miden cada paso caliente de una
+# consulta y además quedan en el log "civi.tiempos" con el trabajo al
+# que pertenecen. El id del trabajo no va como etiqueta de métrica para
+# no crear una serie por consulta.
+
+CUBETAS_SEGUNDOS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+registro_tiempos = logging.getLogger("civi.tiempos")
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _etiquetas(nombres, valores, extra=()):
+    pares = list(zip(nombres, valores)) + list(extra)
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{n}="{_escapar(v)}"' for n, v in pares) + "}"
+
+
+def _numero(valor):
+    if valor == float("inf"):
+        return "+Inf"
+    if float(valor).is_integer():
+        return str(int(valor))
+    return repr(float(valor))
+
+
+class Metrica:
+    tipo = ""
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._valores = {}
+        self._lock = threading.Lock()
+        REGISTRO.append(self)
+
+    def _clave(self, valores):
+        if len(valores) != len(self.etiquetas):
+            raise ValueError(f"{self.nombre} espera etiquetas {self.etiquetas}")
+        return tuple(str(v) for v in valores)
+
+    def exponer(self):
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+        with self._lock:
+            lineas += self._muestras()
+        return lineas
+
+    def _muestras(self):
+        return [
+            f"{self.nombre}{_etiquetas(self.etiquetas, clave)} {_numero(valor)}"
+            for clave, valor in sorted(self._valores.items())
+        ]
+
+
+class Contador(Metrica):
+    tipo = "counter"
+
+    def inc(self, *valores, cantidad=1):
+        clave = self._clave(valores)
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + cantidad
+
+
+class Medidor(Metrica):
+    tipo = "gauge"
+
+    def __init__(self, nombre, ayuda, etiquetas=(), funcion=None):
+        super().__init__(nombre, ayuda, etiquetas)
+        # ``funcion`` calcula los valores al exponer: {(etiquetas...): valor}
+        self._funcion = funcion
+        if not self.etiquetas:
+            self._valores[()] = 0
+
+    def inc(self, *valores, cantidad=1):
+        clave = self._clave(valores)
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + cantidad
+
+    def dec(self, *valores, cantidad=1):
+        self.inc(*valores, cantidad=-cantidad)
+
+    def fijar(self, *valores, valor):
+        clave = self._clave(valores)
+        with self._lock:
+            self._valores[clave] = valor
+
+    def _muestras(self):
+        if self._funcion is not None:
+            try:
+                self._valores = {self._clave(k): v for k, v in self._funcion().items()}
+            except Exception as e:
+                logging.warning(f"Métricas - No se pudo calcular {self.nombre}: {e}")
+        return super()._muestras()
+
+
+class Histograma(Metrica):
+    tipo = "histogram"
+
+    def __init__(self, nombre, ayuda, etiquetas=(), cubetas=CUBETAS_SEGUNDOS):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.cubetas = tuple(sorted(cubetas)) + (float("inf"),)
+
+    def observar(self, *valores, valor):
+        clave = self._clave(valores)
+        with self._lock:
+            conteos, suma = self._valores.get(clave, ([0] * len(self.cubetas), 0.0))
+            for i, limite in enumerate(self.cubetas):
+                if valor <= limite:
+                    conteos[i] += 1
+            self._valores[clave] = (conteos, suma + valor)
+
+    def totales(self):
+        """``{(etiquetas...): (conteo, suma)}`` de cada serie."""
+        with self._lock:
+            return {clave: (conteos[-1], suma) for clave, (conteos, suma) in self._valores.items()}
+
+    def _muestras(self):
+        lineas = []
+        for clave, (conteos, suma) in sorted(self._valores.items()):
+            for limite, conteo in zip(self.cubetas, conteos):
+                extra = [("le", _numero(limite))]
+                lineas.append(f"{self.nombre}_bucket{_etiquetas(self.etiquetas, clave, extra)} {conteo}")
+            lineas.append(f"{self.nombre}_sum{_etiquetas(self.etiquetas, clave)} {_numero(suma)}")
+            lineas.append(f"{self.nombre}_count{_etiquetas(self.etiquetas, clave)} {conteos[-1]}")
+        return lineas
+
+
+REGISTRO = []
+
+
+def exponer():
+    """Todas las métricas en formato de texto de Prometheus (versión 0.0.4)."""
+    lineas = []
+    for metrica in list(REGISTRO):
+        lineas += metrica.exponer()
+    return "\n".join(lineas) + "\n"
+
+
+# ===================================================
+# 📏 MÉTRICAS DE LA APLICACIÓN
+# ===================================================
+
+PASO_SEGUNDOS = Histograma(
+    "civi_paso_segundos", "Duración de cada paso de una consulta", ("paso", "portal"),
+)
+PASOS_TOTAL = Contador(
+    "civi_pasos_total", "Pasos ejecutados por resultado", ("paso", "portal", "resultado"),
+)
+PASOS_EN_CURSO = Medidor(
+    "civi_pasos_en_curso", "Pasos ejecutándose en este momento", ("paso",),
+)
+TRABAJOS_TOTAL = Contador(
+    "civi_trabajos_total", "Trabajos terminados por estado", ("estado",),
+)
+TRABAJOS_EN_CURSO = Medidor(
+    "civi_trabajos_en_curso", "Trabajos en proceso", (),
+)
+TRABAJO_SEGUNDOS = Histograma(
+    "civi_trabajo_segundos", "Duración total de un trabajo (portales + informe)", (),
+    cubetas=(5, 10, 20, 30, 45, 60, 90, 120, 180, 300),
+)
+CACHE_TOTAL = Contador(
+    "civi_cache_total", "Consultas a la caché de resultados por portal", ("portal", "resultado"),
+)
+BLOQUEADAS_TOTAL = Contador(
+    "civi_peticiones_bloqueadas_total", "Peticiones bloqueadas por las reglas del portal", ("portal",),
+)
+
+
+# ===================================================
+# ⏱️ TRAMOS
+# ===================================================
+
+@contextmanager
+def tramo(paso, portal="", trabajo=""):
+    """
+    Mide el bloque: histograma por (paso, portal), contador por resultado,
+    medidor de pasos en curso y una línea JSON en el log "civi.tiempos".
+    """
+    PASOS_EN_CURSO.inc(paso)
+    inicio = time.perf_counter()
+    resultado = "ok"
+    try:
+        yield
+    except BaseException:
+        resultado = "error"
+        raise
+    finally:
+        duracion = time.perf_counter() - inicio
+        PASOS_EN_CURSO.dec(paso)
+        PASO_SEGUNDOS.observar(paso, portal, valor=duracion)
+        PASOS_TOTAL.inc(paso, portal, resultado)
+        if registro_tiempos.isEnabledFor(logging.INFO):
+            registro_tiempos.info(json.dumps({
+                "paso": paso,
+                "portal": portal,
+                "trabajo": trabajo,
+                "duracion_ms": round(duracion * 1000, 1),
+                "resultado": resultado,
+            }))
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:13
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Trabajo',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('numero_documento', models.CharField(max_length=30)),
+                ('estado', models.CharField(choices=[('en_cola', 'En cola'), ('en_proceso', 'En proceso'), ('completado', 'Completado'), ('error', 'Error')], default='en_cola', max_length=20)),
+                ('etapa', models.CharField(blank=True, max_length=100)),
+                ('progreso', models.PositiveSmallIntegerField(default=0)),
+                ('resultado', models.JSONField(blank=True, default=dict)),
+                ('error', models.TextField(blank=True)),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-creado'],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:13
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('automa', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Lote',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('nombre', models.CharField(blank=True, max_length=200)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-creado'],
+            },
+        ),
+        migrations.AddField(
+            model_name='trabajo',
+            name='lote',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='trabajos', to='automa.lote'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('automa', '0002_lote_trabajo_lote'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResultadoPortal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('portal', models.CharField(max_length=50)),
+                ('numero_documento', models.CharField(max_length=30)),
+                ('capturas', models.JSONField(blank=True, default=list)),
+                ('archivos', models.JSONField(blank=True, default=list)),
+                ('tamano', models.PositiveBigIntegerField(default=0)),
+                ('creado', models.DateTimeField()),
+                ('ultimo_acceso', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('portal', 'numero_documento'), name='resultado_portal_unico')],
+            },
+        ),
+    ]
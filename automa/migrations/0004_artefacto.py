@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('automa', '0003_resultadoportal'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Artefacto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('numero_documento', models.CharField(blank=True, max_length=30)),
+                ('portal', models.CharField(blank=True, max_length=50)),
+                ('tipo', models.CharField(choices=[('captura', 'Captura'), ('archivo', 'Archivo descargado'), ('html', 'Resultado HTML'), ('informe', 'Informe')], default='archivo', max_length=20)),
+                ('nombre', models.CharField(max_length=255)),
+                ('extension', models.CharField(blank=True, max_length=10)),
+                ('ruta', models.CharField(max_length=500, unique=True)),
+                ('tamano', models.PositiveBigIntegerField(default=0)),
+                ('creado', models.DateTimeField()),
+                ('trabajo', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='artefactos', to='automa.trabajo')),
+            ],
+            options={
+                'ordering': ['-creado'],
+                'indexes': [models.Index(fields=['numero_documento', '-creado'], name='artefacto_documento'), models.Index(fields=['-creado'], name='artefacto_creado'), models.Index(fields=['extension', '-creado'], name='artefacto_extension')],
+            },
+        ),
+    ]
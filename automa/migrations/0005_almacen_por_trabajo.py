@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('automa', '0004_artefacto'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='artefacto',
+            name='sha256',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='trabajo',
+            name='carpeta',
+            field=models.CharField(blank=True, max_length=300),
+        ),
+    ]
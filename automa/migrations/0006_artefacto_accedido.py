@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:51
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def accedido_desde_creado(apps, schema_editor):
+    Artefacto = apps.get_model('automa', 'Artefacto')
+    Artefacto.objects.filter(accedido__isnull=True).update(accedido=F('creado'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('automa', '0005_almacen_por_trabajo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='artefacto',
+            name='accedido',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='artefacto',
+            index=models.Index(fields=['accedido'], name='artefacto_accedido'),
+        ),
+        migrations.RunPython(accedido_desde_creado, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,147 @@
+import os
+import uuid
+
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+
+# ==========================================================
+# 📦 Lotes de consultas masivas
+# ==========================================================
+class Lote(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    nombre = models.CharField(max_length=200, blank=True)
+    total = models.PositiveIntegerField(default=0)
+    creado = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-creado"]
+
+    def __str__(self):
+        return self.nombre or f"Lote {self.pk}"
+
+    def resumen(self):
+        """Cantidad de trabajos del lote por estado."""
+        conteo = dict(
+            self.trabajos.values_list("estado").annotate(n=models.Count("pk")).order_by()
+        )
+        terminados = conteo.get(Trabajo.COMPLETADO, 0) + conteo.get(Trabajo.ERROR, 0)
+        return {
+            "total": self.total,
+            "en_cola": conteo.get(Trabajo.EN_COLA, 0),
+            "en_proceso": conteo.get(Trabajo.EN_PROCESO, 0),
+            "completados": conteo.get(Trabajo.COMPLETADO, 0),
+            "errores": conteo.get(Trabajo.ERROR, 0),
+            "terminado": terminados >= self.total,
+        }
+
+
+# ==========================================================
+# 🧾 Trabajos de consulta (cola asíncrona)
+# ==========================================================
+class Trabajo(models.Model):
+    EN_COLA = "en_cola"
+    EN_PROCESO = "en_proceso"
+    COMPLETADO = "completado"
+    ERROR = "error"
+
+    ESTADOS = [
+        (EN_COLA, "En cola"),
+        (EN_PROCESO, "En proceso"),
+        (COMPLETADO, "Completado"),
+        (ERROR, "Error"),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    lote = models.ForeignKey(
+        Lote, null=True, blank=True, on_delete=models.CASCADE, related_name="trabajos"
+    )
+    numero_documento = models.CharField(max_length=30)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default=EN_COLA)
+    etapa = models.CharField(max_length=100, blank=True)
+    progreso = models.PositiveSmallIntegerField(default=0)
+    resultado = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+    carpeta = models.CharField(max_length=300, blank=True)  # Relativa a MEDIA_ROOT
+    creado = models.DateTimeField(auto_now_add=True)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-creado"]
+
+    def __str__(self):
+        return f"{self.numero_documento} ({self.get_estado_display()})"
+
+    @property
+    def terminado(self):
+        return self.estado in (self.COMPLETADO, self.ERROR)
+
+    def ruta_carpeta(self):
+        """Carpeta absoluta con los artefactos del trabajo (vacío si aún no tiene)."""
+        if not self.carpeta:
+            return ""
+        return os.path.join(settings.MEDIA_ROOT, *self.carpeta.split("/"))
+
+
+# ==========================================================
+# 🗃️ Caché de resultados por portal y documento
+# ==========================================================
+class ResultadoPortal(models.Model):
+    portal = models.CharField(max_length=50)
+    numero_documento = models.CharField(max_length=30)
+    capturas = models.JSONField(default=list, blank=True)
+    archivos = models.JSONField(default=list, blank=True)
+    tamano = models.PositiveBigIntegerField(default=0)
+    creado = models.DateTimeField()
+    ultimo_acceso = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["portal", "numero_documento"], name="resultado_portal_unico"),
+        ]
+
+    def __str__(self):
+        return f"{self.portal} - {self.numero_documento}"
+
+
+# ==========================================================
+# 📁 Catálogo de artefactos generados (capturas, descargas, informes)
+# ==========================================================
+class Artefacto(models.Model):
+    CAPTURA = "captura"
+    ARCHIVO = "archivo"
+    HTML = "html"
+    INFORME = "informe"
+
+    TIPOS = [
+        (CAPTURA, "Captura"),
+        (ARCHIVO, "Archivo descargado"),
+        (HTML, "Resultado HTML"),
+        (INFORME, "Informe"),
+    ]
+
+    trabajo = models.ForeignKey(
+        Trabajo, null=True, blank=True, on_delete=models.SET_NULL, related_name="artefactos"
+    )
+    numero_documento = models.CharField(max_length=30, blank=True)
+    portal = models.CharField(max_length=50, blank=True)
+    tipo = models.CharField(max_length=20, choices=TIPOS, default=ARCHIVO)
+    nombre = models.CharField(max_length=255)
+    extension = models.CharField(max_length=10, blank=True)
+    ruta = models.CharField(max_length=500, unique=True)  # Relativa a MEDIA_ROOT
+    tamano = models.PositiveBigIntegerField(default=0)
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True)
+    creado = models.DateTimeField()
+    accedido = models.DateTimeField(null=True, blank=True)  # Último uso; la retención desaloja el más antiguo
+
+    class Meta:
+        ordering = ["-creado"]
+        indexes = [
+            models.Index(fields=["accedido"], name="artefacto_accedido"),
+            models.Index(fields=["numero_documento", "-creado"], name="artefacto_documento"),
+            models.Index(fields=["-creado"], name="artefacto_creado"),
+            models.Index(fields=["extension", "-creado"], name="artefacto_extension"),
+        ]
+
+    def __str__(self):
+        return self.ruta
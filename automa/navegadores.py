@@ -0,0 +1,414 @@
+import os
+import time
+import queue
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
+from functools import partial
+from urllib.parse import urlparse
+
+from selenium import webdriver
+from django.conf import settings
+
+from .esperas import SCRIPT_MONITOR_RED
+from .memoria import gobernador
+from .metricas import Medidor, tramo
+from .recursos import activar_registro, leer_bloqueos, quitar_bloqueo
+
+
+# ===================================================
+# 📁 CONFIGURACIÓN GENERAL
+# ===================================================
+
+CARPETA_DESCARGAS = os.path.join(settings.MEDIA_ROOT, "descargas")
+
+POOL_TAMANO = getattr(settings, "CIVI_POOL_TAMANO", 2)
+POOL_MAX_USOS = getattr(settings, "CIVI_POOL_MAX_USOS", 25)
+POOL_TIMEOUT = getattr(settings, "CIVI_POOL_TIMEOUT", 120)
+CONTEXTOS = getattr(settings, "CIVI_CONTEXTOS", False)
+
+
+# ===================================================
+# 🧰 CREACIÓN DE DRIVERS
+# ===================================================
+
+ESTRATEGIAS_CARGA = ("normal", "eager", "none")
+
+
+def crear_opciones_chrome(carpeta_descarga, estrategia="normal"):
+    chrome_options = webdriver.ChromeOptions()
+    # "eager": driver.get() vuelve con el DOM listo, sin esperar imágenes ni iframes
+    chrome_options.page_load_strategy = estrategia
+    chrome_options.add_experimental_option("prefs", {
+        "download.default_directory": carpeta_descarga,
+        "download.prompt_for_download": False,
+        "safebrowsing.enabled": True
+    })
+
+    chrome_options.add_argument("--headless=new")
+    chrome_options.add_argument("--window-size=1920,1080")
+    chrome_options.add_argument("--start-maximized")
+
+    chrome_options.add_argument("--force-device-scale-factor=1")
+    chrome_options.add_argument("--high-dpi-support=1")
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--disable-software-rasterizer")
+
+    chrome_options.add_argument("--hide-scrollbars")
+    chrome_options.add_argument("--disable-popup-blocking")
+    chrome_options.add_argument("--disable-infobars")
+
+    chrome_options.add_argument("--disable-blink-features=AutomationControlled")
+
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--disable-background-networking")
+    chrome_options.add_argument("--disable-client-side-phishing-detection")
+    chrome_options.add_argument("--disable-component-update")
+    chrome_options.add_argument("--disable-default-apps")
+    chrome_options.add_argument("--disable-extensions")
+    chrome_options.add_argument("--disable-sync")
+    chrome_options.add_argument("--disable-translate")
+    chrome_options.add_argument("--disable-features=NetworkService,NetworkServiceInProcess,TranslateUI")
+    chrome_options.add_argument("--no-first-run")
+    chrome_options.add_argument("--mute-audio")
+    chrome_options.add_argument("--disable-notifications")
+    chrome_options.add_argument("--log-level=3")
+    chrome_options.add_experimental_option("excludeSwitches", ["enable-logging", "enable-automation"])
+    activar_registro(chrome_options)
+    return chrome_options
+
+
+def configurar_descargas(driver, carpeta):
+    """Redirige las descargas del driver a ``carpeta`` sin reiniciarlo."""
+    driver.execute_cdp_cmd("Page.setDownloadBehavior", {
+        "behavior": "allow",
+        "downloadPath": carpeta,
+    })
+
+
+def crear_driver(carpeta_descarga=CARPETA_DESCARGAS, estrategia="normal"):
+    driver = webdriver.Chrome(options=crear_opciones_chrome(carpeta_descarga, estrategia))
+    driver.maximize_window()
+    driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": SCRIPT_MONITOR_RED})
+    return driver
+
+
+# ===================================================
+# ♻️ POOL DE NAVEGADORES
+# ===================================================
+
+class PoolNavegadores:
+    """
+    Mantiene drivers de Chrome calientes para reutilizarlos entre consultas.
+
+    Cada driver se revisa antes de entregarse, se limpia al devolverse
+    (pestañas, cookies, almacenamiento y carpeta de descargas) y se
+    recicla después de ``max_usos`` trabajos o si el gobernador de
+    memoria lo pide. Solo se crea otro driver si cabe en el presupuesto
+    de memoria (y, si el pool comparte ``cupo`` con otros, en el total de
+    navegadores del proceso); si no, se espera a que se devuelva uno.
+    """
+
+    def __init__(self, tamano=POOL_TAMANO, max_usos=POOL_MAX_USOS,
+                 carpeta_descarga=CARPETA_DESCARGAS, fabrica=crear_driver, cupo=None):
+        self.tamano = tamano
+        self.max_usos = max_usos
+        self.carpeta_descarga = carpeta_descarga
+        self._fabrica = fabrica
+        self._cupo = cupo
+        if cupo is not None:
+            cupo.unir(self)
+        self._libres = queue.LifoQueue()
+        self._cupos = threading.BoundedSemaphore(tamano)
+        self._usos = {}
+        self._lock = threading.Lock()
+        self._cerrado = False
+
+    # ---------- ciclo de vida ----------
+
+    def calentar(self, cantidad=None):
+        """Arranca en segundo plano los drivers que falten hasta tener ``cantidad`` libres."""
+        def _arrancar():
+            faltantes = (cantidad or self.tamano) - self._libres.qsize()
+            for _ in range(max(faltantes, 0)):
+                if not self._cupos.acquire(blocking=False):
+                    break
+                # Al calentar no se cierran navegadores de otros pools
+                if self._cupo is not None and not self._cupo.reservar(self, desalojar=False):
+                    self._cupos.release()
+                    break
+                try:
+                    self._libres.put(self._crear())
+                except Exception as e:
+                    logging.error(f"Pool - Error al calentar driver: {e}")
+                finally:
+                    self._cupos.release()
+
+        threading.Thread(target=_arrancar, daemon=True).start()
+
+    def adquirir(self, timeout=POOL_TIMEOUT):
+        limite = time.monotonic() + timeout
+        if not self._cupos.acquire(timeout=timeout):
+            raise TimeoutError("No hay navegadores disponibles en el pool")
+
+        try:
+            avisado = False
+            while True:
+                try:
+                    driver = self._libres.get_nowait()
+                except queue.Empty:
+                    if self._cabe_otro():
+                        return gobernador.prestado(self._crear())
+                    if not avisado:
+                        print("🧠 Sin memoria o sin cupo para otro navegador: se espera uno libre")
+                        avisado = True
+                    try:
+                        driver = self._libres.get(timeout=min(1, max(0, limite - time.monotonic())))
+                    except queue.Empty:
+                        if time.monotonic() >= limite:
+                            raise TimeoutError("Sin lugar para otro navegador y ninguno se liberó a tiempo")
+                        continue
+
+                if self._esta_sano(driver):
+                    return gobernador.prestado(driver)
+                self._destruir(driver)
+        except Exception:
+            self._cupos.release()
+            raise
+
+    def liberar(self, driver, descartar=False):
+        try:
+            gobernador.devuelto(driver)
+            with self._lock:
+                usos = self._usos.get(id(driver), 0) + 1
+                self._usos[id(driver)] = usos
+
+            if descartar or self._cerrado or usos >= self.max_usos:
+                self._destruir(driver)
+                return
+
+            motivo = gobernador.motivo_reciclar(driver)
+            if motivo:
+                print(f"🧠 Navegador reciclado por {motivo} tras {usos} uso(s)")
+                gobernador.contar_reciclado(motivo)
+                self._destruir(driver)
+                return
+
+            try:
+                self._reiniciar(driver)
+            except Exception as e:
+                logging.warning(f"Pool - No se pudo reiniciar driver, se descarta: {e}")
+                self._destruir(driver)
+                return
+
+            self._libres.put(driver)
+        finally:
+            self._cupos.release()
+
+    @contextmanager
+    def driver(self, timeout=POOL_TIMEOUT):
+        driver = self.adquirir(timeout)
+        descartar = False
+        try:
+            yield driver
+        except Exception:
+            descartar = not self._esta_sano(driver)
+            raise
+        finally:
+            self.liberar(driver, descartar=descartar)
+
+    def cerrar(self):
+        self._cerrado = True
+        while True:
+            try:
+                self._destruir(self._libres.get_nowait())
+            except queue.Empty:
+                break
+
+    def estadisticas(self):
+        return {
+            "tamano": self.tamano,
+            "libres": self._libres.qsize(),
+            "vivos": len(self._usos),
+            "max_usos": self.max_usos,
+        }
+
+    # ---------- utilitarios internos ----------
+
+    def sacar_libre(self):
+        """Un driver libre fuera del pool (para cerrarlo), o ``None``."""
+        try:
+            return self._libres.get_nowait()
+        except queue.Empty:
+            return None
+
+    def _crear(self):
+        """Arranca un driver; con ``cupo`` ya debe estar reservado su lugar."""
+        try:
+            with tramo("arranque_driver"):
+                driver = self._fabrica(self.carpeta_descarga)
+        except Exception:
+            if self._cupo is not None:
+                self._cupo.devolver()
+            raise
+        with self._lock:
+            self._usos[id(driver)] = 0
+        gobernador.registrar(driver)
+        print(f"🚀 Nuevo navegador en el pool ({self.tamano} máx.)")
+        return driver
+
+    def _destruir(self, driver):
+        with self._lock:
+            vivo = self._usos.pop(id(driver), None) is not None
+        gobernador.olvidar(driver)
+        gobernador.cerrar_driver(driver)  # quit con límite de tiempo; mata lo que quede
+        if vivo and self._cupo is not None:
+            self._cupo.devolver()
+
+    def _cabe_otro(self):
+        return gobernador.admite_nuevo() and self._reservar_cupo()
+
+    def _reservar_cupo(self):
+        return self._cupo is None or self._cupo.reservar(self)
+
+    @staticmethod
+    def _esta_sano(driver):
+        try:
+            driver.execute_script("return 1;")
+            return True
+        except Exception:
+            return False
+
+    def _reiniciar(self, driver):
+        origenes = set()
+        handles = driver.window_handles
+
+        for handle in handles:
+            driver.switch_to.window(handle)
+            url = urlparse(driver.current_url)
+            if url.scheme in ("http", "https"):
+                origenes.add(f"{url.scheme}://{url.netloc}")
+            if handle != handles[0]:
+                driver.close()
+
+        driver.switch_to.window(handles[0])
+        driver.switch_to.default_content()
+        driver.get("about:blank")
+
+        driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        for origen in origenes:
+            driver.execute_cdp_cmd("Storage.clearDataForOrigin", {
+                "origin": origen,
+                "storageTypes": "local_storage,indexeddb,websql,service_workers,cache_storage",
+            })
+
+        configurar_descargas(driver, self.carpeta_descarga)
+        quitar_bloqueo(driver)
+        leer_bloqueos(driver)  # Descarta lo que quedó en el registro de red
+
+
+# ===================================================
+# 🎟️ CUPO DE NAVEGADORES ENTRE POOLS
+# ===================================================
+
+class CupoNavegadores:
+    """
+    Límite de drivers vivos (libres o prestados) entre varios pools. Si
+    un pool necesita otro y no hay cupo, cierra uno libre de otro pool:
+    los navegadores se reparten según la demanda de cada estrategia.
+    """
+
+    def __init__(self, total):
+        self.total = total
+        self.vivos = 0
+        self.pools = []
+        self._lock = threading.Lock()
+
+    def unir(self, pool):
+        with self._lock:
+            self.pools.append(pool)
+
+    def reservar(self, pool, desalojar=True):
+        if self._tomar():
+            return True
+        if not desalojar:
+            return False
+        with self._lock:
+            otros = [p for p in self.pools if p is not pool]
+        for otro in otros:
+            driver = otro.sacar_libre()
+            if driver is not None:
+                otro._destruir(driver)  # devuelve su cupo
+                return self._tomar()
+        return False
+
+    def devolver(self):
+        with self._lock:
+            self.vivos = max(0, self.vivos - 1)
+
+    def _tomar(self):
+        with self._lock:
+            if self.vivos >= self.total:
+                return False
+            self.vivos += 1
+            return True
+
+
+# ===================================================
+# 🌐 POOL COMPARTIDO DEL PROCESO
+# ===================================================
+
+# La estrategia de carga se fija al crear la sesión de Chrome, así que
+# hay un pool por estrategia ("estrategia_carga" de cada portal), pero
+# todos comparten un cupo de CIVI_POOL_TAMANO navegadores (o de
+# CIVI_CONTEXTOS_TAMANO contextos en un solo Chrome, ver contextos).
+_pools = {}
+_pool_lock = threading.Lock()
+_cupo = None
+
+
+def obtener_pool(estrategia="normal"):
+    global _cupo
+    with _pool_lock:
+        pool = _pools.get(estrategia)
+        if pool is None:
+            if CONTEXTOS:
+                from .contextos import CONTEXTOS_TAMANO, PoolContextos, obtener_compartido
+                compartido = obtener_compartido()
+                if _cupo is None:
+                    _cupo = CupoNavegadores(CONTEXTOS_TAMANO)
+                    atexit.register(compartido.cerrar)
+                pool = PoolContextos(compartido, estrategia, cupo=_cupo)
+            else:
+                if _cupo is None:
+                    _cupo = CupoNavegadores(POOL_TAMANO)
+                pool = PoolNavegadores(fabrica=partial(crear_driver, estrategia=estrategia), cupo=_cupo)
+            _pools[estrategia] = pool
+            atexit.register(pool.cerrar)
+            gobernador.iniciar()
+        return pool
+
+
+def calentar_pools(estrategias):
+    """Calienta el pool de cada estrategia repartiendo entre ellos el cupo de navegadores."""
+    estrategias = sorted(set(estrategias)) or ["normal"]
+    for i, estrategia in enumerate(estrategias):
+        pool = obtener_pool(estrategia)
+        pool.calentar(len(range(i, pool.tamano, len(estrategias))))
+
+
+def _estado_pools():
+    estado = {}
+    for estrategia, pool in list(_pools.items()):
+        datos = pool.estadisticas()
+        estado[(estrategia, "libres")] = datos["libres"]
+        estado[(estrategia, "en_uso")] = datos["vivos"] - datos["libres"]
+    return estado
+
+
+POOL_NAVEGADORES = Medidor(
+    "civi_pool_navegadores", "Navegadores del pool por estrategia de carga",
+    ("estrategia", "estado"), funcion=_estado_pools,
+)
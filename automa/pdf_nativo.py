@@ -0,0 +1,359 @@
+import io
+import zlib
+import struct
+
+try:
+    from PIL import Image
+except ImportError:  # sin Pillow los PNG con alfa se decodifican en Python (lento)
+    Image = None
+
+
+# ===================================================
+# 📄 GENERADOR PDF NATIVO
+# ===================================================
+#
+# Escribe informes PDF sin procesos externos: texto con las fuentes
+# estándar (Helvetica) e imágenes JPEG/PNG insertadas directamente.
+# Los JPEG se copian tal cual (DCTDecode) y los PNG sin transparencia
+# reutilizan sus datos comprimidos (FlateDecode + predictor PNG).
+
+CARTA_HORIZONTAL = (792, 612)
+MARGEN = 36
+
+FUENTES = {
+    "normal": "Helvetica",
+    "negrita": "Helvetica-Bold",
+}
+
+
+class ErrorImagen(Exception):
+    pass
+
+
+# ===================================================
+# 🖼️ LECTURA DE IMÁGENES
+# ===================================================
+
+def leer_imagen(ruta):
+    """Devuelve (ancho, alto, diccionario_pdf, datos) listos para un XObject."""
+    with open(ruta, "rb") as archivo:
+        datos = archivo.read()
+
+    if datos[:2] == b"\xff\xd8":
+        return _leer_jpeg(datos)
+    if datos[:8] == b"\x89PNG\r\n\x1a\n":
+        return _leer_png(datos)
+    raise ErrorImagen(f"Formato de imagen no soportado: {ruta}")
+
+
+def _leer_jpeg(datos):
+    i = 2
+    while i < len(datos):
+        if datos[i] != 0xFF:
+            i += 1
+            continue
+        marcador = datos[i + 1]
+        if marcador in (0xD8, 0x01) or 0xD0 <= marcador <= 0xD7:
+            i += 2
+            continue
+        largo = struct.unpack(">H", datos[i + 2:i + 4])[0]
+        # SOF0..SOF15 salvo DHT (C4), JPG (C8) y DAC (CC)
+        if 0xC0 <= marcador <= 0xCF and marcador not in (0xC4, 0xC8, 0xCC):
+            bits = datos[i + 4]
+            alto, ancho = struct.unpack(">HH", datos[i + 5:i + 9])
+            componentes = datos[i + 9]
+            espacio = {1: "/DeviceGray", 3: "/DeviceRGB", 4: "/DeviceCMYK"}[componentes]
+            dic = {
+                "/ColorSpace": espacio,
+                "/BitsPerComponent": bits,
+                "/Filter": "/DCTDecode",
+            }
+            if componentes == 4:
+                dic["/Decode"] = "[1 0 1 0 1 0 1 0]"
+            return ancho, alto, dic, datos
+        i += 2 + largo
+    raise ErrorImagen("JPEG sin cabecera SOF")
+
+
+def _leer_png(datos):
+    i = 8
+    idat, paleta = [], None
+    while i < len(datos):
+        largo, tipo = struct.unpack(">I4s", datos[i:i + 8])
+        contenido = datos[i + 8:i + 8 + largo]
+        if tipo == b"IHDR":
+            ancho, alto, bits, color, _, _, entrelazado = struct.unpack(">IIBBBBB", contenido)
+        elif tipo == b"PLTE":
+            paleta = contenido
+        elif tipo == b"IDAT":
+            idat.append(contenido)
+        elif tipo == b"IEND":
+            break
+        i += 12 + largo
+
+    comprimido = b"".join(idat)
+    if entrelazado:
+        raise ErrorImagen("PNG entrelazado no soportado")
+
+    if color in (4, 6):
+        # Con canal alfa: se descarta la transparencia (capturas opacas)
+        if Image is not None and bits == 8:
+            modo = "L" if color == 4 else "RGB"
+            sin_alfa = Image.open(io.BytesIO(datos)).convert(modo).tobytes()
+        else:
+            sin_alfa = _quitar_alfa(comprimido, ancho, alto, color, bits)
+        return ancho, alto, {
+            "/ColorSpace": "/DeviceGray" if color == 4 else "/DeviceRGB",
+            "/BitsPerComponent": bits,
+            "/Filter": "/FlateDecode",
+        }, zlib.compress(sin_alfa, 6)
+
+    colores = {0: 1, 2: 3, 3: 1}[color]
+    if color == 3:
+        espacio = f"[/Indexed /DeviceRGB {len(paleta) // 3 - 1} <{paleta.hex()}>]"
+    else:
+        espacio = "/DeviceGray" if color == 0 else "/DeviceRGB"
+
+    return ancho, alto, {
+        "/ColorSpace": espacio,
+        "/BitsPerComponent": bits,
+        "/Filter": "/FlateDecode",
+        "/DecodeParms": f"<< /Predictor 15 /Colors {colores} /BitsPerComponent {bits} /Columns {ancho} >>",
+    }, comprimido
+
+
+def _quitar_alfa(comprimido, ancho, alto, color, bits):
+    canales = 2 if color == 4 else 4
+    filas = _desfiltrar_png(zlib.decompress(comprimido), ancho, alto, canales, bits)
+    sin_alfa = bytearray()
+    paso = bits // 8
+    for fila in filas:
+        for x in range(0, len(fila), canales * paso):
+            sin_alfa += fila[x:x + (canales - 1) * paso]
+    return bytes(sin_alfa)
+
+
+def _desfiltrar_png(crudo, ancho, alto, canales, bits):
+    bpp = max(1, canales * bits // 8)
+    ancho_fila = (ancho * canales * bits + 7) // 8
+    filas, anterior = [], bytearray(ancho_fila)
+    pos = 0
+    for _ in range(alto):
+        filtro = crudo[pos]
+        fila = bytearray(crudo[pos + 1:pos + 1 + ancho_fila])
+        pos += 1 + ancho_fila
+
+        if filtro == 1:
+            for x in range(bpp, ancho_fila):
+                fila[x] = (fila[x] + fila[x - bpp]) & 0xFF
+        elif filtro == 2:
+            for x in range(ancho_fila):
+                fila[x] = (fila[x] + anterior[x]) & 0xFF
+        elif filtro == 3:
+            for x in range(ancho_fila):
+                izq = fila[x - bpp] if x >= bpp else 0
+                fila[x] = (fila[x] + ((izq + anterior[x]) >> 1)) & 0xFF
+        elif filtro == 4:
+            for x in range(ancho_fila):
+                a = fila[x - bpp] if x >= bpp else 0
+                b = anterior[x]
+                c = anterior[x - bpp] if x >= bpp else 0
+                p = a + b - c
+                pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+                predictor = a if pa <= pb and pa <= pc else (b if pb <= pc else c)
+                fila[x] = (fila[x] + predictor) & 0xFF
+
+        filas.append(fila)
+        anterior = fila
+    return filas
+
+
+# ===================================================
+# 🧾 DOCUMENTO
+# ===================================================
+
+def _texto_pdf(texto):
+    codificado = texto.encode("cp1252", "replace")
+    return codificado.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+class DocumentoPDF:
+    """
+    Documento PDF sencillo de páginas horizontales con títulos,
+    párrafos e imágenes escaladas al ancho disponible.
+    """
+
+    def __init__(self, tamano=CARTA_HORIZONTAL, margen=MARGEN):
+        self.ancho, self.alto = tamano
+        self.margen = margen
+        self.paginas = []
+        self.imagenes = {}
+        self._cursor = None
+
+    # ---------- contenido ----------
+
+    def agregar_pagina(self):
+        self.paginas.append({"operaciones": [], "imagenes": set()})
+        self._cursor = self.alto - self.margen
+
+    def titulo(self, texto, tamano=18):
+        self._texto(texto, tamano, "negrita", espacio_despues=tamano * 0.6)
+
+    def parrafo(self, texto, tamano=11):
+        for linea in self._partir(texto, tamano):
+            self._texto(linea, tamano, "normal", espacio_despues=tamano * 0.3)
+
+    def imagen(self, ruta, alto_max=None):
+        """Inserta la imagen ajustada al ancho útil y al espacio restante de la página."""
+        if ruta not in self.imagenes:
+            self.imagenes[ruta] = (f"Im{len(self.imagenes) + 1}", leer_imagen(ruta))
+        nombre, (ancho_px, alto_px, _, _) = self.imagenes[ruta]
+
+        # Si queda menos de un tercio de página, la imagen pasa a la siguiente
+        if self._cursor is None or self._cursor - self.margen < self.alto / 3:
+            self.agregar_pagina()
+
+        disponible_ancho = self.ancho - 2 * self.margen
+        disponible_alto = min(alto_max or self.alto, self._cursor - self.margen)
+        escala = min(disponible_ancho / ancho_px, disponible_alto / alto_px)
+        ancho, alto = ancho_px * escala, alto_px * escala
+
+        self._cursor -= alto
+        pagina = self._pagina()
+        pagina["imagenes"].add(nombre)
+        pagina["operaciones"].append(
+            f"q {ancho:.2f} 0 0 {alto:.2f} {self.margen:.2f} {self._cursor:.2f} cm /{nombre} Do Q"
+            .encode()
+        )
+        self._cursor -= 6
+
+    # ---------- escritura ----------
+
+    def guardar(self, salida):
+        """Escribe el PDF en ``salida`` (archivo binario o cualquier objeto con ``write``)."""
+        escritor = _Escritor(salida)
+        escritor.escribir(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+        n_catalogo, n_paginas = 1, 2
+        fuentes = {clave: escritor.reservar() for clave in FUENTES}
+        xobjects = {}
+        for nombre, _ in self.imagenes.values():
+            xobjects[nombre] = escritor.reservar()
+
+        for clave, numero in fuentes.items():
+            escritor.objeto(numero, (
+                f"<< /Type /Font /Subtype /Type1 /BaseFont /{FUENTES[clave]} "
+                f"/Encoding /WinAnsiEncoding >>"
+            ).encode())
+
+        for nombre, (ancho, alto, dic, datos) in self.imagenes.values():
+            entradas = " ".join(f"{k} {v}" for k, v in dic.items())
+            escritor.flujo(xobjects[nombre], (
+                f"/Type /XObject /Subtype /Image /Width {ancho} /Height {alto} {entradas}"
+            ).encode(), datos)
+
+        recursos_fuentes = " ".join(f"/F{i + 1} {n} 0 R" for i, n in enumerate(fuentes.values()))
+        hijos = []
+        for pagina in self.paginas:
+            contenido = zlib.compress(b"\n".join(pagina["operaciones"]), 6)
+            n_contenido = escritor.reservar()
+            escritor.flujo(n_contenido, b"/Filter /FlateDecode", contenido)
+
+            recursos_img = " ".join(f"/{n} {xobjects[n]} 0 R" for n in sorted(pagina["imagenes"]))
+            n_pagina = escritor.reservar()
+            escritor.objeto(n_pagina, (
+                f"<< /Type /Page /Parent {n_paginas} 0 R "
+                f"/MediaBox [0 0 {self.ancho} {self.alto}] "
+                f"/Resources << /Font << {recursos_fuentes} >> /XObject << {recursos_img} >> >> "
+                f"/Contents {n_contenido} 0 R >>"
+            ).encode())
+            hijos.append(n_pagina)
+
+        kids = " ".join(f"{n} 0 R" for n in hijos)
+        escritor.objeto(n_paginas, f"<< /Type /Pages /Kids [{kids}] /Count {len(hijos)} >>".encode())
+        escritor.objeto(n_catalogo, f"<< /Type /Catalog /Pages {n_paginas} 0 R >>".encode())
+        escritor.cerrar(n_catalogo)
+
+    def como_bytes(self):
+        buffer = io.BytesIO()
+        self.guardar(buffer)
+        return buffer.getvalue()
+
+    # ---------- utilitarios internos ----------
+
+    def _pagina(self):
+        if not self.paginas:
+            self.agregar_pagina()
+        return self.paginas[-1]
+
+    def _texto(self, texto, tamano, estilo, espacio_despues=0):
+        pagina = self._pagina()
+        if self._cursor - tamano < self.margen:
+            self.agregar_pagina()
+            pagina = self._pagina()
+
+        self._cursor -= tamano
+        fuente = list(FUENTES).index(estilo) + 1
+        pagina["operaciones"].append(
+            b"BT /F%d %d Tf %.2f %.2f Td (" % (fuente, tamano, self.margen, self._cursor)
+            + _texto_pdf(texto) + b") Tj ET"
+        )
+        self._cursor -= espacio_despues
+
+    def _partir(self, texto, tamano):
+        # Ancho medio aproximado de Helvetica: medio cuerpo por carácter
+        por_linea = max(10, int((self.ancho - 2 * self.margen) / (tamano * 0.5)))
+        lineas = []
+        for bloque in texto.splitlines() or [""]:
+            linea = ""
+            for palabra in bloque.split(" "):
+                if linea and len(linea) + 1 + len(palabra) > por_linea:
+                    lineas.append(linea)
+                    linea = palabra
+                else:
+                    linea = f"{linea} {palabra}" if linea else palabra
+            lineas.append(linea)
+        return lineas
+
+
+class _Escritor:
+    """Lleva los desplazamientos de cada objeto para la tabla xref."""
+
+    def __init__(self, salida):
+        self.salida = salida
+        self.posicion = 0
+        self.desplazamientos = {}
+        self.siguiente = 3  # 1 = catálogo, 2 = árbol de páginas
+
+    def reservar(self):
+        numero = self.siguiente
+        self.siguiente += 1
+        return numero
+
+    def escribir(self, datos):
+        self.salida.write(datos)
+        self.posicion += len(datos)
+
+    def objeto(self, numero, cuerpo):
+        self.desplazamientos[numero] = self.posicion
+        self.escribir(b"%d 0 obj\n" % numero + cuerpo + b"\nendobj\n")
+
+    def flujo(self, numero, diccionario, datos):
+        self.desplazamientos[numero] = self.posicion
+        self.escribir(
+            b"%d 0 obj\n<< " % numero + diccionario + b" /Length %d >>\nstream\n" % len(datos)
+        )
+        self.escribir(datos)
+        self.escribir(b"\nendstream\nendobj\n")
+
+    def cerrar(self, raiz):
+        total = self.siguiente
+        inicio_xref = self.posicion
+        lineas = [b"xref\n0 %d\n" % total, b"0000000000 65535 f \n"]
+        for numero in range(1, total):
+            lineas.append(b"%010d 00000 n \n" % self.desplazamientos[numero])
+        self.escribir(b"".join(lineas))
+        self.escribir(
+            b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+            % (total, raiz, inicio_xref)
+        )
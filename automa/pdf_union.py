@@ -0,0 +1,312 @@
+import io
+import zlib
+import hashlib
+
+from PyPDF2 import PdfReader
+from PyPDF2.generic import (
+    ArrayObject,
+    DictionaryObject,
+    IndirectObject,
+    NameObject,
+    StreamObject,
+)
+
+
+# ===================================================
+# 📎 UNIÓN DE PDFs EN FLUJO
+# ===================================================
+#
+# Copia las páginas de cada PDF de origen al archivo de salida a medida
+# que las lee: los objetos se escriben apenas se resuelven y solo se
+# conserva la tabla de desplazamientos. Así la memoria depende del PDF
+# más grande que se esté leyendo, no de la suma de todos.
+#
+# Los objetos idénticos (fuentes, imágenes, perfiles de color) se
+# escriben una sola vez aunque vengan de PDFs distintos. Con
+# ``comprimir=True`` los objetos sin flujo se agrupan en flujos de
+# objetos (/ObjStm) y la tabla xref se escribe como flujo comprimido.
+
+CATALOGO, PAGINAS = 1, 2
+OBJETOS_POR_FLUJO = 100
+
+CLAVES_OMITIDAS_PAGINA = {"/Parent", "/B"}
+
+
+class UnionPDF:
+    """Escribe en ``salida`` (cualquier objeto con ``write``) la unión de varios PDFs."""
+
+    def __init__(self, salida, comprimir=False):
+        self.salida = salida
+        self.comprimir = comprimir
+        self.posicion = 0
+        self.siguiente = 3
+        self.desplazamientos = {}
+        self.en_flujo = {}
+        self.vistos = {}
+        self.paginas = []
+        self._lote = []
+        self._mapa = {}
+        self._en_curso = {}
+        self._escribir(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+
+    # ---------- API ----------
+
+    def agregar(self, origen):
+        """Agrega todas las páginas de ``origen`` (ruta o flujo binario)."""
+        for _ in self.agregar_por_pagina(origen):
+            pass
+
+    def agregar_por_pagina(self, origen):
+        """Como ``agregar`` pero cede el control después de copiar cada página."""
+        lector = PdfReader(origen)
+        if lector.is_encrypted:
+            lector.decrypt("")
+
+        self._mapa = {}
+        for pagina in lector.pages:
+            self._copiar_pagina(pagina)
+            # Los objetos ya escritos no hace falta mantenerlos en memoria
+            lector.resolved_objects.clear()
+            yield len(self.paginas)
+
+    def cerrar(self):
+        kids = " ".join(f"{n} 0 R" for n in self.paginas)
+        self._objeto(PAGINAS, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.paginas)} >>".encode())
+        self._objeto(CATALOGO, f"<< /Type /Catalog /Pages {PAGINAS} 0 R >>".encode())
+
+        if self.comprimir:
+            self._vaciar_lote()
+            self._xref_en_flujo()
+        else:
+            self._xref_clasica()
+
+    # ---------- copia de objetos ----------
+
+    def _copiar_pagina(self, pagina):
+        numero = self._reservar()
+        referencia = pagina.indirect_reference
+        if referencia is not None:
+            self._mapa[(referencia.idnum, referencia.generation)] = numero
+
+        partes = [b"<< /Parent %d 0 R" % PAGINAS]
+        for clave, valor in pagina.items():
+            if clave in CLAVES_OMITIDAS_PAGINA:
+                continue
+            partes.append(b" " + _primitivo(clave) + b" " + self._serializar(valor))
+        partes.append(b" >>")
+
+        self._objeto(numero, b"".join(partes))
+        self.paginas.append(numero)
+
+    def _copiar_referencia(self, ref):
+        clave = (ref.idnum, ref.generation)
+        if clave in self._mapa:
+            return self._mapa[clave]
+
+        # Referencia circular: se reserva el número y no se deduplica
+        if clave in self._en_curso:
+            if self._en_curso[clave] is None:
+                self._en_curso[clave] = self._reservar()
+            return self._en_curso[clave]
+
+        self._en_curso[clave] = None
+        objeto = ref.get_object()
+        if isinstance(objeto, StreamObject):
+            diccionario, datos = self._serializar_flujo(objeto)
+            cuerpo = diccionario + datos
+        else:
+            cuerpo = self._serializar(objeto)
+        reservado = self._en_curso.pop(clave)
+
+        huella = hashlib.sha1(cuerpo).digest()
+        if reservado is None and huella in self.vistos:
+            numero = self.vistos[huella]
+        else:
+            numero = reservado or self._reservar()
+            if isinstance(objeto, StreamObject):
+                self._flujo(numero, diccionario, datos)
+            else:
+                self._objeto(numero, cuerpo)
+            if reservado is None:
+                self.vistos[huella] = numero
+
+        self._mapa[clave] = numero
+        return numero
+
+    def _serializar(self, objeto):
+        if isinstance(objeto, IndirectObject):
+            return b"%d 0 R" % self._copiar_referencia(objeto)
+
+        if isinstance(objeto, StreamObject):
+            # Un flujo directo no es válido en PDF; se escribe como objeto aparte
+            numero = self._reservar()
+            self._flujo(numero, *self._serializar_flujo(objeto))
+            return b"%d 0 R" % numero
+
+        if isinstance(objeto, DictionaryObject):
+            partes = [b"<<"]
+            for clave, valor in objeto.items():
+                partes.append(b" " + _primitivo(clave) + b" " + self._serializar(valor))
+            partes.append(b" >>")
+            return b"".join(partes)
+
+        if isinstance(objeto, ArrayObject):
+            return b"[" + b" ".join(self._serializar(v) for v in objeto) + b"]"
+
+        return _primitivo(objeto)
+
+    def _serializar_flujo(self, objeto):
+        datos = objeto._data
+        entradas = {k: v for k, v in objeto.items() if k != "/Length"}
+
+        if self.comprimir and "/Filter" not in entradas:
+            datos = zlib.compress(datos, 6)
+            entradas[NameObject("/Filter")] = NameObject("/FlateDecode")
+
+        partes = [b"<<"]
+        for clave, valor in entradas.items():
+            partes.append(b" " + _primitivo(clave) + b" " + self._serializar(valor))
+        partes.append(b" /Length %d >>" % len(datos))
+        return b"".join(partes), datos
+
+    # ---------- escritura ----------
+
+    def _reservar(self):
+        numero = self.siguiente
+        self.siguiente += 1
+        return numero
+
+    def _escribir(self, datos):
+        self.salida.write(datos)
+        self.posicion += len(datos)
+
+    def _objeto(self, numero, cuerpo):
+        if self.comprimir and numero not in (CATALOGO, PAGINAS):
+            self._lote.append((numero, cuerpo))
+            if len(self._lote) >= OBJETOS_POR_FLUJO:
+                self._vaciar_lote()
+            return
+        self.desplazamientos[numero] = self.posicion
+        self._escribir(b"%d 0 obj\n" % numero + cuerpo + b"\nendobj\n")
+
+    def _flujo(self, numero, diccionario, datos):
+        self.desplazamientos[numero] = self.posicion
+        self._escribir(b"%d 0 obj\n" % numero + diccionario + b"\nstream\n")
+        self._escribir(datos)
+        self._escribir(b"\nendstream\nendobj\n")
+
+    def _vaciar_lote(self):
+        if not self._lote:
+            return
+
+        numero_flujo = self._reservar()
+        cabecera, cuerpo = [], io.BytesIO()
+        for indice, (numero, contenido) in enumerate(self._lote):
+            cabecera.append(b"%d %d" % (numero, cuerpo.tell()))
+            cuerpo.write(contenido + b"\n")
+            self.en_flujo[numero] = (numero_flujo, indice)
+
+        cabecera = b" ".join(cabecera) + b"\n"
+        datos = zlib.compress(cabecera + cuerpo.getvalue(), 6)
+        self._flujo(numero_flujo, (
+            b"<< /Type /ObjStm /N %d /First %d /Filter /FlateDecode /Length %d >>"
+            % (len(self._lote), len(cabecera), len(datos))
+        ), datos)
+        self._lote = []
+
+    def _xref_clasica(self):
+        total = self.siguiente
+        inicio = self.posicion
+        lineas = [b"xref\n0 %d\n" % total, b"0000000000 65535 f \n"]
+        for numero in range(1, total):
+            desplazamiento = self.desplazamientos.get(numero)
+            if desplazamiento is None:
+                lineas.append(b"0000000000 65535 f \n")
+            else:
+                lineas.append(b"%010d 00000 n \n" % desplazamiento)
+        self._escribir(b"".join(lineas))
+        self._escribir(
+            b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+            % (total, CATALOGO, inicio)
+        )
+
+    def _xref_en_flujo(self):
+        numero_xref = self._reservar()
+        total = self.siguiente
+        inicio = self.posicion
+        self.desplazamientos[numero_xref] = inicio
+
+        filas = [bytes([0]) + (0).to_bytes(4, "big") + (65535).to_bytes(2, "big")]
+        for numero in range(1, total):
+            if numero in self.en_flujo:
+                contenedor, indice = self.en_flujo[numero]
+                filas.append(bytes([2]) + contenedor.to_bytes(4, "big") + indice.to_bytes(2, "big"))
+            elif numero in self.desplazamientos:
+                filas.append(bytes([1]) + self.desplazamientos[numero].to_bytes(4, "big") + b"\0\0")
+            else:
+                filas.append(bytes([0]) + (0).to_bytes(4, "big") + (65535).to_bytes(2, "big"))
+
+        datos = zlib.compress(b"".join(filas), 6)
+        self._escribir(
+            b"%d 0 obj\n<< /Type /XRef /Size %d /W [1 4 2] /Root %d 0 R "
+            b"/Filter /FlateDecode /Length %d >>\nstream\n"
+            % (numero_xref, total, CATALOGO, len(datos))
+        )
+        self._escribir(datos)
+        self._escribir(b"\nendstream\nendobj\nstartxref\n%d\n%%%%EOF\n" % inicio)
+
+
+def _primitivo(objeto):
+    buffer = io.BytesIO()
+    objeto.write_to_stream(buffer, None)
+    return buffer.getvalue()
+
+
+# ===================================================
+# 🚰 UTILIDADES
+# ===================================================
+
+def unir_pdfs(origenes, destino, comprimir=False):
+    """Une ``origenes`` en el archivo ``destino``."""
+    with open(destino, "wb") as salida:
+        union = UnionPDF(salida, comprimir=comprimir)
+        for origen in origenes:
+            union.agregar(origen)
+        union.cerrar()
+    return destino
+
+
+class _Acumulador:
+    def __init__(self, copia=None):
+        self.partes = []
+        self.copia = copia
+
+    def write(self, datos):
+        self.partes.append(datos)
+        if self.copia is not None:
+            self.copia.write(datos)
+
+    def vaciar(self):
+        datos = b"".join(self.partes)
+        self.partes = []
+        return datos
+
+
+def unir_pdfs_en_flujo(origenes, copia=None, comprimir=False):
+    """
+    Generador que produce la unión por trozos (uno por página), listo
+    para ``StreamingHttpResponse``. Si se indica ``copia`` (ruta) el
+    resultado también se guarda en disco.
+    """
+    archivo_copia = open(copia, "wb") if copia else None
+    try:
+        acumulador = _Acumulador(archivo_copia)
+        union = UnionPDF(acumulador, comprimir=comprimir)
+        for origen in origenes:
+            for _ in union.agregar_por_pagina(origen):
+                yield acumulador.vaciar()
+        union.cerrar()
+        yield acumulador.vaciar()
+    finally:
+        if archivo_copia:
+            archivo_copia.close()
@@ -0,0 +1,417 @@
+import logging
+
+from selenium.webdriver.common.by import By
+
+from .adaptadores import ADAPTADORES
+from .capturas import opciones_captura
+from .esperas import ESPERAS_POR_DEFECTO, TIMEOUT_CONDICION, metodo_selector
+from .navegadores import ESTRATEGIAS_CARGA
+
+
+# ===================================================
+# 🗺️ COMPILADOR DE PLANES POR PORTAL
+# ===================================================
+#
+# ``paginas`` se valida y se compila una sola vez al importar el
+# módulo. El plan resultante:
+#
+#   * resuelve de antemano el ``By`` de cada selector,
+#   * agrupa secuencias de zoom/scroll/click en un solo
+#     ``execute_async_script`` (un viaje a chromedriver en vez de uno
+#     por acción y otro por cada espera),
+#   * descarta eventos "captura" que repetirían un cuadro ya tomado.
+#
+# Un evento puede excluirse de la fusión con ``"fusionar": False`` (p. ej.
+# clicks que navegan a otra página), y un portal completo con la misma
+# clave en su configuración.
+
+class ErrorConfiguracion(Exception):
+    pass
+
+
+# Claves obligatorias por tipo de evento
+TIPOS_EVENTO = {
+    "scroll": ("valor",),
+    "zoom": ("valor",),
+    "retraso": ("valor",),
+    "click": ("selector",),
+    "espera_y_click": ("selector",),
+    "click_recaptcha": (),
+    "escribir": ("selector", "texto"),
+    "teclado": ("selector", "tecla"),
+    "captura": (),
+}
+
+TIPOS_CONDICION = {
+    "visible": ("selector",),
+    "oculto": ("selector",),
+    "dom_quieto": (),
+    "red_inactiva": (),
+    "cambio_url": (),
+    "retraso": ("valor",),
+}
+
+ACCIONES_FUSIONABLES = {"zoom", "scroll", "click", "espera_y_click"}
+
+# "cambio_url" no se puede esperar dentro del script: la navegación lo corta
+CONDICIONES_FUSIONABLES = {"visible", "oculto", "dom_quieto", "red_inactiva", "retraso"}
+
+SIN_CAPTURA_AUTOMATICA = ("retraso", "captura")
+
+
+# ===================================================
+# ✅ VALIDACIÓN
+# ===================================================
+
+def _validar_condiciones(prefijo, condiciones, errores):
+    if not isinstance(condiciones, list):
+        errores.append(f"{prefijo}: 'esperar' debe ser una lista")
+        return
+    for condicion in condiciones:
+        tipo = condicion.get("tipo") if isinstance(condicion, dict) else None
+        if tipo not in TIPOS_CONDICION:
+            errores.append(f"{prefijo}: condición de espera desconocida {tipo!r}")
+            continue
+        for clave in TIPOS_CONDICION[tipo]:
+            if clave not in condicion:
+                errores.append(f"{prefijo}: la condición '{tipo}' requiere '{clave}'")
+
+
+def capturas_posibles(config):
+    """Nombres de cuadro que el portal puede producir."""
+    nombres = {"input", "final"}
+    for i, evento in enumerate(config.get("extra_eventos", []), start=1):
+        if evento.get("tipo") == "captura":
+            nombres.add(evento.get("descripcion", f"evento_{i}"))
+        elif evento.get("tipo") not in SIN_CAPTURA_AUTOMATICA:
+            nombres.add(f"evento_{i}")
+    return nombres
+
+
+def validar_portal(nombre, config):
+    """Lista de problemas de la configuración del portal (vacía si es válida)."""
+    errores = []
+
+    url = config.get("url")
+    if not isinstance(url, str) or not url.startswith(("http://", "https://", "file://")):
+        errores.append(f"{nombre}: 'url' inválida: {url!r}")
+
+    if "input_selector" in config and not isinstance(config["input_selector"], str):
+        errores.append(f"{nombre}: 'input_selector' debe ser texto")
+    if not isinstance(config.get("eventos_teclado", []), list):
+        errores.append(f"{nombre}: 'eventos_teclado' debe ser una lista")
+    if config.get("estrategia_carga", "normal") not in ESTRATEGIAS_CARGA:
+        errores.append(f"{nombre}: 'estrategia_carga' debe ser una de {ESTRATEGIAS_CARGA}")
+    if not isinstance(config.get("plazo", 0), (int, float)):
+        errores.append(f"{nombre}: 'plazo' debe ser un número de segundos")
+    circuito = config.get("circuito", {})
+    if not isinstance(circuito, dict) or set(circuito) - {"umbral", "espera", "espera_max"}:
+        errores.append(f"{nombre}: 'circuito' solo admite umbral, espera y espera_max")
+
+    bloquear = config.get("bloquear", [])
+    if not isinstance(bloquear, list) or not all(isinstance(b, str) for b in bloquear):
+        errores.append(f"{nombre}: 'bloquear' debe ser una lista de textos")
+    if "esperar_teclado" in config:
+        _validar_condiciones(f"{nombre}.esperar_teclado", config["esperar_teclado"], errores)
+
+    for i, evento in enumerate(config.get("extra_eventos", []), start=1):
+        prefijo = f"{nombre}.evento_{i}"
+        tipo = evento.get("tipo") if isinstance(evento, dict) else None
+        if tipo not in TIPOS_EVENTO:
+            errores.append(f"{prefijo}: tipo de evento desconocido {tipo!r}")
+            continue
+        for clave in TIPOS_EVENTO[tipo]:
+            if clave not in evento:
+                errores.append(f"{prefijo}: el evento '{tipo}' requiere '{clave}'")
+        if "esperar" in evento:
+            _validar_condiciones(prefijo, evento["esperar"], errores)
+
+    politica = config.get("capturas")
+    if politica is not None:
+        posibles = capturas_posibles(config)
+        for entrada in politica:
+            cuadro = entrada.get("nombre") if isinstance(entrada, dict) else entrada
+            if cuadro not in posibles:
+                errores.append(f"{nombre}: la captura {cuadro!r} no corresponde a ningún evento")
+
+    http = config.get("http")
+    if http and http.get("adaptador") not in ADAPTADORES:
+        errores.append(f"{nombre}: adaptador HTTP desconocido {http.get('adaptador')!r}")
+
+    return errores
+
+
+# ===================================================
+# 🧩 COMPILACIÓN
+# ===================================================
+
+def _resolver(evento):
+    """Copia del evento con el ``By`` del selector ya resuelto."""
+    evento = dict(evento)
+    if "selector" in evento:
+        evento["by"] = metodo_selector(evento["selector"])
+    return evento
+
+
+def _fusionable(evento, config):
+    if not config.get("fusionar", True) or not evento.get("fusionar", True):
+        return False
+    if evento["tipo"] not in ACCIONES_FUSIONABLES:
+        return False
+    condiciones = evento.get("esperar", ESPERAS_POR_DEFECTO.get(evento["tipo"])) or []
+    return all(c["tipo"] in CONDICIONES_FUSIONABLES for c in condiciones)
+
+
+def _accion_js(evento):
+    """Acción tal como la recibe ``SCRIPT_LOTE``."""
+    accion = {"tipo": evento["tipo"]}
+    if evento["tipo"] in ("zoom", "scroll"):
+        accion["valor"] = evento["valor"]
+    else:
+        accion["selector"] = evento["selector"]
+        accion["xpath"] = evento["by"] == By.XPATH
+        accion["timeout"] = evento.get("timeout", TIMEOUT_CONDICION) * 1000
+
+    accion["esperar"] = [
+        {
+            "tipo": c["tipo"],
+            "ms": c.get("ms", 300),
+            "valor": c.get("valor", 0),
+            "selector": c.get("selector", ""),
+            "xpath": c.get("selector", "").startswith("//"),
+            "timeout": c.get("timeout", TIMEOUT_CONDICION) * 1000,
+        }
+        for c in (evento.get("esperar", ESPERAS_POR_DEFECTO.get(evento["tipo"])) or [])
+    ]
+    return accion
+
+
+def _limite_lote(acciones):
+    """Tiempo máximo del script de un lote, en segundos."""
+    milisegundos = sum(
+        a.get("timeout", 0) + sum(c["timeout"] + c["valor"] * 1000 for c in a["esperar"])
+        for a in acciones
+    )
+    return milisegundos / 1000 + 2
+
+
+def _paso_lote(grupo):
+    acciones = [_accion_js(evento) for _, evento in grupo]
+    return {
+        "tipo": "lote",
+        "indices": [i for i, _ in grupo],
+        "eventos": [evento for _, evento in grupo],
+        "acciones": acciones,
+        "limite": _limite_lote(acciones),
+    }
+
+
+def compilar_portal(nombre, config):
+    """Valida y compila un portal; lanza ``ErrorConfiguracion`` si es inválido."""
+    errores = validar_portal(nombre, config)
+    if errores:
+        raise ErrorConfiguracion("; ".join(errores))
+
+    eventos = [(i, _resolver(e)) for i, e in enumerate(config.get("extra_eventos", []), start=1)]
+
+    def capturado(i, evento):
+        return (
+            evento["tipo"] not in SIN_CAPTURA_AUTOMATICA
+            and opciones_captura(config, f"evento_{i}") is not None
+        )
+
+    pasos, descartadas, grupo = [], [], []
+
+    def cerrar_grupo():
+        if len(grupo) > 1:
+            pasos.append(_paso_lote(list(grupo)))
+        elif grupo:
+            pasos.append({"tipo": "evento", "indice": grupo[0][0], "evento": grupo[0][1]})
+        grupo.clear()
+
+    for posicion, (i, evento) in enumerate(eventos):
+        if evento["tipo"] == "captura":
+            cerrar_grupo()
+            descripcion = evento.get("descripcion", f"evento_{i}")
+            anterior = pasos[-1] if pasos else None
+            ultimo = posicion == len(eventos) - 1
+            repetida = (
+                (anterior is not None and anterior.get("capturado"))
+                or (ultimo and config.get("captura_pantalla"))
+            )
+            if repetida and opciones_captura(config, descripcion) is None:
+                descartadas.append(descripcion)
+                continue
+            pasos.append({"tipo": "evento", "indice": i, "evento": evento, "capturado": True})
+            continue
+
+        if not _fusionable(evento, config):
+            cerrar_grupo()
+            pasos.append({
+                "tipo": "evento", "indice": i, "evento": evento, "capturado": capturado(i, evento),
+            })
+            continue
+
+        grupo.append((i, evento))
+        # Un cuadro pedido cierra el lote: la captura va justo después
+        if capturado(i, evento):
+            cerrar_grupo()
+            pasos[-1]["capturado"] = True
+
+    cerrar_grupo()
+
+    selector = config.get("input_selector")
+    return {
+        "nombre": nombre,
+        "input_by": metodo_selector(selector) if selector else None,
+        "pasos": pasos,
+        "descartadas": descartadas,
+    }
+
+
+def compilar_paginas(paginas):
+    """Compila todos los portales; reporta juntos los errores de todos ellos."""
+    planes, errores = {}, []
+    for nombre, config in paginas.items():
+        try:
+            planes[nombre] = compilar_portal(nombre, config)
+        except ErrorConfiguracion as e:
+            errores.append(str(e))
+
+    if errores:
+        raise ErrorConfiguracion("Configuración de páginas inválida: " + " | ".join(errores))
+
+    for nombre, plan in planes.items():
+        viajes = len(plan["pasos"])
+        eventos = len(paginas[nombre].get("extra_eventos", []))
+        if viajes < eventos:
+            logging.info(f"{nombre} - Plan compilado: {eventos} eventos en {viajes} pasos")
+    return planes
+
+
+# ===================================================
+# 📜 SCRIPT DE UN LOTE DE ACCIONES
+# ===================================================
+#
+# Recibe la lista de acciones compiladas, el tiempo máximo y la clave de
+# progreso en sessionStorage, además del callback de execute_async_script.
+# Retorna cuántas acciones completó, las esperas que vencieron y el error
+# que detuvo el lote (si hubo); el llamador continúa evento por evento
+# desde la primera acción no completada. Si el script se corta sin
+# responder, la clave dice cuántas acciones alcanzaron a dispararse.
+
+SCRIPT_LOTE = """
+const acciones = arguments[0];
+const fin = Date.now() + arguments[1];
+const clave = arguments[2];
+const listo = arguments[arguments.length - 1];
+const vencidas = [];
+let hechas = 0;
+
+// Acciones ya disparadas, en sessionStorage: si el script se corta (timeout
+// o navegación tras un click) Python sabe cuáles no debe repetir
+const marcar = (n) => { try { sessionStorage.setItem(clave, String(n)); } catch (e) {} };
+const terminar = (resultado) => {
+    try { sessionStorage.removeItem(clave); } catch (e) {}
+    listo(resultado);
+};
+marcar(0);
+
+const dormir = (ms) => new Promise(r => setTimeout(r, ms));
+const buscar = (selector, xpath) => xpath
+    ? document.evaluate(selector, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue
+    : document.querySelector(selector);
+const visible = (el) => !!el && el.getClientRects().length > 0
+    && getComputedStyle(el).visibility !== "hidden";
+
+// Ninguna espera pasa del plazo que le queda al trabajo
+const recortar = (ms) => Math.max(0, Math.min(ms, fin - Date.now()));
+
+const hasta = async (condicion, limite) => {
+    const hastaMs = Date.now() + recortar(limite);
+    while (Date.now() < hastaMs) {
+        if (condicion()) return true;
+        await dormir(50);
+    }
+    return condicion();
+};
+
+const domQuieto = (ms, limite) => new Promise(resolver => {
+    const inicio = Date.now();
+    let ultimo = Date.now();
+    const observer = new MutationObserver(() => { ultimo = Date.now(); });
+    observer.observe(document, {childList: true, subtree: true, attributes: true, characterData: true});
+    const revisar = () => {
+        const ahora = Date.now();
+        if (ahora - ultimo >= ms || ahora - inicio >= limite) {
+            observer.disconnect();
+            resolver(ahora - ultimo >= ms);
+        } else {
+            setTimeout(revisar, 50);
+        }
+    };
+    setTimeout(revisar, 50);
+});
+
+const redInactiva = (ms, limite) => {
+    let recursos = performance.getEntriesByType("resource").length;
+    let ultimo = Date.now();
+    return hasta(() => {
+        const ahora = Date.now();
+        const actuales = performance.getEntriesByType("resource").length;
+        if (actuales !== recursos) { recursos = actuales; ultimo = ahora; }
+        if (window.__civiUltimaRed) { ultimo = Math.max(ultimo, window.__civiUltimaRed); }
+        return document.readyState === "complete" && !window.__civiPendientes && ahora - ultimo >= ms;
+    }, limite);
+};
+
+const esperar = async (c) => {
+    if (c.tipo === "visible") return hasta(() => visible(buscar(c.selector, c.xpath)), c.timeout);
+    if (c.tipo === "oculto") return hasta(() => !visible(buscar(c.selector, c.xpath)), c.timeout);
+    if (c.tipo === "dom_quieto") return domQuieto(c.ms, recortar(c.timeout));
+    if (c.tipo === "red_inactiva") return redInactiva(c.ms, c.timeout);
+    if (c.tipo === "retraso") { await dormir(recortar(c.valor * 1000)); return true; }
+    return true;
+};
+
+(async () => {
+    try {
+        for (const a of acciones) {
+            if (Date.now() >= fin) {
+                terminar({hechas, vencidas, error: "Plazo agotado"});
+                return;
+            }
+            if (a.tipo === "zoom") {
+                document.body.style.zoom = String(a.valor);
+            } else if (a.tipo === "scroll") {
+                window.scrollBy(0, a.valor);
+            } else {
+                let el = null;
+                await hasta(() => visible(el = buscar(a.selector, a.xpath)) && !el.disabled, a.timeout);
+                if (!visible(el)) {
+                    terminar({hechas, vencidas, error: "Elemento no encontrado: " + a.selector});
+                    return;
+                }
+                el.scrollIntoView({block: "center"});
+                marcar(hechas + 1);
+                el.click();
+            }
+            marcar(hechas + 1);
+            for (const c of a.esperar) {
+                if (!(await esperar(c))) vencidas.push(hechas + ":" + c.tipo);
+            }
+            hechas += 1;
+        }
+        terminar({hechas, vencidas, error: null});
+    } catch (e) {
+        terminar({hechas, vencidas, error: String(e)});
+    }
+})();
+"""
+
+# Lee (y borra) el progreso que dejó un lote que no alcanzó a responder
+SCRIPT_PROGRESO_LOTE = """
+const valor = sessionStorage.getItem(arguments[0]);
+sessionStorage.removeItem(arguments[0]);
+return valor;
+"""
@@ -0,0 +1,59 @@
+import time
+
+from django.conf import settings
+
+
+# ===================================================
+# ⏳ PLAZO (PRESUPUESTO DE TIEMPO) DE UN TRABAJO
+# ===================================================
+#
+# Un ``Plazo`` se crea al iniciar la consulta y viaja hasta cada espera:
+# cada paso usa ``plazo.limitar(timeout_del_paso)``, es decir el menor
+# entre su propio timeout y lo que le queda al trabajo. Cuando el plazo
+# se agota los pasos restantes se omiten y la consulta termina con lo
+# que alcanzó a obtener.
+
+PLAZO_TRABAJO = getattr(settings, "CIVI_PLAZO_TRABAJO", 120)
+
+
+class PlazoAgotado(Exception):
+    pass
+
+
+class Plazo:
+    def __init__(self, segundos=PLAZO_TRABAJO, fin=None, padre=None):
+        self.fin = fin if fin is not None else time.monotonic() + segundos
+        self.padre = padre
+        self.cancelado = False
+
+    def restante(self):
+        if self.cancelado or (self.padre is not None and self.padre.agotado()):
+            return 0.0
+        return max(0.0, self.fin - time.monotonic())
+
+    def agotado(self):
+        return self.restante() <= 0
+
+    def limitar(self, timeout):
+        """Timeout de un paso recortado a lo que queda del plazo."""
+        return min(timeout, self.restante())
+
+    def hijo(self, segundos=None):
+        """Plazo para una parte del trabajo (p. ej. un portal) que nunca excede al padre."""
+        if segundos is None:
+            return Plazo(fin=self.fin, padre=self)
+        return Plazo(fin=min(self.fin, time.monotonic() + segundos), padre=self)
+
+    def cancelar(self):
+        """Agota el plazo ya (y el de sus hijos): los pasos pendientes se omiten."""
+        self.cancelado = True
+
+    def verificar(self, paso=""):
+        if self.agotado():
+            raise PlazoAgotado(f"Plazo agotado antes de: {paso}" if paso else "Plazo agotado")
+
+    def __repr__(self):
+        return f"Plazo(restante={self.restante():.1f}s)"
+
+
+SIN_LIMITE = Plazo(fin=float("inf"))
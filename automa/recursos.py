@@ -0,0 +1,154 @@
+import json
+import logging
+
+from django.conf import settings
+
+
+# ===================================================
+# 🚫 BLOQUEO DE RECURSOS POR PORTAL (CDP)
+# ===================================================
+#
+# Cada portal puede declarar en ``paginas`` qué peticiones no hacen
+# falta para la captura o la descarga:
+#
+#     "bloquear": ["analitica", "fuentes", "video", "*chat-widget*"],
+#     "sin_imagenes": True,
+#
+# Los nombres de GRUPOS_BLOQUEO se expanden a sus patrones; el resto se
+# pasa tal cual a ``Network.setBlockedURLs`` (``*`` es comodín). Con
+# ``sin_imagenes`` las imágenes se bloquean durante la navegación y se
+# vuelven a cargar justo antes de la captura final.
+
+GRUPOS_BLOQUEO = {
+    "analitica": [
+        "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+        "*connect.facebook.net*", "*hotjar.com*", "*clarity.ms*", "*newrelic.com*",
+    ],
+    "fuentes": ["*.woff*", "*.ttf*", "*.otf*", "*.eot*", "*fonts.googleapis.com*", "*fonts.gstatic.com*"],
+    "video": ["*.mp4*", "*.webm*", "*.m3u8*", "*youtube.com/embed*", "*player.vimeo.com*"],
+}
+
+PATRONES_IMAGENES = ["*.png*", "*.jpg*", "*.jpeg*", "*.gif*", "*.webp*", "*.svg*", "*.ico*"]
+
+# Se aplica a todos los portales además de su propia lista
+BLOQUEO_GLOBAL = getattr(settings, "CIVI_BLOQUEO_GLOBAL", ["analitica"])
+BLOQUEO_REPORTE = getattr(settings, "CIVI_BLOQUEO_REPORTE", True)
+
+# Tamaño promedio por tipo de recurso (bytes) para estimar el ahorro:
+# las peticiones bloqueadas nunca se descargan, así que no hay tamaño real.
+TAMANO_ESTIMADO = {
+    "Image": 35_000,
+    "Font": 45_000,
+    "Script": 60_000,
+    "Stylesheet": 20_000,
+    "Media": 800_000,
+    "XHR": 5_000,
+    "Fetch": 5_000,
+}
+TAMANO_ESTIMADO_OTRO = 10_000
+
+_SCRIPT_RECARGAR_IMAGENES = """
+const listo = arguments[arguments.length - 1];
+const rotas = Array.from(document.images).filter(img => img.src && (!img.complete || img.naturalWidth === 0));
+if (!rotas.length) { listo(0); return; }
+let pendientes = rotas.length;
+const terminar = () => { if (--pendientes === 0) listo(rotas.length); };
+for (const img of rotas) {
+    img.addEventListener("load", terminar, {once: true});
+    img.addEventListener("error", terminar, {once: true});
+    const src = img.src;
+    img.src = "";
+    img.src = src;
+}
+setTimeout(() => listo(rotas.length), 4000);
+"""
+
+
+def patrones_portal(config, con_imagenes=False):
+    patrones = []
+    for entrada in list(BLOQUEO_GLOBAL) + list(config.get("bloquear", [])):
+        patrones += GRUPOS_BLOQUEO.get(entrada, [entrada])
+    if config.get("sin_imagenes") and not con_imagenes:
+        patrones += PATRONES_IMAGENES
+    # Sin duplicados y en orden estable
+    return list(dict.fromkeys(patrones))
+
+
+def aplicar_bloqueo(driver, config):
+    """Activa las reglas de bloqueo del portal en el driver."""
+    patrones = patrones_portal(config)
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patrones})
+    except Exception as e:
+        logging.warning(f"No se pudo configurar el bloqueo de recursos: {e}")
+    return patrones
+
+
+def restaurar_imagenes(driver, config, pagina=""):
+    """Quita el bloqueo de imágenes y recarga las que no cargaron, antes de la captura final."""
+    if not config.get("sin_imagenes"):
+        return
+    try:
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patrones_portal(config, con_imagenes=True)})
+        driver.set_script_timeout(5)
+        recargadas = driver.execute_async_script(_SCRIPT_RECARGAR_IMAGENES)
+        if recargadas:
+            print(f"🖼️ {recargadas} imagen(es) recargadas para la captura final de {pagina}")
+    except Exception as e:
+        logging.warning(f"{pagina} - No se pudieron restaurar las imágenes: {e}")
+
+
+def quitar_bloqueo(driver):
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": []})
+
+
+# ===================================================
+# 📉 AHORRO (peticiones y bytes)
+# ===================================================
+
+def activar_registro(chrome_options):
+    """Registro de red de chromedriver, de donde se leen las peticiones bloqueadas."""
+    if not BLOQUEO_REPORTE:
+        return
+    chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    chrome_options.add_experimental_option("perfLoggingPrefs", {"enableNetwork": True, "enablePage": False})
+
+
+def leer_bloqueos(driver):
+    """
+    Vacía el registro de red del driver y cuenta las peticiones que
+    Chrome rechazó por las reglas de bloqueo. Retorna
+    ``{"peticiones": n, "bytes_estimados": b, "por_tipo": {...}}``.
+    """
+    por_tipo = {}
+    if BLOQUEO_REPORTE:
+        try:
+            entradas = driver.get_log("performance")
+        except Exception:
+            entradas = []
+
+        for entrada in entradas:
+            try:
+                mensaje = json.loads(entrada["message"])["message"]
+            except (KeyError, ValueError):
+                continue
+            if mensaje.get("method") != "Network.loadingFailed":
+                continue
+            if mensaje.get("params", {}).get("blockedReason") is None:
+                continue
+            tipo = mensaje["params"].get("type", "Other")
+            por_tipo[tipo] = por_tipo.get(tipo, 0) + 1
+
+    return {
+        "peticiones": sum(por_tipo.values()),
+        "bytes_estimados": sum(TAMANO_ESTIMADO.get(t, TAMANO_ESTIMADO_OTRO) * n for t, n in por_tipo.items()),
+        "por_tipo": por_tipo,
+    }
+
+
+def resumen_bloqueos(datos):
+    """Suma el ahorro de todos los portales (``datos`` del resultado del trabajo)."""
+    peticiones = sum(d.get("bloqueo", {}).get("peticiones", 0) for d in datos.values())
+    estimados = sum(d.get("bloqueo", {}).get("bytes_estimados", 0) for d in datos.values())
+    return {"peticiones": peticiones, "bytes_estimados": estimados}
@@ -0,0 +1,70 @@
+import atexit
+import queue
+import logging
+import logging.handlers
+
+from django.conf import settings
+
+
+# ===================================================
+# 📝 REGISTRO (LOGS) SIN BLOQUEAR A LOS HILOS DE TRABAJO
+# ===================================================
+#
+# Los hilos de los portales solo encolan el registro (QueueHandler); un
+# único hilo (QueueListener) lo escribe a disco. Así una escritura lenta
+# nunca frena un paso de Selenium.
+#
+#   errores.log  → advertencias y errores de la aplicación (rotativo)
+#   tiempos.log  → una línea JSON por tramo medido (logger "civi.tiempos")
+
+LOG_ERRORES = getattr(settings, "CIVI_LOG_ERRORES", "errores.log")
+LOG_NIVEL = getattr(settings, "CIVI_LOG_NIVEL", "ERROR")
+LOG_TIEMPOS = getattr(settings, "CIVI_LOG_TIEMPOS", "tiempos.log")
+LOG_MAX_BYTES = getattr(settings, "CIVI_LOG_MAX_BYTES", 5 * 1024 * 1024)
+LOG_COPIAS = getattr(settings, "CIVI_LOG_COPIAS", 3)
+
+FORMATO = "%(asctime)s - %(levelname)s - %(message)s"
+
+_listener = None
+
+
+def _archivo(ruta, nivel, formato, filtro=None):
+    manejador = logging.handlers.RotatingFileHandler(
+        ruta, maxBytes=LOG_MAX_BYTES, backupCount=LOG_COPIAS, encoding="utf-8", delay=True,
+    )
+    manejador.setLevel(nivel)
+    manejador.setFormatter(logging.Formatter(formato))
+    if filtro is not None:
+        manejador.addFilter(filtro)
+    return manejador
+
+
+def configurar_registro():
+    """Instala la cola de registro en el logger raíz (una sola vez por proceso)."""
+    global _listener
+    if _listener is not None:
+        return
+
+    nivel = logging.getLevelName(LOG_NIVEL)
+    manejadores = [
+        _archivo(LOG_ERRORES, nivel, FORMATO, lambda r: not r.name.startswith("civi.tiempos")),
+    ]
+
+    tiempos = logging.getLogger("civi.tiempos")
+    if LOG_TIEMPOS:
+        manejadores.append(_archivo(
+            LOG_TIEMPOS, logging.INFO, "%(message)s", lambda r: r.name.startswith("civi.tiempos"),
+        ))
+        tiempos.setLevel(logging.INFO)
+    else:
+        tiempos.setLevel(logging.WARNING)
+
+    cola = queue.SimpleQueue()
+    raiz = logging.getLogger()
+    raiz.addHandler(logging.handlers.QueueHandler(cola))
+    # "civi.tiempos" tiene su propio nivel; el raíz no filtra lo que propaga
+    raiz.setLevel(nivel)
+
+    _listener = logging.handlers.QueueListener(cola, *manejadores, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
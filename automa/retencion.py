@@ -0,0 +1,344 @@
+import os
+import time
+import shutil
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from .almacen import NOMBRE_MANIFIESTO, carpeta_blobs
+from .catalogo import CARPETA_DESCARGAS, ruta_absoluta
+from .metricas import Contador, Medidor
+from .models import Artefacto, Trabajo
+
+
+# ===================================================
+# 🧹 RETENCIÓN DE ARTEFACTOS EN SEGUNDO PLANO
+# ===================================================
+#
+# Cada ``CIVI_RETENCION_INTERVALO`` segundos un hilo:
+#
+#   1. borra los artefactos vencidos según su tipo (capturas, HTML,
+#      descargas de portales, informes), del más antiguo al más nuevo;
+#   2. si el catálogo pasa la cuota, desaloja los usados hace más
+#      tiempo (``Artefacto.accedido``) hasta quedar bajo ella;
+#   3. recorre una parte del almacén de blobs y borra los que ya no
+#      enlaza ningún trabajo (un solo enlace: el propio blob).
+#
+# Nunca toca archivos de trabajos en cola o en proceso (su carpeta, sus
+# artefactos ni el informe de su documento). Trabaja por lotes con una
+# pausa entre ellos para no acaparar la base de datos ni el disco.
+
+DIAS = 24 * 3600
+RETENCION_TTL = {
+    Artefacto.CAPTURA: 7 * DIAS,
+    Artefacto.HTML: 7 * DIAS,
+    Artefacto.ARCHIVO: 30 * DIAS,
+    Artefacto.INFORME: 90 * DIAS,
+    **getattr(settings, "CIVI_RETENCION_TTL", {}),
+}
+RETENCION_CUOTA_MB = getattr(settings, "CIVI_RETENCION_CUOTA_MB", None)
+RETENCION_INTERVALO = getattr(settings, "CIVI_RETENCION_INTERVALO", 600)
+RETENCION_LOTE = getattr(settings, "CIVI_RETENCION_LOTE", 200)
+RETENCION_PAUSA = 0.5          # segundos entre lotes
+BLOBS_POR_PASADA = 16          # de las 256 carpetas ab/ del almacén
+BLOB_GRACIA = 600              # un blob recién desenlazado puede estar reenlazándose
+
+ACTIVOS = (Trabajo.EN_COLA, Trabajo.EN_PROCESO)
+
+
+# ===================================================
+# 🛡️ PROTECCIÓN DE TRABAJOS EN CURSO
+# ===================================================
+
+class Protegidos:
+    """Lo que usan los trabajos activos, leído al empezar cada lote."""
+
+    def __init__(self):
+        activos = list(Trabajo.objects.filter(estado__in=ACTIVOS).values_list("pk", "carpeta"))
+        self.trabajos = {pk for pk, _ in activos}
+        self.carpetas = tuple(c.rstrip("/") + "/" for _, c in activos if c)
+
+    def incluye(self, artefacto):
+        return artefacto.trabajo_id in self.trabajos or artefacto.ruta.startswith(self.carpetas)
+
+    def incluye_carpeta(self, relativa):
+        return (relativa.rstrip("/") + "/").startswith(self.carpetas)
+
+
+# ===================================================
+# 🗑️ BORRADO POR LOTES
+# ===================================================
+
+def _lote(consulta, campo, cursor, cantidad=RETENCION_LOTE):
+    """
+    Siguiente lote de ``consulta`` en orden ``(campo, pk)`` después de
+    ``cursor``. Retorna ``(borrables, protegidos, cursor)``; el cursor es
+    ``None`` cuando no quedan filas.
+    """
+    if cursor is not None:
+        valor, pk = cursor
+        consulta = consulta.filter(Q(**{f"{campo}__gt": valor}) | Q(**{campo: valor, "pk__gt": pk}))
+    filas = list(consulta.order_by(campo, "pk")[:cantidad])
+    if not filas:
+        return [], None, None
+
+    protegidos = Protegidos()
+    borrables = [a for a in filas if not protegidos.incluye(a)]
+    return borrables, protegidos, (getattr(filas[-1], campo), filas[-1].pk)
+
+
+def _borrar(artefactos, protegidos, motivo, simular=False):
+    """Borra archivos y registros; retorna los bytes liberados según el catálogo."""
+    if simular:
+        return sum(a.tamano for a in artefactos)
+
+    borrados, carpetas = [], set()
+    for artefacto in artefactos:
+        ruta = ruta_absoluta(artefacto.ruta)
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logging.warning(f"Retención - No se pudo borrar {artefacto.ruta}: {e}")
+            continue
+        borrados.append(artefacto)
+        carpetas.add(os.path.dirname(ruta))
+
+    Artefacto.objects.filter(pk__in=[a.pk for a in borrados]).delete()
+    for carpeta in carpetas:
+        _podar(carpeta, protegidos)
+
+    ELIMINADOS_TOTAL.inc(motivo, cantidad=len(borrados))
+    return sum(a.tamano for a in borrados)
+
+
+def _podar(carpeta, protegidos):
+    """
+    Quita la carpeta si quedó vacía (o solo con su manifiesto) y sube
+    mientras las carpetas padre también queden vacías.
+    """
+    base = os.path.abspath(CARPETA_DESCARGAS)
+    carpeta = os.path.abspath(carpeta)
+    while carpeta.startswith(base + os.sep):
+        if protegidos.incluye_carpeta(os.path.relpath(carpeta, settings.MEDIA_ROOT).replace(os.sep, "/")):
+            return
+        try:
+            contenido = os.listdir(carpeta)
+        except FileNotFoundError:
+            contenido = []
+        if contenido == [NOMBRE_MANIFIESTO]:
+            shutil.rmtree(carpeta, ignore_errors=True)
+        elif contenido:
+            return
+        else:
+            try:
+                os.rmdir(carpeta)
+            except OSError:
+                return
+        carpeta = os.path.dirname(carpeta)
+
+
+def _pausa(simular):
+    if not simular:
+        time.sleep(RETENCION_PAUSA)
+
+
+# ===================================================
+# ⏳ VENCIMIENTO POR TIPO
+# ===================================================
+
+def vencer(ahora=None, simular=False, max_lotes=None):
+    """Borra los artefactos más viejos que el TTL de su tipo; retorna ``(cantidad, bytes)``."""
+    ahora = ahora or timezone.now()
+    vencidos = Q()
+    for tipo, ttl in RETENCION_TTL.items():
+        if ttl:
+            vencidos |= Q(tipo=tipo, creado__lt=ahora - timedelta(seconds=ttl))
+    if not vencidos:
+        return 0, 0
+
+    consulta = Artefacto.objects.filter(vencidos)
+    cantidad, liberado, cursor, lotes = 0, 0, None, 0
+    while max_lotes is None or lotes < max_lotes:
+        borrables, protegidos, cursor = _lote(consulta, "creado", cursor)
+        if cursor is None:
+            break
+        liberado += _borrar(borrables, protegidos, "vencido", simular)
+        cantidad += len(borrables)
+        lotes += 1
+        _pausa(simular)
+    return cantidad, liberado
+
+
+# ===================================================
+# 📦 CUOTA CON DESALOJO LRU
+# ===================================================
+
+def total_catalogo():
+    return Artefacto.objects.aggregate(total=Sum("tamano"))["total"] or 0
+
+
+def aplicar_cuota(cuota_mb=RETENCION_CUOTA_MB, simular=False, max_lotes=None):
+    """
+    Si el catálogo ocupa más de ``cuota_mb``, borra los artefactos
+    usados hace más tiempo hasta quedar bajo la cuota. Los archivos
+    repetidos comparten blob, así que el total del catálogo es una cota
+    superior de lo que ocupa en disco.
+    """
+    if not cuota_mb:
+        return 0, 0
+
+    cuota = cuota_mb * 1024 * 1024
+    total = total_catalogo()
+    # Registros anteriores al campo ``accedido``: se toman como usados al crearse
+    Artefacto.objects.filter(accedido__isnull=True).update(accedido=F("creado"))
+    consulta = Artefacto.objects.filter(accedido__isnull=False)
+    cantidad, liberado, cursor, lotes = 0, 0, None, 0
+    while total > cuota and (max_lotes is None or lotes < max_lotes):
+        borrables, protegidos, cursor = _lote(consulta, "accedido", cursor)
+        if cursor is None:
+            break
+
+        # Solo lo necesario para bajar de la cuota
+        seleccion, exceso = [], total - cuota
+        for artefacto in borrables:
+            if exceso <= 0:
+                break
+            seleccion.append(artefacto)
+            exceso -= artefacto.tamano
+
+        liberado_lote = _borrar(seleccion, protegidos, "cuota", simular)
+        total -= liberado_lote
+        liberado += liberado_lote
+        cantidad += len(seleccion)
+        lotes += 1
+        _pausa(simular)
+
+    if total > cuota:
+        logging.warning(
+            f"Retención - El catálogo sigue sobre la cuota ({total // 1048576} MB de {cuota_mb} MB); "
+            "lo que queda es de trabajos en curso o se sigue en la próxima pasada"
+        )
+    return cantidad, liberado
+
+
+# ===================================================
+# 🧬 BLOBS SIN ENLACES
+# ===================================================
+
+_cursor_blobs = 0
+
+
+def recoger_blobs(carpetas=BLOBS_POR_PASADA, simular=False):
+    """
+    Revisa ``carpetas`` de las 256 ``blobs/ab/`` (retomando donde quedó
+    la pasada anterior) y borra los blobs con un solo enlace: ningún
+    trabajo ni la caché los usa ya. Retorna ``(cantidad, bytes)``.
+    """
+    global _cursor_blobs
+    raiz = carpeta_blobs(CARPETA_DESCARGAS)
+    limite = time.time() - BLOB_GRACIA
+    cantidad, liberado = 0, 0
+
+    for _ in range(carpetas):
+        prefijo = f"{_cursor_blobs:02x}"
+        _cursor_blobs = (_cursor_blobs + 1) % 256
+        carpeta = os.path.join(raiz, prefijo)
+        for actual, _, nombres in os.walk(carpeta, topdown=False):
+            for nombre in nombres:
+                ruta = os.path.join(actual, nombre)
+                try:
+                    estado = os.stat(ruta)
+                except FileNotFoundError:
+                    continue
+                # ctime cambia al quitar un enlace: se da un margen a guardar_blob
+                if estado.st_nlink > 1 or estado.st_ctime > limite:
+                    continue
+                if not simular:
+                    try:
+                        os.remove(ruta)
+                    except OSError as e:
+                        logging.warning(f"Retención - No se pudo borrar el blob {ruta}: {e}")
+                        continue
+                cantidad += 1
+                liberado += estado.st_size
+            if not simular and actual != raiz:
+                try:
+                    os.rmdir(actual)
+                except OSError:
+                    pass
+
+    if cantidad and not simular:
+        ELIMINADOS_TOTAL.inc("blob", cantidad=cantidad)
+    return cantidad, liberado
+
+
+# ===================================================
+# 🔁 PASADA COMPLETA Y HILO
+# ===================================================
+
+def pasada(simular=False, todos_los_blobs=False, max_lotes=None):
+    """Vencimiento, cuota y blobs; retorna un resumen con lo borrado."""
+    inicio = time.perf_counter()
+    vencidos = vencer(simular=simular, max_lotes=max_lotes)
+    cuota = aplicar_cuota(simular=simular, max_lotes=max_lotes)
+    blobs = recoger_blobs(256 if todos_los_blobs else BLOBS_POR_PASADA, simular=simular)
+    total = total_catalogo()
+    BYTES_CATALOGO.fijar(valor=total)
+
+    return {
+        "vencidos": vencidos[0],
+        "desalojados": cuota[0],
+        "blobs": blobs[0],
+        "liberado_mb": round((vencidos[1] + cuota[1] + blobs[1]) / 1048576, 1),
+        "catalogo_mb": round(total / 1048576, 1),
+        "duracion_s": round(time.perf_counter() - inicio, 2),
+    }
+
+
+_hilo = None
+_hilo_lock = threading.Lock()
+
+
+def iniciar(intervalo=RETENCION_INTERVALO):
+    """Arranca (una vez por proceso) el hilo que hace una pasada cada ``intervalo`` segundos."""
+    global _hilo
+    with _hilo_lock:
+        if _hilo is not None:
+            return
+        _hilo = threading.Thread(target=_ciclo, args=(intervalo,), name="civi-retencion", daemon=True)
+        _hilo.start()
+
+
+def _ciclo(intervalo):
+    while True:
+        time.sleep(intervalo)
+        try:
+            resumen = pasada()
+            if resumen["vencidos"] or resumen["desalojados"] or resumen["blobs"]:
+                print(
+                    f"🧹 Retención: {resumen['vencidos']} vencido(s), {resumen['desalojados']} desalojado(s), "
+                    f"{resumen['blobs']} blob(s); {resumen['liberado_mb']} MB liberados"
+                )
+        except Exception as e:
+            logging.error(f"Retención - Error en la pasada: {e}")
+        finally:
+            close_old_connections()
+
+
+# ===================================================
+# 📈 MÉTRICAS
+# ===================================================
+
+ELIMINADOS_TOTAL = Contador(
+    "civi_retencion_eliminados_total", "Archivos borrados por la retención", ("motivo",),
+)
+BYTES_CATALOGO = Medidor(
+    "civi_artefactos_bytes", "Bytes del catálogo de artefactos tras la última pasada de retención",
+)
@@ -1,8 +1,9 @@
 import os
 import time
 import logging
-from selenium import webdriver
+import threading
 from django.conf import settings
+from django.db import connection
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
@@ -13,60 +14,81 @@ from selenium.common.exceptions import (
 )
 from selenium.webdriver.common.action_chains import ActionChains
 
+from concurrent.futures import ThreadPoolExecutor
+
+from .adaptadores import consultar_por_http
+from .cache import buscar_en_cache, guardar_en_cache, ttl_portal
+from .catalogo import registrar_portal
+from .circuito import ErrorPortal, es_transitorio, obtener_circuito, reintentar
+from .contexto import ContextoTrabajo
+from .descargas import esperar_descarga
+from .capturas import (
+    capturar, capturar_respaldo, guardar_en_segundo_plano, opciones_captura, preparar_captura,
+)
+from .esperas import ESPERAS_POR_DEFECTO, esperar_tras
+from .eventos import publicar
+from .metricas import BLOQUEADAS_TOTAL, CACHE_TOTAL, tramo
+from .navegadores import CARPETA_DESCARGAS, configurar_descargas, obtener_pool
+from .plan import SCRIPT_LOTE, SCRIPT_PROGRESO_LOTE, compilar_paginas, compilar_portal
+from .plazo import SIN_LIMITE, Plazo, PlazoAgotado
+from .recursos import aplicar_bloqueo, leer_bloqueos, restaurar_imagenes
+
 
 # ===================================================
 # 📁 CONFIGURACIÓN GENERAL
 # ===================================================
 
-BASE_DIR = os.getcwd()
-DOWNLOAD_PATH = os.path.join(BASE_DIR, "media", "descargas")
+DOWNLOAD_PATH = CARPETA_DESCARGAS
 os.makedirs(DOWNLOAD_PATH, exist_ok=True)
 
-logging.basicConfig(
-    filename="errores.log",
-    level=logging.ERROR,
-    format="%(asctime)s - %(levelname)s - %(message)s"
-)
-
-capturas, archivos = [], []
-NUMERO_DOCUMENTO = None
+MAX_PORTALES_PARALELO = getattr(settings, "CIVI_MAX_PORTALES_PARALELO", 3)
+MAX_CONCURRENCIA_PORTAL = getattr(settings, "CIVI_MAX_CONCURRENCIA_PORTAL", 2)
+# Eventos fallidos seguidos antes de dar el portal por caído o con otro marcado
+MAX_FALLOS_SEGUIDOS = getattr(settings, "CIVI_MAX_FALLOS_SEGUIDOS", 3)
+TIMEOUT_CARGA = 30
 
 
 # ===================================================
 # 🧰 FUNCIONES UTILITARIAS
 # ===================================================
 
-def tomar_captura(driver, pagina, evento="inicio"):
-    nombre = f"{pagina}_{evento}.png"
-    ruta = os.path.join(DOWNLOAD_PATH, nombre)
+def tomar_captura(driver, ctx, pagina, evento="inicio", config=None, forzada=False):
+    opciones = opciones_captura(config or {}, evento)
+    if opciones is None:
+        if not forzada:
+            return
+        opciones = {}
 
     try:
-        ancho, alto = 1920, 1080
-        driver.set_window_size(ancho, alto)
-        driver.execute_script("document.body.style.zoom='1';")
-        time.sleep(0.3)
+        with tramo("captura", pagina, ctx.id):
+            preparar_captura(driver)
+            try:
+                datos, extension = capturar(driver, opciones)
+            except Exception as e:
+                logging.warning(f"{pagina} - Captura CDP falló, se usa save_screenshot: {e}")
+                datos, extension = capturar_respaldo(driver, opciones)
 
-        driver.save_screenshot(ruta)
-        capturas.append(f"/media/descargas/{nombre}")
+        ruta = os.path.join(ctx.carpeta, f"{pagina}_{evento}.{extension}")
+        guardar_en_segundo_plano(ctx, pagina, ruta, datos)
 
-        print(f"📸 Captura visible guardada ({ancho}x{alto}): {ruta}")
+        print(f"📸 Captura visible guardada: {ruta}")
 
     except Exception as e:
         logging.error(f"Error al tomar captura visible de {pagina}: {e}")
         print(f"⚠️ Error al tomar captura visible de {pagina}: {e}")
 
 
-def esperar(driver, metodo, selector, timeout=10, clickable=False):
+def esperar(driver, metodo, selector, timeout=10, clickable=False, plazo=SIN_LIMITE):
     try:
         cond = EC.element_to_be_clickable if clickable else EC.presence_of_element_located
-        return WebDriverWait(driver, timeout).until(cond((metodo, selector)))
+        return WebDriverWait(driver, plazo.limitar(timeout)).until(cond((metodo, selector)))
     except TimeoutException:
         raise TimeoutException(f"Elemento no encontrado: {selector}")
 
 
-def aceptar_alerta(driver, pagina):
+def aceptar_alerta(driver, pagina, plazo=SIN_LIMITE):
     try:
-        WebDriverWait(driver, 3).until(EC.alert_is_present())
+        WebDriverWait(driver, plazo.limitar(3)).until(EC.alert_is_present())
         alerta = driver.switch_to.alert
         print(f"⚠️ Alerta detectada en {pagina}, aceptando...")
         alerta.accept()
@@ -76,50 +98,52 @@ def aceptar_alerta(driver, pagina):
         logging.warning(f"{pagina} - Error al aceptar alerta: {e}")
 
 
-def cambiar_iframe(driver, config, pagina):
+def cambiar_iframe(driver, config, pagina, plazo=SIN_LIMITE):
     iframe_tag = config.get("iframe_tag")
     if iframe_tag:
         try:
-            iframe = esperar(driver, By.TAG_NAME, iframe_tag)
+            iframe = esperar(driver, By.TAG_NAME, iframe_tag, plazo=plazo)
             driver.switch_to.frame(iframe)
         except Exception as e:
             logging.error(f"{pagina} - Error al cambiar a iframe: {e}")
 
 
-def procesar_input(driver, config, pagina):
+def procesar_input(driver, ctx, config, pagina, metodo=None, plazo=SIN_LIMITE):
     selector = config.get("input_selector")
     if not selector:
-        return
+        return True
 
-    metodo = By.XPATH if selector.startswith("//") else By.CSS_SELECTOR
+    metodo = metodo or (By.XPATH if selector.startswith("//") else By.CSS_SELECTOR)
     try:
-        input_box = esperar(driver, metodo, selector)
+        input_box = esperar(driver, metodo, selector, plazo=plazo)
         input_box.clear()
-        input_box.send_keys(str(NUMERO_DOCUMENTO))
-        tomar_captura(driver, pagina, "input")
+        input_box.send_keys(ctx.numero_documento)
+        tomar_captura(driver, ctx, pagina, "input", config)
 
+        condiciones = config.get("esperar_teclado", ESPERAS_POR_DEFECTO["teclado"])
         for tecla in config.get("eventos_teclado", []):
-            input_box.send_keys(tecla)
-            time.sleep(1)
+            with esperar_tras(driver, condiciones, pagina, plazo):
+                input_box.send_keys(tecla)
+        return True
 
     except Exception as e:
         logging.error(f"{pagina} - Error al procesar input: {e}")
+        return False
 
 
-def manejar_descarga(pagina, timeout=15):
+def manejar_descarga(ctx, pagina, timeout=15, gracia=3, plazo=SIN_LIMITE):
     print("⏳ Esperando descarga...")
-    antes = set(os.listdir(DOWNLOAD_PATH))
-    fin = time.time() + timeout
-
-    while time.time() < fin:
-        nuevos = set(os.listdir(DOWNLOAD_PATH)) - antes
-        if nuevos:
-            archivo = nuevos.pop()
-            ruta = os.path.join(DOWNLOAD_PATH, archivo)
-            archivos.append(ruta)
-            print(f"✅ Archivo descargado: {ruta}")
-            return ruta
-        time.sleep(1)
+    timeout = plazo.limitar(timeout)
+    gracia = min(gracia, timeout)
+    carpeta = ctx.carpeta_descargas(pagina)
+    _, registrados = ctx.artefactos_portal(pagina)
+
+    with tramo("descarga", pagina, ctx.id):
+        ruta = esperar_descarga(carpeta, ignorar=set(registrados), timeout=timeout, gracia=gracia)
+    if ruta:
+        ctx.agregar_archivo(pagina, ruta)
+        print(f"✅ Archivo descargado: {ruta}")
+        return ruta
 
     logging.warning(f"{pagina} - No se detectaron descargas")
     return None
@@ -129,101 +153,223 @@ def manejar_descarga(pagina, timeout=15):
 # ✅ EJECUCIÓN DE EVENTOS
 # ===================================================
 
-def ejecutar_evento(driver, pagina, evento, index):
+def ejecutar_evento(driver, ctx, pagina, evento, index, config=None, plazo=SIN_LIMITE):
     tipo = evento["tipo"]
-    try:
-        if tipo == "scroll":
-            driver.execute_script(f"window.scrollBy(0, {evento['valor']});")
-
-        elif tipo == "zoom":
-            driver.execute_script(f"document.body.style.zoom='{evento['valor']}';")
-
-        elif tipo == "retraso":
-            time.sleep(evento["valor"])
-
-        elif tipo == "click":
-            esperar(driver, By.CSS_SELECTOR, evento["selector"], clickable=True).click()
-
-        elif tipo == "espera_y_click":
-            esperar(driver, By.CSS_SELECTOR, evento["selector"], clickable=True).click()
-
-        elif tipo == "click_recaptcha":
-            print("🔍 Intentando resolver reCAPTCHA rápidamente...")
-            try:
-                fin = time.time() + 1
-                exito = False
-                while time.time() < fin and not exito:
-                    try:
-                        iframe = WebDriverWait(driver, 3).until(
-                            EC.presence_of_element_located((By.CSS_SELECTOR, "iframe[title='reCAPTCHA']"))
-                        )
-                        driver.switch_to.frame(iframe)
-                        checkbox = WebDriverWait(driver, 2).until(
-                            EC.element_to_be_clickable((By.CSS_SELECTOR, "#recaptcha-anchor"))
-                        )
-                        driver.execute_script("arguments[0].click();", checkbox)
-                        print("✅ reCAPTCHA clickeado con éxito")
-                        exito = True
-                    except Exception:
-                        driver.switch_to.default_content()
-                        time.sleep(0.1)
-                driver.switch_to.default_content()
-                if not exito:
-                    print("⚠️ No se pudo hacer clic en el reCAPTCHA.")
-            except Exception as e:
-                logging.warning(f"{pagina} - Error evento {index} ({tipo}): {e}")
-
-        elif tipo == "escribir":
-            el = esperar(driver, By.CSS_SELECTOR, evento["selector"])
-            texto = evento["texto"].replace("{DOC}", str(NUMERO_DOCUMENTO))
-            el.clear()
-            el.send_keys(texto)
-
-        elif tipo == "teclado":
-            el = esperar(driver, By.CSS_SELECTOR, evento["selector"])
-            el.send_keys(evento["tecla"])
+    if plazo.agotado():
+        logging.warning(f"{pagina} - Evento {index} ({tipo}) omitido: plazo agotado")
+        return
 
-        elif tipo == "captura":
-            tomar_captura(driver, pagina, evento.get("descripcion", f"evento_{index}"))
+    try:
+        condiciones = evento.get("esperar", ESPERAS_POR_DEFECTO.get(tipo))
+        with tramo(f"evento_{tipo}", pagina, ctx.id), esperar_tras(driver, condiciones, pagina, plazo):
+            if tipo == "scroll":
+                driver.execute_script(f"window.scrollBy(0, {evento['valor']});")
+
+            elif tipo == "zoom":
+                driver.execute_script(f"document.body.style.zoom='{evento['valor']}';")
+
+            elif tipo == "retraso":
+                time.sleep(plazo.limitar(evento["valor"]))
+
+            elif tipo == "click":
+                esperar(driver, evento.get("by", By.CSS_SELECTOR), evento["selector"],
+                        clickable=True, plazo=plazo).click()
+
+            elif tipo == "espera_y_click":
+                esperar(driver, evento.get("by", By.CSS_SELECTOR), evento["selector"],
+                        clickable=True, plazo=plazo).click()
+
+            elif tipo == "click_recaptcha":
+                print("🔍 Intentando resolver reCAPTCHA rápidamente...")
+                try:
+                    fin = time.time() + plazo.limitar(1)
+                    exito = False
+                    while time.time() < fin and not exito:
+                        try:
+                            iframe = WebDriverWait(driver, plazo.limitar(3)).until(
+                                EC.presence_of_element_located((By.CSS_SELECTOR, "iframe[title='reCAPTCHA']"))
+                            )
+                            driver.switch_to.frame(iframe)
+                            checkbox = WebDriverWait(driver, plazo.limitar(2)).until(
+                                EC.element_to_be_clickable((By.CSS_SELECTOR, "#recaptcha-anchor"))
+                            )
+                            driver.execute_script("arguments[0].click();", checkbox)
+                            print("✅ reCAPTCHA clickeado con éxito")
+                            exito = True
+                        except Exception:
+                            driver.switch_to.default_content()
+                            time.sleep(0.1)
+                    driver.switch_to.default_content()
+                    if not exito:
+                        print("⚠️ No se pudo hacer clic en el reCAPTCHA.")
+                except Exception as e:
+                    logging.warning(f"{pagina} - Error evento {index} ({tipo}): {e}")
+
+            elif tipo == "escribir":
+                el = esperar(driver, evento.get("by", By.CSS_SELECTOR), evento["selector"], plazo=plazo)
+                texto = evento["texto"].replace("{DOC}", ctx.numero_documento)
+                el.clear()
+                el.send_keys(texto)
+
+            elif tipo == "teclado":
+                el = esperar(driver, evento.get("by", By.CSS_SELECTOR), evento["selector"], plazo=plazo)
+                el.send_keys(evento["tecla"])
+
+            elif tipo == "captura":
+                tomar_captura(driver, ctx, pagina, evento.get("descripcion", f"evento_{index}"), config, forzada=True)
 
-        time.sleep(1)
         if tipo not in ("retraso", "captura"):
-            tomar_captura(driver, pagina, f"evento_{index}")
+            tomar_captura(driver, ctx, pagina, f"evento_{index}", config)
+        return True
 
     except Exception as e:
         logging.warning(f"{pagina} - Error en evento {index} ({tipo}): {e}")
+        return False
+
+
+def ejecutar_lote(driver, ctx, pagina, paso, config, plazo=SIN_LIMITE):
+    """
+    Ejecuta en un solo ``execute_async_script`` las acciones fusionadas
+    por el compilador. Si el lote se corta, sigue evento por evento desde
+    la primera acción pendiente; las que el navegador ya alcanzó a
+    disparar no se repiten. Retorna los eventos que fallaron al final del
+    lote, seguidos.
+    """
+    clave = f"__civiLote_{ctx.id}_{paso['indices'][0]}"
+    eventos = list(zip(paso["indices"], paso["eventos"]))
+    try:
+        limite = plazo.limitar(paso["limite"])
+        driver.set_script_timeout(limite + 1)
+        with tramo("lote", pagina, ctx.id):
+            resultado = driver.execute_async_script(SCRIPT_LOTE, paso["acciones"], int(limite * 1000), clave)
+        pendientes = eventos[resultado["hechas"]:]
+        for vencida in resultado["vencidas"]:
+            indice, tipo = vencida.split(":", 1)
+            logging.warning(f"{pagina} - Espera '{tipo}' vencida en evento {paso['indices'][int(indice)]}")
+        if resultado["error"]:
+            logging.warning(f"{pagina} - Lote de eventos interrumpido: {resultado['error']}")
+    except Exception as e:
+        logging.warning(f"{pagina} - Lote de eventos falló, se ejecuta paso a paso: {e}")
+        pendientes = pendientes_lote(driver, pagina, clave, eventos)
+
+    fallos = 0
+    for indice, evento in pendientes:
+        ok = ejecutar_evento(driver, ctx, pagina, evento, indice, config, plazo)
+        fallos = fallos + 1 if ok is False else 0
+
+    if not pendientes:
+        ultimo = paso["indices"][-1]
+        tomar_captura(driver, ctx, pagina, f"evento_{ultimo}", config)
+    return fallos
+
+
+def pendientes_lote(driver, pagina, clave, eventos):
+    """
+    Eventos de un lote cortado que aún hay que ejecutar. El script deja en
+    sessionStorage cuántas acciones disparó (un click que navegó o una
+    espera que venció no deben repetir el click). Si no se puede leer (la
+    página cambió de origen) solo se repiten las acciones sin efectos:
+    zoom y scroll.
+    """
+    try:
+        disparadas = driver.execute_script(SCRIPT_PROGRESO_LOTE, clave)
+    except Exception:
+        disparadas = None
+    if disparadas is not None:
+        return eventos[int(disparadas):]
+
+    omitidos = [indice for indice, evento in eventos if evento["tipo"] not in ("zoom", "scroll")]
+    if omitidos:
+        logging.warning(f"{pagina} - Progreso del lote desconocido: no se repiten los eventos {omitidos}")
+    return [(indice, evento) for indice, evento in eventos if evento["tipo"] in ("zoom", "scroll")]
 
 
 # ===================================================
 # 🌍 PROCESAMIENTO DE PÁGINAS
 # ===================================================
 
-def procesar_pagina(driver, pagina, config):
-    print(f"\n📌 Procesando página: {pagina}")
+def cargar_url(driver, config, pagina, plazo=SIN_LIMITE, trabajo=""):
+    """``driver.get`` con timeout de carga acotado por el plazo; si vence se sigue con lo cargado."""
+    plazo.verificar(f"cargar {pagina}")
+    driver.set_page_load_timeout(max(1, plazo.limitar(config.get("timeout_carga", TIMEOUT_CARGA))))
     try:
-        driver.get(config["url"])
-        aceptar_alerta(driver, pagina)
-        cambiar_iframe(driver, config, pagina)
+        with tramo("carga", pagina, trabajo):
+            driver.get(config["url"])
+    except TimeoutException:
+        logging.warning(f"{pagina} - La carga superó el tiempo, se continúa con lo cargado")
+        driver.execute_script("window.stop();")
 
-        procesar_input(driver, config, pagina)
 
-        for i, evento in enumerate(config.get("extra_eventos", []), start=1):
-            ejecutar_evento(driver, pagina, evento, i)
+def procesar_pagina(driver, ctx, pagina, config, plazo=SIN_LIMITE, plan=None):
+    print(f"\n📌 Procesando página: {pagina}")
+    try:
+        configurar_descargas(driver, ctx.carpeta_descargas(pagina))
+        aplicar_bloqueo(driver, config)
+        cargar_url(driver, config, pagina, plazo, ctx.id)
+        publicar(ctx.canal, "paso", portal=pagina, paso="carga")
+        aceptar_alerta(driver, pagina, plazo)
+        cambiar_iframe(driver, config, pagina, plazo)
+
+        plan = plan or compilar_portal(pagina, config)
+        fallos_seguidos = 0 if procesar_input(driver, ctx, config, pagina, plan["input_by"], plazo) else 1
+        max_fallos = config.get("max_fallos_seguidos", MAX_FALLOS_SEGUIDOS)
+
+        # Un resultado cortado por el plazo no se guarda en caché
+        completo = True
+        for numero, paso in enumerate(plan["pasos"]):
+            if plazo.agotado():
+                logging.warning(f"{pagina} - Plazo agotado: se omiten {len(plan['pasos']) - numero} paso(s)")
+                completo = False
+                break
+            if paso["tipo"] == "lote":
+                fallos = ejecutar_lote(driver, ctx, pagina, paso, config, plazo)
+                ultimo = paso["indices"][-1]
+            else:
+                ok = ejecutar_evento(driver, ctx, pagina, paso["evento"], paso["indice"], config, plazo)
+                fallos = 1 if ok is False else 0
+                ultimo = paso["indice"]
+            publicar(ctx.canal, "paso", portal=pagina, paso=f"evento_{ultimo}",
+                     hechos=numero + 1, total=len(plan["pasos"]))
+            fallos_seguidos = fallos_seguidos + fallos if fallos else 0
+
+            # Sin esperar los timeouts de los eventos que quedan
+            if fallos_seguidos >= max_fallos:
+                raise ErrorPortal(f"{fallos_seguidos} eventos seguidos fallaron (¿portal caído o con otro marcado?)")
 
         if config.get("descargar"):
-            manejar_descarga(pagina)
+            if plazo.agotado():
+                logging.warning(f"{pagina} - Plazo agotado: se omite la descarga")
+                completo = False
+            else:
+                publicar(ctx.canal, "paso", portal=pagina, paso="descarga")
+                manejar_descarga(ctx, pagina, gracia=config.get("gracia_descarga", 3), plazo=plazo)
 
         if config.get("captura_pantalla"):
-            tomar_captura(driver, pagina, "final")
+            restaurar_imagenes(driver, config, pagina)
+            tomar_captura(driver, ctx, pagina, "final", config, forzada=True)
 
         if config.get("retraso"):
-            time.sleep(config["retraso"])
+            time.sleep(plazo.limitar(config["retraso"]))
 
         driver.switch_to.default_content()
+        return completo
 
+    except PlazoAgotado as e:
+        logging.warning(f"{pagina} - {e}")
+        return False
+    except ErrorPortal:
+        raise
     except Exception as e:
         logging.error(f"{pagina} - Error general: {e}")
+        raise ErrorPortal(str(e).splitlines()[0] if str(e) else type(e).__name__,
+                          transitorio=es_transitorio(e)) from e
     finally:
+        ahorro = leer_bloqueos(driver)
+        if ahorro["peticiones"]:
+            BLOQUEADAS_TOTAL.inc(pagina, cantidad=ahorro["peticiones"])
+            ctx.agregar_dato(pagina, "bloqueo", ahorro)
+            print(f"🚫 {pagina}: {ahorro['peticiones']} peticiones bloqueadas "
+                  f"(~{ahorro['bytes_estimados'] // 1024} KB)")
         print(f"✅ Página finalizada: {pagina}")
 
 
@@ -238,9 +384,11 @@ paginas = {
         "eventos_teclado": [Keys.ENTER],
         "extra_eventos": [
             {"tipo": "zoom", "valor": 0.75},
-            {"tipo": "click", "selector": "body > div.swal2-container.swal2-center.swal2-backdrop-show > div > button"},
+            {"tipo": "click", "selector": "body > div.swal2-container.swal2-center.swal2-backdrop-show > div > button",
+             "esperar": [{"tipo": "oculto", "selector": ".swal2-container"}]},
             {"tipo": "captura", "descripcion": "cerrar_popup"},
-            {"tipo": "click", "selector": "#app > main > div > div > div > div > div.row.card-result.p-4 > div.col.font-rues--small.d-flex.flex-column.justify-content-end > div > div:nth-child(1) > a"},
+            {"tipo": "click", "selector": "#app > main > div > div > div > div > div.row.card-result.p-4 > div.col.font-rues--small.d-flex.flex-column.justify-content-end > div > div:nth-child(1) > a",
+             "esperar": [{"tipo": "red_inactiva", "ms": 500}], "fusionar": False},
             {"tipo": "click", "selector": "#detail-tabs-tab-pestana_general > span"},
             {"tipo": "captura", "descripcion": "pestana_general"},
             {"tipo": "click", "selector": "#detail-tabs-tab-pestana_economica > span"},
@@ -249,8 +397,13 @@ paginas = {
             {"tipo": "scroll", "valor": 200},
             {"tipo": "captura", "descripcion": "scroll_final"}
         ],
+        "bloquear": ["video"],
+        "estrategia_carga": "eager",
         "descargar": True,
-        "captura_pantalla": True
+        "captura_pantalla": True,
+        "capturas": ["evento_2", "evento_5", "evento_7", "evento_9", "evento_10", "final"],
+        "max_concurrencia": 2,
+        "cache_ttl": 12 * 3600
     },
 
     "ofac": {
@@ -262,7 +415,17 @@ paginas = {
             {"tipo": "scroll", "valor": 30}
         ],
         "descargar": False,
-        "captura_pantalla": True
+        "captura_pantalla": True,
+        "capturas": ["final"],
+        "http": {
+            "adaptador": "formulario",
+            "campo_documento": "ctl00$MainContent$txtID",
+            "boton": {"ctl00$MainContent$btnSearch": "Search"},
+            "resultado_id": "ctl00_MainContent_divResults"
+        },
+        "estrategia_carga": "eager",
+        "max_concurrencia": 3,
+        "cache_ttl": 3600
     },
 
     "contraloria": {
@@ -270,68 +433,143 @@ paginas = {
         "iframe_tag": "iframe",
         "input_selector": "//input[@type='text']",
         "eventos_teclado": [Keys.TAB, Keys.ENTER],
-        "descargar": True
+        "bloquear": ["fuentes", "video"],
+        "sin_imagenes": True,
+        "descargar": True,
+        "capturas": [],
+        "max_concurrencia": 1,
+        "cache_ttl": 12 * 3600
     },
 }
 
 
+# Se valida y compila al importar: un error de configuración se ve al
+# arrancar el servidor y no en medio de una consulta.
+planes = compilar_paginas(paginas)
+
+
 # ===================================================
 # 🚀 FUNCIÓN PRINCIPAL
 # ===================================================
 
-def ejecutar_consulta(numero_doc):
-    global NUMERO_DOCUMENTO, capturas, archivos
-    NUMERO_DOCUMENTO = numero_doc
-    capturas, archivos = [], []
-
-    chrome_options = webdriver.ChromeOptions()
-    chrome_options.add_experimental_option("prefs", {
-        "download.default_directory": DOWNLOAD_PATH,
-        "download.prompt_for_download": False,
-        "safebrowsing.enabled": True
-    })
-
-    open(os.path.join(BASE_DIR, "errores.log"), "w").close()
-
-    chrome_options.add_argument("--headless=new")
-    chrome_options.add_argument("--window-size=1920,1080")
-    chrome_options.add_argument("--start-maximized")
-
-    chrome_options.add_argument("--force-device-scale-factor=1")
-    chrome_options.add_argument("--high-dpi-support=1")
-    chrome_options.add_argument("--disable-gpu")
-    chrome_options.add_argument("--disable-software-rasterizer")
-
-    chrome_options.add_argument("--hide-scrollbars")
-    chrome_options.add_argument("--disable-popup-blocking")
-    chrome_options.add_argument("--disable-infobars")
-
-    chrome_options.add_argument("--disable-blink-features=AutomationControlled")
-
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
-    chrome_options.add_argument("--disable-background-networking")
-    chrome_options.add_argument("--disable-client-side-phishing-detection")
-    chrome_options.add_argument("--disable-component-update")
-    chrome_options.add_argument("--disable-default-apps")
-    chrome_options.add_argument("--disable-extensions")
-    chrome_options.add_argument("--disable-sync")
-    chrome_options.add_argument("--disable-translate")
-    chrome_options.add_argument("--disable-features=NetworkService,NetworkServiceInProcess,TranslateUI")
-    chrome_options.add_argument("--no-first-run")
-    chrome_options.add_argument("--mute-audio")
-    chrome_options.add_argument("--disable-notifications")
-    chrome_options.add_argument("--log-level=3")
-    chrome_options.add_experimental_option("excludeSwitches", ["enable-logging", "enable-automation"])
-
-    driver = webdriver.Chrome(options=chrome_options)
-    driver.maximize_window()
+# Límite de consultas simultáneas por portal entre todos los trabajos
+# (clave "max_concurrencia" de cada página).
+semaforos_portal = {
+    nombre: threading.BoundedSemaphore(config.get("max_concurrencia", MAX_CONCURRENCIA_PORTAL))
+    for nombre, config in paginas.items()
+}
+_semaforos_lock = threading.Lock()
+
+
+def semaforo_portal(pagina, config):
+    """Semáforo del portal; los que no están en ``paginas`` (p. ej. simulados) se crean al usarlos."""
+    with _semaforos_lock:
+        if pagina not in semaforos_portal:
+            semaforos_portal[pagina] = threading.BoundedSemaphore(
+                config.get("max_concurrencia", MAX_CONCURRENCIA_PORTAL)
+            )
+        return semaforos_portal[pagina]
 
+
+def procesar_pagina_en_pool(ctx, pagina, config, forzar=False, plazo=None, plan=None):
+    # El portal puede tener un plazo propio ("plazo"), nunca mayor al del trabajo
+    plazo = (plazo or Plazo()).hijo(config.get("plazo"))
     try:
-        for nombre, config in paginas.items():
-            procesar_pagina(driver, nombre, config)
+        ttl = ttl_portal(config)
+        entrada = None if forzar else buscar_en_cache(pagina, ctx.numero_documento, ttl)
+        if ttl and not forzar:
+            CACHE_TOTAL.inc(pagina, "acierto" if entrada is not None else "fallo")
+        if entrada is not None:
+            for ruta in entrada.capturas:
+                ctx.agregar_captura(pagina, ruta)
+            for ruta in entrada.archivos:
+                ctx.agregar_archivo(pagina, ruta)
+            publicar(ctx.canal, "portal", portal=pagina, fase="fin", estado="cache")
+            return
+
+        # Con el circuito abierto el portal se omite sin esperar ningún timeout
+        circuito = obtener_circuito(pagina, config)
+        if not circuito.permitir():
+            motivo = f"circuito abierto, se volverá a probar en {circuito.reintentar_en()}s"
+            ctx.agregar_dato(pagina, "no_disponible", motivo)
+            publicar(ctx.canal, "portal", portal=pagina, fase="fin", estado="no_disponible", motivo=motivo)
+            print(f"🔌 {pagina} omitido: {motivo}")
+            return
+
+        publicar(ctx.canal, "portal", portal=pagina, fase="inicio")
+        try:
+            exito = consultar_por_http(ctx, pagina, config, plazo)
+            if not exito:
+                semaforo = semaforo_portal(pagina, config)
+                if not semaforo.acquire(timeout=plazo.restante()):
+                    raise PlazoAgotado(f"{pagina}: sin turno libre antes del plazo")
+                try:
+                    pool = obtener_pool(config.get("estrategia_carga", "normal"))
+                    with pool.driver(timeout=plazo.restante()) as driver, tramo("portal", pagina, ctx.id):
+                        exito = reintentar(
+                            lambda: procesar_pagina(driver, ctx, pagina, config, plazo, plan), plazo, pagina
+                        )
+                finally:
+                    semaforo.release()
+        except ErrorPortal as e:
+            circuito.fallo(str(e))
+            ctx.agregar_dato(pagina, "no_disponible", str(e))
+            publicar(ctx.canal, "portal", portal=pagina, fase="fin", estado="no_disponible", motivo=str(e))
+            exito = False
+        except BaseException as e:
+            # Sin navegador o sin plazo: no dice nada del portal
+            circuito.cancelar()
+            publicar(ctx.canal, "portal", portal=pagina, fase="fin", estado="omitido", motivo=str(e))
+            raise
+        else:
+            # ``exito`` falso aquí es un resultado cortado por el plazo
+            if exito:
+                circuito.exito()
+            else:
+                circuito.cancelar()
+            publicar(ctx.canal, "portal", portal=pagina, fase="fin", estado="completo" if exito else "incompleto")
+
+        ctx.esperar_pendientes()
+        ctx.consolidar(pagina)
+        registrar_portal(ctx, pagina)
+        if exito and ttl:
+            capturas, archivos = ctx.artefactos_portal(pagina)
+            guardar_en_cache(pagina, ctx.numero_documento, capturas, archivos)
     finally:
-        driver.quit()
+        connection.close()
+
+
+def ejecutar_consulta(numero_doc, trabajo_id=None, al_avanzar=None, forzar=False, carpeta=None,
+                      plazo=None, portales=None):
+    # ``portales`` reemplaza la configuración (p. ej. los portales simulados del
+    # benchmark); se valida y compila igual que ``paginas`` al importar
+    if portales:
+        planes_consulta = compilar_paginas(portales)
+    else:
+        portales, planes_consulta = paginas, planes
+    ctx = ContextoTrabajo(numero_doc, DOWNLOAD_PATH, trabajo_id, carpeta)
+    plazo = plazo or Plazo()
+
+    # Cada portal usa su propio driver del pool; la consulta tarda
+    # lo que tarde el portal más lento.
+    with ThreadPoolExecutor(max_workers=MAX_PORTALES_PARALELO) as executor:
+        futuros = [
+            executor.submit(
+                procesar_pagina_en_pool, ctx, nombre, config, forzar, plazo, planes_consulta[nombre]
+            )
+            for nombre, config in portales.items()
+        ]
+        for completados, (nombre, futuro) in enumerate(zip(portales, futuros), start=1):
+            try:
+                futuro.result()
+            except PlazoAgotado as e:
+                logging.warning(f"{nombre} - Omitido: {e}")
+            except Exception as e:
+                logging.error(f"{nombre} - Error obteniendo navegador: {e}")
+            if al_avanzar:
+                al_avanzar(nombre, completados, len(futuros))
 
+    ctx.esperar_pendientes()
+    ctx.guardar_manifiesto()
     print("\n✅ Proceso completado correctamente.")
-    return {"capturas": capturas, "archivos": archivos}
+    return ctx.resultado()
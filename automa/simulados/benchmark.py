@@ -0,0 +1,192 @@
+import os
+import json
+import math
+import time
+import shutil
+import logging
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from ..catalogo import ruta_relativa
+from ..informes import generar_informe_consulta
+from ..metricas import PASO_SEGUNDOS
+from ..models import Artefacto
+from ..selenium_script import ejecutar_consulta
+from .servidor import ServidorSimulado, paginas_simuladas
+
+
+# ===================================================
+# ⏱️ BENCHMARK DE LA CONSULTA COMPLETA
+# ===================================================
+#
+# Corre ``consultas`` consultas (portales + informe) contra los portales
+# simulados, ``concurrencia`` a la vez, y guarda un JSON por corrida en
+# CIVI_BENCHMARK_CARPETA para comparar el antes y el después de un cambio.
+
+CARPETA_RESULTADOS = getattr(
+    settings, "CIVI_BENCHMARK_CARPETA", os.path.join(settings.BASE_DIR, "benchmarks")
+)
+
+# Documentos ficticios: no chocan con consultas reales en el catálogo
+DOCUMENTO_BASE = 900000000
+
+
+def percentil(valores, p):
+    """Percentil ``p`` (0-100) con interpolación lineal."""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    k = (len(ordenados) - 1) * p / 100
+    piso = math.floor(k)
+    techo = min(piso + 1, len(ordenados) - 1)
+    return ordenados[piso] + (ordenados[techo] - ordenados[piso]) * (k - piso)
+
+
+def resumen_latencias(valores):
+    return {
+        "p50": round(percentil(valores, 50), 3),
+        "p90": round(percentil(valores, 90), 3),
+        "p95": round(percentil(valores, 95), 3),
+        "p99": round(percentil(valores, 99), 3),
+        "max": round(max(valores), 3) if valores else 0.0,
+        "media": round(sum(valores) / len(valores), 3) if valores else 0.0,
+    }
+
+
+def _pasos_desde(antes):
+    """Promedio por paso de los tramos medidos durante la corrida."""
+    pasos = {}
+    for (paso, portal), (conteo, suma) in PASO_SEGUNDOS.totales().items():
+        conteo_antes, suma_antes = antes.get((paso, portal), (0, 0.0))
+        if conteo > conteo_antes:
+            clave = f"{paso}/{portal}" if portal else paso
+            n = conteo - conteo_antes
+            pasos[clave] = {"n": n, "media": round((suma - suma_antes) / n, 3)}
+    return dict(sorted(pasos.items()))
+
+
+def _version():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=settings.BASE_DIR, timeout=5,
+        ).stdout.strip()
+    except Exception:
+        return ""
+
+
+def _limpiar(carpetas):
+    """Quita del disco y del catálogo lo generado por la corrida."""
+    for carpeta in carpetas:
+        shutil.rmtree(carpeta, ignore_errors=True)
+        try:
+            os.rmdir(os.path.dirname(carpeta))  # carpeta del documento, si quedó vacía
+        except OSError:
+            pass
+        Artefacto.objects.filter(ruta__startswith=ruta_relativa(carpeta) + "/").delete()
+
+
+def ejecutar_benchmark(consultas=10, concurrencia=2, latencia=0.2, informe=True, puerto=0,
+                       conservar=False):
+    servidor = ServidorSimulado(puerto, latencia).iniciar()
+    portales = paginas_simuladas(servidor.url)
+    antes = PASO_SEGUNDOS.totales()
+    latencias, errores, carpetas = [], 0, []
+
+    def una(i):
+        numero = str(DOCUMENTO_BASE + i)
+        try:
+            inicio = time.perf_counter()
+            resultado = ejecutar_consulta(numero, forzar=True, portales=portales)
+            carpetas.append(resultado["carpeta"])
+            if informe:
+                generar_informe_consulta(numero, resultado, time.perf_counter() - inicio)
+            return time.perf_counter() - inicio
+        finally:
+            close_old_connections()
+
+    print(f"🧪 Portales simulados en {servidor.url} (latencia {latencia * 1000:.0f} ms)")
+    inicio = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=concurrencia, thread_name_prefix="civi-bench") as executor:
+            futuros = [executor.submit(una, i) for i in range(consultas)]
+            for hechas, futuro in enumerate(as_completed(futuros), start=1):
+                try:
+                    latencias.append(futuro.result())
+                except Exception as e:
+                    errores += 1
+                    logging.error(f"Benchmark - Consulta fallida: {e}")
+                print(f"   {hechas}/{consultas} consultas terminadas")
+    finally:
+        total = time.perf_counter() - inicio
+        servidor.detener()
+        if not conservar:
+            _limpiar(carpetas)
+
+    return {
+        "fecha": timezone.now().isoformat(),
+        "version": _version(),
+        "parametros": {
+            "consultas": consultas,
+            "concurrencia": concurrencia,
+            "latencia_ms": round(latencia * 1000),
+            "informe": informe,
+        },
+        "latencia_s": resumen_latencias(latencias),
+        "throughput_por_min": round(len(latencias) * 60 / total, 2) if total else 0.0,
+        "duracion_s": round(total, 2),
+        "errores": errores,
+        "pasos": _pasos_desde(antes),
+    }
+
+
+# ===================================================
+# 💾 RESULTADOS GUARDADOS
+# ===================================================
+
+def guardar_resultado(datos, etiqueta="", carpeta=CARPETA_RESULTADOS):
+    os.makedirs(carpeta, exist_ok=True)
+    datos["etiqueta"] = etiqueta
+    nombre = timezone.localtime().strftime("%Y%m%d-%H%M%S")
+    if etiqueta:
+        nombre += "_" + "".join(c if c.isalnum() or c in "-_" else "_" for c in etiqueta)
+    ruta = os.path.join(carpeta, nombre + ".json")
+    with open(ruta, "w", encoding="utf-8") as archivo:
+        json.dump(datos, archivo, ensure_ascii=False, indent=1)
+    return ruta
+
+
+def cargar_resultado(ruta=None, carpeta=CARPETA_RESULTADOS, excluir=None):
+    """Lee una corrida guardada; sin ``ruta`` toma la más reciente de ``carpeta``."""
+    if ruta is None:
+        try:
+            nombres = sorted(n for n in os.listdir(carpeta) if n.endswith(".json"))
+        except FileNotFoundError:
+            return None
+        rutas = [os.path.join(carpeta, n) for n in nombres]
+        rutas = [r for r in rutas if r != excluir]
+        if not rutas:
+            return None
+        ruta = rutas[-1]
+    with open(ruta, encoding="utf-8") as archivo:
+        return json.load(archivo)
+
+
+def comparar(actual, anterior):
+    """Líneas con la variación de latencias y throughput respecto a otra corrida."""
+    def variacion(nuevo, viejo):
+        if not viejo:
+            return "   n/a"
+        return f"{(nuevo - viejo) * 100 / viejo:+6.1f}%"
+
+    lineas = []
+    for clave in ("p50", "p90", "p95", "p99", "max"):
+        nuevo, viejo = actual["latencia_s"][clave], anterior["latencia_s"][clave]
+        lineas.append(f"{clave:>10}: {viejo:8.3f}s → {nuevo:8.3f}s  {variacion(nuevo, viejo)}")
+    nuevo, viejo = actual["throughput_por_min"], anterior["throughput_por_min"]
+    lineas.append(f"{'throughput':>10}: {viejo:8.2f}  → {nuevo:8.2f}   {variacion(nuevo, viejo)} (consultas/min)")
+    return lineas
@@ -0,0 +1,161 @@
+import os
+import copy
+import json
+import time
+import random
+import threading
+from html import escape
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from ..pdf_nativo import DocumentoPDF
+
+
+# ===================================================
+# 🧪 PORTALES SIMULADOS (SIN RED)
+# ===================================================
+#
+# Réplicas locales de rues, ofac y contraloría con los mismos selectores,
+# popups, iframes y descargas que usa ``paginas`` en selenium_script.py.
+# Sirven para medir la consulta completa sin depender de los portales
+# reales. Las respuestas dinámicas (búsquedas, formularios, PDFs) tardan
+# ``latencia`` segundos (± 25 %) para parecerse a un portal remoto.
+
+SITIOS = os.path.join(os.path.dirname(__file__), "sitios")
+
+
+class ManejadorSimulado(SimpleHTTPRequestHandler):
+    latencia = 0.0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, directory=SITIOS, **kwargs)
+
+    def log_message(self, formato, *args):
+        pass
+
+    # ---------- rutas ----------
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        documento = parse_qs(url.query).get("doc", [""])[0]
+
+        if url.path.endswith("/certificado.pdf"):
+            self._esperar()
+            portal = url.path.strip("/").split("/")[0]
+            self._pdf(portal, documento)
+        elif url.path == "/rues/api/buscar":
+            self._esperar()
+            self._json({
+                "documento": documento,
+                "razon_social": f"EMPRESA SIMULADA {documento} S.A.S.",
+                "matricula": documento[-6:].zfill(6),
+            })
+        elif url.path == "/rues/api/detalle":
+            self._esperar()
+            self._json({
+                "general": f"Razón social: EMPRESA SIMULADA {documento} S.A.S. — Estado: ACTIVA",
+                "economica": "CIIU 6201 — Actividades de desarrollo de sistemas informáticos",
+                "representante": "Representante legal: PERSONA DE PRUEBA",
+                "establecimientos": "1 establecimiento de comercio registrado",
+            })
+        elif url.path == "/ofac/":
+            self._ofac(None)
+        else:
+            super().do_GET()
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/ofac/":
+            self.send_error(404)
+            return
+
+        largo = int(self.headers.get("Content-Length", 0) or 0)
+        campos = parse_qs(self.rfile.read(largo).decode("utf-8", "replace"))
+        self._esperar()
+        self._ofac(campos.get("ctl00$MainContent$txtID", [""])[0])
+
+    # ---------- respuestas ----------
+
+    def _esperar(self):
+        if self.latencia:
+            time.sleep(self.latencia * random.uniform(0.75, 1.25))
+
+    def _enviar(self, cuerpo, tipo, cabeceras=None):
+        self.send_response(200)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(cuerpo)))
+        for clave, valor in (cabeceras or {}).items():
+            self.send_header(clave, valor)
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def _json(self, datos):
+        self._enviar(json.dumps(datos).encode(), "application/json")
+
+    def _ofac(self, documento):
+        with open(os.path.join(SITIOS, "ofac", "index.html"), encoding="utf-8") as archivo:
+            plantilla = archivo.read()
+
+        resultados = ""
+        if documento is not None:
+            resultados = (
+                '<div id="ctl00_MainContent_divResults">'
+                f"<p>Lookup results for ID # {escape(documento)}: 0 found.</p></div>"
+            )
+        self._enviar(
+            plantilla.replace("{{RESULTADOS}}", resultados).encode(),
+            "text/html; charset=utf-8",
+            {"Set-Cookie": "ASP.NET_SessionId=simulado; path=/; HttpOnly"},
+        )
+
+    def _pdf(self, portal, documento):
+        doc = DocumentoPDF()
+        doc.titulo(f"CERTIFICADO {portal.upper()} (SIMULADO)")
+        doc.parrafo(f"Documento consultado: {documento}")
+        doc.parrafo("Este certificado lo genera el servidor de portales simulados para pruebas de rendimiento.")
+        # El nombre empieza por el documento, como los certificados reales
+        nombre = f"{documento or '0'}_{portal}.pdf"
+        self._enviar(doc.como_bytes(), "application/pdf", {
+            "Content-Disposition": f'attachment; filename="{nombre}"',
+        })
+
+
+class ServidorSimulado:
+    """Servidor HTTP local de los portales simulados, en un hilo propio."""
+
+    def __init__(self, puerto=0, latencia=0.0, host="127.0.0.1"):
+        manejador = type("Manejador", (ManejadorSimulado,), {"latencia": latencia})
+        self._servidor = ThreadingHTTPServer((host, puerto), manejador)
+        self._servidor.daemon_threads = True
+        self._hilo = None
+
+    @property
+    def url(self):
+        host, puerto = self._servidor.server_address[:2]
+        return f"http://{host}:{puerto}"
+
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self._servidor.serve_forever, daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.detener()
+
+
+def paginas_simuladas(url_base, paginas=None):
+    """Copia de ``paginas`` apuntando cada portal a su réplica local y sin caché."""
+    if paginas is None:
+        from ..selenium_script import paginas
+    simuladas = copy.deepcopy(paginas)
+    for nombre, config in simuladas.items():
+        config["url"] = f"{url_base}/{nombre}/"
+        config["cache_ttl"] = 0
+    return simuladas
@@ -2,7 +2,7 @@
 // 📄 ARCHIVO: script.js
 // 💡 FUNCIÓN PRINCIPAL: Conectar el frontend con Django y animar la interfaz
 // Contiene tres secciones principales:
-//   1️⃣ Consulta AJAX a la vista Django (run_consulta)
+//   1️⃣ Consulta AJAX a la vista Django (run_consulta) y su avance en vivo
 //   2️⃣ Obtención del token CSRF para seguridad
 //   3️⃣ Efectos visuales y animaciones de interfaz
 // ===============================================================
@@ -46,6 +46,13 @@ async function buscarPN() {
         const resultados = document.getElementById("resultados");
         resultados.innerHTML = "";
 
+        // ⏳ La consulta queda en cola: se sigue su avance hasta que termine
+        if (data.status === "ok" && data.eventos_url && window.EventSource) {
+            data = await seguirEventos(data.eventos_url, data.estado_url, resultados);
+        } else if (data.status === "ok" && data.estado_url) {
+            data = await esperarTrabajo(data.estado_url);
+        }
+
         if (data.status === "ok") {
             alert("✅ Proceso completado correctamente.");
             if (data.tiempo) {
@@ -61,6 +68,117 @@ async function buscarPN() {
     } finally {
         // 👉 OCULTA LOADER SIEMPRE (éxito o error)
         document.getElementById("loader").classList.add("oculto");
+        document.querySelector("#loader p").textContent = "Procesando consulta... por favor espere";
+    }
+}
+
+
+// ======= 1️⃣.1 AVANCE EN VIVO (Server-Sent Events) =======
+// El servidor avisa la etapa, cada portal y cada captura o archivo apenas
+// está listo, así se ve resultado parcial sin esperar al portal más lento.
+// Si el canal se cierra antes de terminar, se sigue consultando el estado.
+function seguirEventos(eventosUrl, estadoUrl, resultados) {
+    const textoLoader = document.querySelector("#loader p");
+    const portales = document.createElement("ul");
+    portales.className = "avance-portales";
+    resultados.appendChild(portales);
+
+    const lineaPortal = (portal) => {
+        let li = portales.querySelector(`li[data-portal="${portal}"]`);
+        if (!li) {
+            li = document.createElement("li");
+            li.dataset.portal = portal;
+            li.innerHTML = `<strong>${portal.toUpperCase()}</strong> <span class="estado"></span><div class="artefactos"></div>`;
+            portales.appendChild(li);
+        }
+        return li;
+    };
+
+    const ESTADOS_PORTAL = {
+        inicio: "⏳ consultando...",
+        completo: "✅ listo",
+        cache: "✅ listo (caché)",
+        incompleto: "⚠️ incompleto (tiempo agotado)",
+        no_disponible: "🔌 portal no disponible",
+        omitido: "⚠️ omitido",
+    };
+
+    return new Promise((resolve) => {
+        const fuente = new EventSource(eventosUrl);
+        let terminado = false;
+
+        const terminar = async () => {
+            terminado = true;
+            fuente.close();
+            // El estado completo (mensaje, tiempo, informe) sale de la API de siempre
+            resolve(await (await fetch(estadoUrl)).json());
+        };
+
+        fuente.addEventListener("estado", (e) => {
+            const d = JSON.parse(e.data);
+            if (textoLoader && d.etapa) {
+                textoLoader.textContent = `${d.etapa} (${d.progreso ?? 0}%)`;
+            }
+        });
+
+        fuente.addEventListener("portal", (e) => {
+            const d = JSON.parse(e.data);
+            const estado = d.fase === "inicio" ? "inicio" : d.estado;
+            const texto = ESTADOS_PORTAL[estado] || estado;
+            lineaPortal(d.portal).querySelector(".estado").textContent = d.motivo ? `${texto}: ${d.motivo}` : texto;
+        });
+
+        fuente.addEventListener("paso", (e) => {
+            const d = JSON.parse(e.data);
+            const span = lineaPortal(d.portal).querySelector(".estado");
+            span.textContent = d.total ? `⏳ paso ${d.hechos}/${d.total}` : `⏳ ${d.paso}`;
+        });
+
+        fuente.addEventListener("artefacto", (e) => {
+            const d = JSON.parse(e.data);
+            const contenedor = lineaPortal(d.portal).querySelector(".artefactos");
+            const enlace = document.createElement("a");
+            enlace.href = d.url;
+            enlace.target = "_blank";
+            if (d.tipo === "captura") {
+                enlace.innerHTML = `<img src="${d.url}" alt="${d.nombre}" style="max-width:160px;margin:4px;">`;
+            } else {
+                enlace.textContent = `📄 ${d.nombre}`;
+            }
+            contenedor.appendChild(enlace);
+        });
+
+        fuente.addEventListener("fin", terminar);
+
+        fuente.onerror = async () => {
+            // EventSource reintenta solo; si el navegador cerró el canal se vuelve al sondeo
+            if (!terminado && fuente.readyState === EventSource.CLOSED) {
+                terminado = true;
+                resolve(await esperarTrabajo(estadoUrl));
+            }
+        };
+    });
+}
+
+
+// ======= 1️⃣.2 SEGUIMIENTO DEL TRABAJO EN COLA (sondeo) =======
+// Consulta periódicamente el estado del trabajo y muestra la etapa actual
+// en el loader hasta que el servidor lo reporte como completado o con error.
+async function esperarTrabajo(estadoUrl, intervalo = 2000) {
+    const textoLoader = document.querySelector("#loader p");
+
+    while (true) {
+        const response = await fetch(estadoUrl);
+        const data = await response.json();
+
+        if (data.estado === "completado" || data.estado === "error" || data.status === "error") {
+            return data;
+        }
+
+        if (textoLoader) {
+            textoLoader.textContent = `${data.etapa} (${data.progreso}%)`;
+        }
+        await new Promise(resolve => setTimeout(resolve, intervalo));
     }
 }
 
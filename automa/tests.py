@@ -1,3 +1,1161 @@
-from django.test import TestCase
+import io
+import os
+import re
+import json
+import time
+import uuid
+import asyncio
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import AsyncClient, Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PyPDF2 import PdfReader
+
+from . import cache, catalogo, descargas, memoria, metricas, pdf_nativo, retencion
+from .adaptadores import ADAPTADORES, consultar_por_http
+from .circuito import (
+    ABIERTO, CERRADO, SEMIABIERTO, CircuitoPortal, ErrorPortal, es_transitorio, reintentar,
+)
+from .contexto import ContextoTrabajo
+from .eventos import publicar
+from .informes import generar_informe_completo, informe_completo_en_flujo
+from .models import Artefacto, Lote, ResultadoPortal, Trabajo
+from .pdf_union import unir_pdfs, unir_pdfs_en_flujo
+from .plan import ErrorConfiguracion, compilar_paginas, compilar_portal, validar_portal
+from .plazo import SIN_LIMITE, Plazo, PlazoAgotado
+from .simulados.servidor import ServidorSimulado, paginas_simuladas
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+# ===================================================
+# 🧪 UTILITARIOS DE LAS PRUEBAS
+# ===================================================
+#
+# Todo corre sin red: los archivos van a una carpeta temporal que hace
+# de MEDIA_ROOT y los portales son los simulados de ``simulados``.
+
+class ConCarpetaTemporal(TestCase):
+    """Prueba con un MEDIA_ROOT temporal que se borra al terminar."""
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp(prefix="civi_pruebas_")
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        medios = override_settings(MEDIA_ROOT=self.media)
+        medios.enable()
+        self.addCleanup(medios.disable)
+
+    def escribir(self, relativa, contenido=b"civi"):
+        ruta = os.path.join(self.media, *relativa.split("/"))
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        with open(ruta, "wb") as archivo:
+            archivo.write(contenido)
+        return ruta
+
+
+def imagen_prueba(carpeta, nombre, modo="RGB", formato="PNG"):
+    ruta = os.path.join(carpeta, nombre)
+    color = (200, 30, 30, 128) if modo == "RGBA" else (200, 30, 30)
+    Image.new(modo, (40, 20), color).save(ruta, formato)
+    return ruta
+
+
+def pdf_prueba(*titulos):
+    """PDF en memoria con una página por título."""
+    doc = pdf_nativo.DocumentoPDF()
+    for titulo in titulos:
+        doc.agregar_pagina()
+        doc.titulo(titulo)
+    return doc.como_bytes()
+
+
+# ===================================================
+# 📄 GENERADOR PDF NATIVO Y UNIÓN
+# ===================================================
+
+@mock.patch("builtins.print", lambda *a, **k: None)
+class PruebasPDF(ConCarpetaTemporal):
+
+    def test_documento_con_texto_se_lee(self):
+        doc = pdf_nativo.DocumentoPDF()
+        doc.titulo("Informe de Consulta - 123")
+        doc.parrafo("Duración: 1.50 segundos")
+
+        lector = PdfReader(io.BytesIO(doc.como_bytes()))
+        self.assertEqual(len(lector.pages), 1)
+        texto = lector.pages[0].extract_text()
+        self.assertIn("Informe de Consulta - 123", texto)
+        self.assertIn("Duración", texto)
+
+    def test_parrafo_largo_se_parte_en_lineas(self):
+        doc = pdf_nativo.DocumentoPDF()
+        doc.parrafo("palabra " * 200)
+        self.assertGreater(len(doc.paginas[0]["operaciones"]), 1)
+
+    def test_imagen_desconocida(self):
+        ruta = self.escribir("sin_formato.bin", b"no es una imagen")
+        with self.assertRaises(pdf_nativo.ErrorImagen):
+            pdf_nativo.leer_imagen(ruta)
+
+    @mock.patch("automa.pdf_nativo.Image", None)
+    def test_png_con_alfa_sin_pillow(self):
+        if Image is None:
+            self.skipTest("Pillow no está instalado")
+        ruta = imagen_prueba(self.media, "alfa.png", modo="RGBA")
+        ancho, alto, dic, datos = pdf_nativo.leer_imagen(ruta)
+
+        self.assertEqual((ancho, alto), (40, 20))
+        self.assertEqual(dic["/ColorSpace"], "/DeviceRGB")
+        self.assertNotIn("/DecodeParms", dic)
+        # Tres canales por píxel: la transparencia se descartó
+        self.assertEqual(len(pdf_nativo.zlib.decompress(datos)), 40 * 20 * 3)
+
+    def test_imagenes_jpeg_y_png(self):
+        if Image is None:
+            self.skipTest("Pillow no está instalado")
+        jpeg = imagen_prueba(self.media, "captura.jpg", formato="JPEG")
+        png = imagen_prueba(self.media, "captura.png")
+        alfa = imagen_prueba(self.media, "alfa.png", modo="RGBA")
+
+        ancho, alto, dic, datos = pdf_nativo.leer_imagen(jpeg)
+        self.assertEqual((ancho, alto, dic["/Filter"]), (40, 20, "/DCTDecode"))
+        with open(jpeg, "rb") as archivo:
+            self.assertEqual(datos, archivo.read())
+
+        self.assertIn("/Predictor 15", pdf_nativo.leer_imagen(png)[2]["/DecodeParms"])
+        self.assertEqual(len(pdf_nativo.zlib.decompress(pdf_nativo.leer_imagen(alfa)[3])), 40 * 20 * 3)
+
+        doc = pdf_nativo.DocumentoPDF()
+        for ruta in (jpeg, png, alfa, jpeg):
+            doc.agregar_pagina()
+            doc.imagen(ruta)
+        lector = PdfReader(io.BytesIO(doc.como_bytes()))
+        self.assertEqual(len(lector.pages), 4)
+        # La misma imagen se escribe una sola vez
+        self.assertEqual(len(doc.imagenes), 3)
+
+    def test_unir_pdfs(self):
+        primero = self.escribir("uno.pdf", pdf_prueba("Uno"))
+        segundo = self.escribir("dos.pdf", pdf_prueba("Dos", "Tres"))
+
+        for comprimir in (False, True):
+            destino = os.path.join(self.media, f"union_{comprimir}.pdf")
+            unir_pdfs([primero, segundo], destino, comprimir=comprimir)
+            lector = PdfReader(destino)
+            self.assertEqual(
+                [p.extract_text().strip() for p in lector.pages], ["Uno", "Dos", "Tres"],
+            )
+
+    def test_unir_en_flujo_con_copia(self):
+        primero = self.escribir("uno.pdf", pdf_prueba("Uno", "Dos"))
+        segundo = self.escribir("dos.pdf", pdf_prueba("Tres"))
+        copia = os.path.join(self.media, "copia.pdf")
+
+        trozos = list(unir_pdfs_en_flujo([primero, segundo], copia=copia, comprimir=True))
+        # Un trozo por página más el cierre (catálogo y xref)
+        self.assertEqual(len(trozos), 4)
+        with open(copia, "rb") as archivo:
+            self.assertEqual(archivo.read(), b"".join(trozos))
+        self.assertEqual(len(PdfReader(copia).pages), 3)
+
+
+    def test_informe_completo_ligado_al_trabajo(self):
+        if Image is None:
+            self.skipTest("Pillow no está instalado")
+        parche = mock.patch("automa.catalogo.CARPETA_DESCARGAS", os.path.join(self.media, "descargas"))
+        parche.start()
+        self.addCleanup(parche.stop)
+
+        for variante in ("disco", "flujo"):
+            trabajo = Trabajo.objects.create(numero_documento="123", estado=Trabajo.COMPLETADO)
+            certificado = self.escribir(f"descargas/trabajos/123/{trabajo.id}/123_cert.pdf", pdf_prueba("Cert"))
+            carpeta = os.path.dirname(certificado)
+            imagen_prueba(carpeta, "ofac_final.png")
+
+            if variante == "disco":
+                generar_informe_completo(carpeta)
+            else:
+                list(informe_completo_en_flujo(carpeta)[1])
+
+            informe = Artefacto.objects.get(tipo=Artefacto.INFORME, trabajo=trabajo)
+            self.assertEqual((informe.nombre, informe.numero_documento), ("INFORME DE CONSULTAS_123.pdf", "123"))
+            self.assertEqual(len(PdfReader(os.path.join(carpeta, informe.nombre)).pages), 2)
+
+# ===================================================
+# 🗺️ COMPILADOR DE PLANES
+# ===================================================
+
+class PruebasPlan(TestCase):
+
+    def test_errores_de_configuracion(self):
+        config = {
+            "url": "ftp://portal",
+            "estrategia_carga": "rapida",
+            "circuito": {"intentos": 3},
+            "extra_eventos": [
+                {"tipo": "volar"},
+                {"tipo": "escribir", "selector": "#doc"},
+                {"tipo": "click", "selector": "#b", "esperar": [{"tipo": "eterno"}]},
+            ],
+            "capturas": ["evento_9"],
+        }
+        errores = validar_portal("portal", config)
+        texto = "\n".join(errores)
+
+        self.assertEqual(len(errores), 7)
+        self.assertIn("'url' inválida", texto)
+        self.assertIn("'estrategia_carga'", texto)
+        self.assertIn("'circuito' solo admite", texto)
+        self.assertIn("tipo de evento desconocido 'volar'", texto)
+        self.assertIn("el evento 'escribir' requiere 'texto'", texto)
+        self.assertIn("condición de espera desconocida 'eterno'", texto)
+        self.assertIn("la captura 'evento_9' no corresponde", texto)
+
+        with self.assertRaises(ErrorConfiguracion):
+            compilar_portal("portal", config)
+
+    def test_errores_de_todos_los_portales_juntos(self):
+        paginas = {
+            "bueno": {"url": "https://bueno/"},
+            "uno": {"url": "nada"},
+            "dos": {"url": "https://dos/", "http": {"adaptador": "magia"}},
+        }
+        with self.assertRaises(ErrorConfiguracion) as error:
+            compilar_paginas(paginas)
+        self.assertIn("uno: 'url' inválida", str(error.exception))
+        self.assertIn("dos: adaptador HTTP desconocido 'magia'", str(error.exception))
+        self.assertNotIn("bueno", str(error.exception))
+
+    def test_acciones_seguidas_se_fusionan(self):
+        plan = compilar_portal("portal", {
+            "url": "https://portal/",
+            "capturas": ["final"],
+            "extra_eventos": [
+                {"tipo": "zoom", "valor": 0.8},
+                {"tipo": "scroll", "valor": 400},
+                {"tipo": "click", "selector": "#buscar"},
+                {"tipo": "escribir", "selector": "#doc", "texto": "123"},
+            ],
+        })
+        self.assertEqual([p["tipo"] for p in plan["pasos"]], ["lote", "evento"])
+        self.assertEqual(plan["pasos"][0]["indices"], [1, 2, 3])
+        self.assertEqual(plan["pasos"][1]["indice"], 4)
+
+    def test_paginas_del_proyecto_compilan(self):
+        from .selenium_script import paginas
+        self.assertEqual(set(compilar_paginas(paginas)), set(paginas))
+
+
+class DriverLote:
+    """Driver falso: el lote se corta y sessionStorage dice cuántas acciones alcanzó a disparar."""
+
+    def __init__(self, disparadas):
+        self.disparadas = disparadas
+
+    def set_script_timeout(self, segundos):
+        pass
+
+    def execute_async_script(self, *args):
+        raise TimeoutError("script timeout")
+
+    def execute_script(self, script, clave):
+        if self.disparadas is None:
+            raise RuntimeError("otro origen")
+        return str(self.disparadas)
+
+
+@mock.patch("automa.selenium_script.tomar_captura")
+@mock.patch("automa.selenium_script.ejecutar_evento", return_value=True)
+class PruebasLoteCortado(TestCase):
+
+    def setUp(self):
+        self.plan = compilar_portal("portal", {
+            "url": "https://portal/",
+            "capturas": ["final"],
+            "extra_eventos": [
+                {"tipo": "zoom", "valor": 0.8},
+                {"tipo": "click", "selector": "#pestana"},
+                {"tipo": "scroll", "valor": 400},
+                {"tipo": "click", "selector": "#buscar"},
+            ],
+        })
+        self.ctx = mock.Mock(id="trabajo")
+
+    def ejecutar(self, disparadas):
+        from .selenium_script import ejecutar_lote
+        with self.assertLogs(level="WARNING"):
+            ejecutar_lote(DriverLote(disparadas), self.ctx, "portal", self.plan["pasos"][0], {})
+
+    def test_no_repite_lo_disparado(self, ejecutar_evento, tomar_captura):
+        self.ejecutar(2)
+        self.assertEqual([c.args[4] for c in ejecutar_evento.call_args_list], [3, 4])
+
+    def test_progreso_desconocido_no_repite_clicks(self, ejecutar_evento, tomar_captura):
+        self.ejecutar(None)
+        self.assertEqual([c.args[3]["tipo"] for c in ejecutar_evento.call_args_list], ["zoom", "scroll"])
+
+
+@mock.patch("builtins.print", lambda *a, **k: None)
+class PruebasPortalesPropios(ConCarpetaTemporal):
+    """``ejecutar_consulta(portales=...)`` usa los planes de esos portales, no los de ``paginas``."""
+
+    def test_compila_los_portales_dados(self):
+        from . import selenium_script
+
+        portales = {
+            "ofac": {
+                "url": "https://ofac/",
+                "capturas": ["final"],
+                "extra_eventos": [{"tipo": "scroll", "valor": 10}],
+            },
+            "nuevo": {"url": "https://nuevo/"},
+        }
+        with mock.patch.object(selenium_script, "procesar_pagina_en_pool") as procesar:
+            selenium_script.ejecutar_consulta("123", carpeta=self.media, portales=portales)
+
+        planes = {c.args[1]: c.args[5] for c in procesar.call_args_list}
+        self.assertEqual(planes["ofac"]["pasos"][0]["evento"]["valor"], 10)
+        self.assertEqual(planes["nuevo"]["pasos"], [])
+
+    def test_portales_invalidos(self):
+        from . import selenium_script
+
+        with self.assertRaises(ErrorConfiguracion):
+            selenium_script.ejecutar_consulta("123", carpeta=self.media, portales={"malo": {"url": "x"}})
+
+    def test_semaforo_de_portal_nuevo(self):
+        from .selenium_script import semaforo_portal, semaforos_portal
+
+        self.addCleanup(semaforos_portal.pop, "portal_de_prueba", None)
+        semaforo = semaforo_portal("portal_de_prueba", {"max_concurrencia": 1})
+        self.assertIs(semaforo_portal("portal_de_prueba", {}), semaforo)
+        self.assertTrue(semaforo.acquire(blocking=False))
+        self.assertFalse(semaforo.acquire(blocking=False))
+        semaforo.release()
+
+
+# ===================================================
+# 🔌 CORTACIRCUITOS Y REINTENTOS
+# ===================================================
+
+@mock.patch("builtins.print", lambda *a, **k: None)
+class PruebasCircuito(TestCase):
+
+    def setUp(self):
+        self.circuito = CircuitoPortal("portal", umbral=2, espera=10, espera_max=30)
+
+    def vencer_espera(self):
+        self.circuito.abierto_hasta = 0.0
+
+    def test_se_abre_tras_el_umbral(self):
+        self.circuito.fallo("uno")
+        self.assertEqual(self.circuito.estado, CERRADO)
+        self.assertTrue(self.circuito.permitir())
+
+        with self.assertLogs(level="ERROR"):
+            self.circuito.fallo("dos")
+        self.assertEqual(self.circuito.estado, ABIERTO)
+        self.assertFalse(self.circuito.permitir())
+        self.assertGreater(self.circuito.reintentar_en(), 0)
+
+    def test_exito_reinicia_la_cuenta(self):
+        self.circuito.fallo()
+        self.circuito.exito()
+        self.circuito.fallo()
+        self.assertEqual(self.circuito.estado, CERRADO)
+        self.assertEqual(self.circuito.tasa_fallos(), 2 / 3)
+
+    def test_sondeo_semiabierto(self):
+        with self.assertLogs(level="ERROR"):
+            self.circuito.fallo()
+            self.circuito.fallo()
+
+            # Un solo sondeo a la vez; si falla se duplica la espera hasta el tope
+            for espera in (20, 30, 30):
+                self.vencer_espera()
+                self.assertTrue(self.circuito.permitir())
+                self.assertEqual(self.circuito.estado, SEMIABIERTO)
+                self.assertFalse(self.circuito.permitir())
+                self.circuito.fallo()
+                self.assertEqual(self.circuito.estado, ABIERTO)
+                self.assertEqual(self.circuito.espera, espera)
+
+        self.vencer_espera()
+        self.assertTrue(self.circuito.permitir())
+        self.circuito.exito()
+        self.assertEqual(self.circuito.estado, CERRADO)
+        self.assertEqual(self.circuito.espera, 10)
+        self.assertEqual(self.circuito.reintentar_en(), 0)
+
+    def test_cancelar_libera_el_sondeo(self):
+        with self.assertLogs(level="ERROR"):
+            self.circuito.fallo()
+            self.circuito.fallo()
+        self.vencer_espera()
+        self.assertTrue(self.circuito.permitir())
+        self.circuito.cancelar()
+        self.assertEqual(self.circuito.estado, SEMIABIERTO)
+        self.assertTrue(self.circuito.permitir())
+
+    def test_errores_transitorios(self):
+        self.assertTrue(es_transitorio(ConnectionError("reset")))
+        self.assertTrue(es_transitorio(Exception("unknown error: net::ERR_CONNECTION_RESET")))
+        self.assertTrue(es_transitorio(ErrorPortal("caído", transitorio=True)))
+        self.assertFalse(es_transitorio(ErrorPortal("sin resultado")))
+        self.assertFalse(es_transitorio(ValueError("selector inválido")))
+
+
+@mock.patch("automa.circuito.pausa_reintento", lambda intento: 0.5)
+@mock.patch("automa.circuito.time.sleep")
+class PruebasReintentar(TestCase):
+
+    def fallar(self, errores, resultado="ok"):
+        pendientes = list(errores)
+
+        def funcion():
+            funcion.llamadas += 1
+            if pendientes:
+                raise pendientes.pop(0)
+            return resultado
+
+        funcion.llamadas = 0
+        return funcion
+
+    def test_reintenta_errores_transitorios(self, dormir):
+        funcion = self.fallar([ConnectionError("a"), ConnectionError("b")])
+        with self.assertLogs(level="WARNING"):
+            self.assertEqual(reintentar(funcion, SIN_LIMITE, "portal", intentos=2), "ok")
+        self.assertEqual(funcion.llamadas, 3)
+        self.assertEqual(dormir.call_args_list, [mock.call(0.5), mock.call(0.5)])
+
+    def test_no_reintenta_otros_errores(self, dormir):
+        funcion = self.fallar([ValueError("selector inválido")])
+        with self.assertRaises(ValueError):
+            reintentar(funcion, SIN_LIMITE, "portal", intentos=2)
+        self.assertEqual(funcion.llamadas, 1)
+        dormir.assert_not_called()
+
+    def test_agota_los_intentos(self, dormir):
+        funcion = self.fallar([ConnectionError("a")] * 5)
+        with self.assertLogs(level="WARNING"), self.assertRaises(ConnectionError):
+            reintentar(funcion, SIN_LIMITE, "portal", intentos=1)
+        self.assertEqual(funcion.llamadas, 2)
+
+    def test_respeta_el_plazo(self, dormir):
+        funcion = self.fallar([ConnectionError("a")])
+        with self.assertRaises(ConnectionError):
+            reintentar(funcion, Plazo(0.2), "portal", intentos=2)
+        self.assertEqual(funcion.llamadas, 1)
+        dormir.assert_not_called()
+
+
+# ===================================================
+# ⏳ PLAZO
+# ===================================================
+
+class PruebasPlazo(TestCase):
+
+    def test_limitar(self):
+        plazo = Plazo(10)
+        self.assertEqual(plazo.limitar(3), 3)
+        self.assertLessEqual(plazo.limitar(60), 10)
+        self.assertEqual(Plazo(fin=time.monotonic() - 1).limitar(5), 0)
+        self.assertEqual(SIN_LIMITE.limitar(5), 5)
+
+    def test_hijo_no_excede_al_padre(self):
+        padre = Plazo(5)
+        self.assertLessEqual(padre.hijo(60).restante(), 5)
+        self.assertLessEqual(padre.hijo(2).restante(), 2)
+        self.assertEqual(padre.hijo().fin, padre.fin)
+
+    def test_cancelar_agota_a_los_hijos(self):
+        padre = Plazo(60)
+        hijo = padre.hijo(30)
+        nieto = hijo.hijo()
+        padre.cancelar()
+        self.assertTrue(hijo.agotado())
+        self.assertEqual(nieto.restante(), 0)
+
+        hermano = Plazo(60).hijo()
+        hermano.cancelar()
+        self.assertFalse(hermano.padre.agotado())
+
+    def test_verificar(self):
+        Plazo(60).verificar("captura")
+        with self.assertRaisesMessage(PlazoAgotado, "Plazo agotado antes de: captura"):
+            Plazo(fin=time.monotonic() - 1).verificar("captura")
+
+
+# ===================================================
+# 🗃️ CACHÉ DE RESULTADOS
+# ===================================================
+
+@mock.patch("builtins.print", lambda *a, **k: None)
+class PruebasCache(ConCarpetaTemporal):
+
+    def setUp(self):
+        super().setUp()
+        carpeta = mock.patch("automa.cache.CARPETA_CACHE", os.path.join(self.media, "descargas", "cache"))
+        carpeta.start()
+        self.addCleanup(carpeta.stop)
+
+    def entrada(self, documento, tamano=100, hace=0):
+        momento = timezone.now() - timedelta(minutes=hace)
+        return ResultadoPortal.objects.create(
+            portal="ofac", numero_documento=documento, tamano=tamano, creado=momento, ultimo_acceso=momento,
+        )
+
+    def test_entrada_vigente_y_vencida(self):
+        captura = self.escribir("descargas/trabajos/t1/ofac_final.jpg")
+        cache.guardar_en_cache("ofac", "123", [captura], [])
+        carpeta = cache.carpeta_entrada("ofac", "123")
+        self.assertTrue(os.path.exists(os.path.join(carpeta, "ofac_final.jpg")))
+
+        entrada = cache.buscar_en_cache("ofac", "123", 3600)
+        self.assertIsNotNone(entrada)
+        self.assertIsNone(cache.buscar_en_cache("ofac", "123", 0))
+
+        ResultadoPortal.objects.update(creado=timezone.now() - timedelta(hours=2))
+        self.assertIsNone(cache.buscar_en_cache("ofac", "123", 3600))
+        self.assertFalse(ResultadoPortal.objects.exists())
+        self.assertFalse(os.path.exists(carpeta))
+
+    def test_reemplazo_sin_borrar_la_entrada_en_uso(self):
+        captura = self.escribir("descargas/trabajos/t1/ofac_final.jpg", b"vieja")
+        extra = self.escribir("descargas/trabajos/t1/ofac_extra.pdf", b"pdf")
+        cache.guardar_en_cache("ofac", "123", [captura], [extra])
+        en_uso = cache.buscar_en_cache("ofac", "123", 3600).capturas[0]
+
+        nueva = self.escribir("descargas/trabajos/t2/ofac_final.jpg", b"nueva")
+        with mock.patch("automa.cache.shutil.rmtree", wraps=shutil.rmtree) as rmtree:
+            cache.guardar_en_cache("ofac", "123", [nueva], [])
+        carpeta = cache.carpeta_entrada("ofac", "123")
+        self.assertNotIn(carpeta, [c.args[0] for c in rmtree.call_args_list])
+
+        with open(en_uso, "rb") as f:
+            self.assertEqual(f.read(), b"nueva")
+        self.assertEqual(os.listdir(carpeta), ["ofac_final.jpg"])
+        self.assertEqual(os.listdir(os.path.dirname(carpeta)), ["123"])
+        entrada = ResultadoPortal.objects.get()
+        self.assertEqual((entrada.capturas, entrada.archivos, entrada.tamano), ([en_uso], [], 5))
+
+    def test_entrada_con_archivos_faltantes(self):
+        captura = self.escribir("descargas/trabajos/t1/ofac_final.jpg")
+        cache.guardar_en_cache("ofac", "123", [captura], [])
+        os.remove(os.path.join(cache.carpeta_entrada("ofac", "123"), "ofac_final.jpg"))
+        self.assertIsNone(cache.buscar_en_cache("ofac", "123", 3600))
+        self.assertFalse(ResultadoPortal.objects.exists())
+
+    def test_desalojo_lru(self):
+        for documento, hace in (("1", 30), ("2", 10), ("3", 20)):
+            self.entrada(documento, hace=hace)
+
+        cache.desalojar(max_bytes=300)
+        self.assertEqual(ResultadoPortal.objects.count(), 3)
+
+        cache.desalojar(max_bytes=150)
+        self.assertEqual(list(ResultadoPortal.objects.values_list("numero_documento", flat=True)), ["2"])
+
+    def test_carpeta_dentro_de_la_cache(self):
+        base = os.path.realpath(cache.CARPETA_CACHE)
+        carpeta = cache.carpeta_entrada("ofac", "../../../etc")
+        self.assertEqual(os.path.dirname(os.path.dirname(carpeta)), base)
+
+        afuera = os.path.join(self.media, "afuera")
+        os.makedirs(afuera)
+        os.makedirs(base, exist_ok=True)
+        os.symlink(afuera, os.path.join(base, "rues"))
+        with self.assertRaises(ValueError):
+            cache.carpeta_entrada("rues", "123")
+
+
+# ===================================================
+# 🧹 RETENCIÓN DE ARTEFACTOS
+# ===================================================
+
+class PruebasRetencion(ConCarpetaTemporal):
+
+    def setUp(self):
+        super().setUp()
+        descargas_media = os.path.join(self.media, "descargas")
+        for parche in (
+            mock.patch("automa.retencion.CARPETA_DESCARGAS", descargas_media),
+            mock.patch("automa.catalogo.CARPETA_DESCARGAS", descargas_media),
+            mock.patch("automa.retencion.RETENCION_PAUSA", 0),
+        ):
+            parche.start()
+            self.addCleanup(parche.stop)
+        self.activo = Trabajo.objects.create(
+            numero_documento="999", estado=Trabajo.EN_PROCESO, carpeta="descargas/trabajos/activo",
+        )
+
+    def artefacto(self, relativa, tipo=Artefacto.CAPTURA, dias=0, accedido=None, tamano=None, trabajo=None):
+        ruta = self.escribir(relativa)
+        creado = timezone.now() - timedelta(days=dias)
+        return Artefacto.objects.create(
+            trabajo=trabajo, tipo=tipo, nombre=os.path.basename(ruta), ruta=relativa,
+            tamano=tamano if tamano is not None else os.path.getsize(ruta),
+            creado=creado, accedido=accedido or creado,
+        )
+
+    def existe(self, relativa):
+        return os.path.exists(os.path.join(self.media, *relativa.split("/")))
+
+    def test_reconciliar_ignora_temporales(self):
+        carpeta = "descargas/trabajos/2026/01/02/123/t1"
+        for nombre in ("ofac_final.jpg", "123_cert.pdf", "INFORME DE CONSULTAS_base_x1.pdf",
+                       "INFORME DE CONSULTAS_x2.parcial", "123_cert.pdf.crdownload", "x3.enlace",
+                       "manifiesto.json.tmp"):
+            self.escribir(f"{carpeta}/{nombre}")
+
+        resumen = catalogo.reconciliar(carpeta=os.path.join(self.media, "descargas"))
+
+        self.assertEqual(resumen["agregados"], 2)
+        self.assertEqual(
+            sorted(Artefacto.objects.values_list("nombre", flat=True)), ["123_cert.pdf", "ofac_final.jpg"],
+        )
+
+    def test_vencer_por_tipo(self):
+        self.artefacto("descargas/trabajos/viejo/ofac_final.jpg", dias=8)
+        self.artefacto("descargas/trabajos/viejo2/cert.pdf", tipo=Artefacto.ARCHIVO, dias=8)
+        self.artefacto("descargas/trabajos/nuevo/ofac_final.jpg", dias=1)
+        self.artefacto("descargas/trabajos/activo/rues_final.jpg", dias=8)
+        self.artefacto("descargas/trabajos/otro/informe_999.pdf", tipo=Artefacto.INFORME, dias=100,
+                       trabajo=self.activo)
+
+        cantidad, liberado = retencion.vencer()
+
+        self.assertEqual((cantidad, liberado), (1, 4))
+        self.assertFalse(self.existe("descargas/trabajos/viejo"))
+        for relativa in (
+            "descargas/trabajos/viejo2/cert.pdf",
+            "descargas/trabajos/nuevo/ofac_final.jpg",
+            "descargas/trabajos/activo/rues_final.jpg",
+            "descargas/trabajos/otro/informe_999.pdf",
+        ):
+            self.assertTrue(self.existe(relativa), relativa)
+        self.assertEqual(Artefacto.objects.count(), 4)
+
+    def test_vencer_simulado_no_borra(self):
+        self.artefacto("descargas/trabajos/viejo/ofac_final.jpg", dias=8)
+        self.assertEqual(retencion.vencer(simular=True), (1, 4))
+        self.assertTrue(self.existe("descargas/trabajos/viejo/ofac_final.jpg"))
+        self.assertEqual(Artefacto.objects.count(), 1)
+
+    def test_cuota_desaloja_lo_menos_usado(self):
+        mb = 1024 * 1024
+        ahora = timezone.now()
+        self.artefacto("descargas/trabajos/activo/a.jpg", accedido=ahora - timedelta(days=3), tamano=mb)
+        self.artefacto("descargas/trabajos/t1/b.jpg", accedido=ahora - timedelta(days=2), tamano=mb)
+        self.artefacto("descargas/trabajos/t2/c.jpg", accedido=ahora - timedelta(days=1), tamano=mb)
+        self.artefacto("descargas/trabajos/t3/d.jpg", accedido=ahora, tamano=mb)
+
+        self.assertEqual(retencion.aplicar_cuota(cuota_mb=3), (1, mb))
+        self.assertFalse(self.existe("descargas/trabajos/t1/b.jpg"))
+        self.assertTrue(self.existe("descargas/trabajos/activo/a.jpg"))
+        self.assertTrue(self.existe("descargas/trabajos/t2/c.jpg"))
+        self.assertEqual(retencion.aplicar_cuota(cuota_mb=None), (0, 0))
+
+    @mock.patch("automa.retencion.BLOB_GRACIA", -60)
+    def test_recoger_blobs_sin_enlaces(self):
+        huerfano = self.escribir("descargas/blobs/ab/cd/abcd.pdf")
+        enlazado = self.escribir("descargas/blobs/ab/ce/abce.pdf", b"certificado")
+        os.makedirs(os.path.join(self.media, "descargas", "trabajos", "t1"))
+        os.link(enlazado, os.path.join(self.media, "descargas", "trabajos", "t1", "cert.pdf"))
+
+        self.assertEqual(retencion.recoger_blobs(256, simular=True), (1, 4))
+        self.assertTrue(os.path.exists(huerfano))
+
+        self.assertEqual(retencion.recoger_blobs(256), (1, 4))
+        self.assertFalse(os.path.exists(os.path.dirname(huerfano)))
+        self.assertTrue(os.path.exists(enlazado))
+
+    def test_recoger_blobs_respeta_la_gracia(self):
+        reciente = self.escribir("descargas/blobs/ab/cd/abcd.pdf")
+        self.assertEqual(retencion.recoger_blobs(256), (0, 0))
+        self.assertTrue(os.path.exists(reciente))
+
+
+# ===================================================
+# 📥 DETECCIÓN DE DESCARGAS
+# ===================================================
+
+class PruebasDescargas(ConCarpetaTemporal):
+
+    def descargar_despues(self, nombre, segundos=0.3):
+        """Simula a Chrome: escribe el parcial y lo renombra al terminar."""
+        parcial = os.path.join(self.media, nombre + ".crdownload")
+
+        def escribir():
+            with open(parcial, "wb") as archivo:
+                archivo.write(b"%PDF-")
+            time.sleep(segundos)
+            os.rename(parcial, os.path.join(self.media, nombre))
+
+        hilo = threading.Thread(target=escribir)
+        hilo.start()
+        self.addCleanup(hilo.join)
+        return hilo
+
+    def test_espera_el_renombre_del_parcial(self):
+        self.descargar_despues("123_ofac.pdf")
+        inicio = time.monotonic()
+        ruta = descargas.esperar_descarga(self.media, timeout=10, gracia=5)
+
+        self.assertEqual(ruta, os.path.join(self.media, "123_ofac.pdf"))
+        self.assertLess(time.monotonic() - inicio, 5)
+
+    def test_ignora_archivos_previos(self):
+        previo = self.escribir("previo.pdf")
+        self.descargar_despues("nuevo.pdf")
+        ruta = descargas.esperar_descarga(self.media, ignorar={previo}, timeout=10, gracia=5)
+        self.assertEqual(ruta, os.path.join(self.media, "nuevo.pdf"))
+
+    def test_sin_descarga_tras_la_gracia(self):
+        inicio = time.monotonic()
+        self.assertIsNone(descargas.esperar_descarga(self.media, timeout=10, gracia=0.3))
+        self.assertLess(time.monotonic() - inicio, 5)
+
+    def test_descarga_que_no_termina(self):
+        self.escribir("lento.pdf.crdownload")
+        with self.assertLogs(level="WARNING"):
+            self.assertIsNone(descargas.esperar_descarga(self.media, timeout=0.5, gracia=0.1))
+
+    def test_vigilante_despierta_con_cambios(self):
+        if descargas._libc is None:
+            self.skipTest("inotify no disponible")
+        with descargas.VigilanteCarpeta(self.media) as vigilante:
+            self.assertIsNotNone(vigilante.fd)
+            threading.Timer(0.2, self.escribir, args=("nuevo.pdf",)).start()
+            inicio = time.monotonic()
+            vigilante.esperar(5)
+            self.assertLess(time.monotonic() - inicio, 4)
+        self.assertIsNone(vigilante.fd)
+
+
+# ===================================================
+# 🧪 PORTALES SIMULADOS (VÍA HTTP)
+# ===================================================
+
+@mock.patch("builtins.print", lambda *a, **k: None)
+class PruebasPortalesSimulados(ConCarpetaTemporal):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.servidor = ServidorSimulado().iniciar()
+        cls.paginas = paginas_simuladas(cls.servidor.url)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.servidor.detener()
+        super().tearDownClass()
+
+    def test_adaptador_formulario(self):
+        ctx = ContextoTrabajo("123", os.path.join(self.media, "descargas"))
+        config = self.paginas["ofac"]
+        html, url = ADAPTADORES[config["http"]["adaptador"]]("ofac", config).consultar(ctx)
+
+        self.assertIn("Lookup results for ID # 123", html)
+        self.assertEqual(url, self.servidor.url + "/ofac/")
+        self.assertIn("0 found", ctx.datos["ofac"]["resultado"])
+
+    def test_consulta_por_http_guarda_el_html(self):
+        ctx = ContextoTrabajo("123", os.path.join(self.media, "descargas"))
+        config = dict(self.paginas["ofac"], captura_pantalla=False)
+
+        self.assertTrue(consultar_por_http(ctx, "ofac", config))
+        ruta = os.path.join(ctx.carpeta, "ofac_resultado.html")
+        self.assertEqual(ctx.artefactos_portal("ofac")[1], [ruta])
+        with open(ruta, encoding="utf-8") as archivo:
+            self.assertIn("Lookup results for ID # 123", archivo.read())
+
+    def test_render_fallido_no_deja_el_html(self):
+        ctx = ContextoTrabajo("123", os.path.join(self.media, "descargas"))
+        config = self.paginas["ofac"]
+        with mock.patch("automa.adaptadores.renderizar_html", side_effect=TimeoutError("sin navegador")), \
+                self.assertLogs(level="WARNING"):
+            self.assertFalse(consultar_por_http(ctx, "ofac", config, Plazo(30)))
+
+        self.assertEqual(ctx.artefactos_portal("ofac")[1], [])
+        self.assertFalse(os.path.exists(os.path.join(ctx.carpeta, "ofac_resultado.html")))
+
+    def test_render_usa_el_pool_del_portal_y_el_plazo(self):
+        ctx = ContextoTrabajo("123", os.path.join(self.media, "descargas"))
+        config = self.paginas["ofac"]
+        with mock.patch("automa.adaptadores.obtener_pool") as obtener_pool, \
+                mock.patch("automa.selenium_script.tomar_captura"):
+            self.assertTrue(consultar_por_http(ctx, "ofac", config, Plazo(30)))
+
+        obtener_pool.assert_called_once_with(config["estrategia_carga"])
+        self.assertLessEqual(obtener_pool.return_value.driver.call_args.kwargs["timeout"], 30)
+        self.assertEqual(len(ctx.artefactos_portal("ofac")[1]), 1)
+
+    def test_portal_caido_pasa_a_selenium(self):
+        ctx = ContextoTrabajo("123", os.path.join(self.media, "descargas"))
+        config = dict(self.paginas["ofac"], url=self.servidor.url + "/no_existe/", captura_pantalla=False)
+        with self.assertLogs(level="WARNING"):
+            self.assertFalse(consultar_por_http(ctx, "ofac", config))
+
+    def test_certificados_simulados_se_unen(self):
+        from urllib.request import urlopen
+
+        rutas = []
+        for portal in ("rues", "contraloria"):
+            with urlopen(f"{self.servidor.url}/{portal}/certificado.pdf?doc=123") as respuesta:
+                rutas.append(self.escribir(f"{portal}.pdf", respuesta.read()))
+
+        destino = unir_pdfs(rutas, os.path.join(self.media, "union.pdf"), comprimir=True)
+        textos = [p.extract_text() for p in PdfReader(destino).pages]
+        self.assertIn("CERTIFICADO RUES", textos[0])
+        self.assertIn("CERTIFICADO CONTRALORIA", textos[1])
+
+
+# ===================================================
+# 🌐 API ASÍNCRONA: COLA, LOTES Y EVENTOS
+# ===================================================
+
+@mock.patch("builtins.print", lambda *a, **k: None)
+class PruebasApiConsultas(TestCase):
+
+    def setUp(self):
+        self.cliente = AsyncClient()
+
+    async def test_documento_invalido(self):
+        respuesta = await self.cliente.post(reverse("run_consulta"), {"numero": "--.."})
+        self.assertEqual(respuesta.status_code, 400)
+        respuesta = await self.cliente.get(reverse("run_consulta"))
+        self.assertEqual(respuesta.status_code, 405)
+
+    async def test_cola_llena_responde_429(self):
+        from . import cola
+
+        with mock.patch.object(cola._executor, "max_pendientes", 0):
+            respuesta = await self.cliente.post(reverse("run_consulta"), {"numero": "123"})
+
+        self.assertEqual(respuesta.status_code, 429)
+        self.assertEqual(respuesta["Retry-After"], str(respuesta.json()["reintentar_en"]))
+        self.assertGreaterEqual(int(respuesta["Retry-After"]), 1)
+        # El trabajo rechazado no queda registrado
+        self.assertEqual(await Trabajo.objects.acount(), 0)
+
+    async def test_consulta_en_cola(self):
+        trabajo = await Trabajo.objects.acreate(numero_documento="123")
+        with mock.patch("automa.views.encolar_consulta", return_value=trabajo) as encolar:
+            respuesta = await self.cliente.post(reverse("run_consulta"), {"numero": "1.234-5", "forzar": "1"})
+
+        encolar.assert_called_once_with("12345", forzar=True)
+        self.assertEqual(respuesta.status_code, 202)
+        datos = respuesta.json()
+        self.assertEqual(datos["trabajo"], str(trabajo.pk))
+        self.assertEqual(datos["estado_url"], reverse("estado_consulta", args=[trabajo.pk]))
+        self.assertEqual(datos["eventos_url"], reverse("eventos_consulta", args=[trabajo.pk]))
+
+    async def test_esperar_devuelve_el_resultado(self):
+        trabajo = await Trabajo.objects.acreate(
+            numero_documento="123", estado=Trabajo.COMPLETADO, progreso=100,
+            resultado={"informe_pdf": "/media/informe_123.pdf"},
+        )
+        # El "fin" llega desde otro hilo, como lo publica la cola
+        threading.Timer(0.1, publicar, args=(trabajo.pk.hex, "fin"), kwargs={"estado": "completado"}).start()
+        with mock.patch("automa.views.encolar_consulta", return_value=trabajo):
+            respuesta = await self.cliente.post(reverse("run_consulta"), {"numero": "123", "esperar": "1"})
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()["informe_pdf"], "/media/informe_123.pdf")
+
+    async def test_esperar_cancela_al_desconectarse(self):
+        from .views import esperar_trabajo
+
+        trabajo = await Trabajo.objects.acreate(numero_documento="123")
+        with mock.patch("automa.views.cancelar_trabajo") as cancelar_trabajo:
+            tarea = asyncio.ensure_future(esperar_trabajo(trabajo))
+            await asyncio.sleep(0.05)
+            tarea.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await tarea
+        cancelar_trabajo.assert_called_once_with(trabajo.pk)
+
+    async def test_estado_consulta(self):
+        respuesta = await self.cliente.get(reverse("estado_consulta", args=[uuid.uuid4()]))
+        self.assertEqual(respuesta.status_code, 404)
+
+        en_curso = await Trabajo.objects.acreate(
+            numero_documento="1", estado=Trabajo.EN_PROCESO, etapa="Consultando portales", progreso=30,
+        )
+        datos = (await self.cliente.get(reverse("estado_consulta", args=[en_curso.pk]))).json()
+        self.assertEqual(datos, {
+            "status": "ok", "trabajo": str(en_curso.pk), "numero": "1",
+            "estado": Trabajo.EN_PROCESO, "etapa": "Consultando portales", "progreso": 30,
+        })
+
+        completo = await Trabajo.objects.acreate(
+            numero_documento="2", estado=Trabajo.COMPLETADO, progreso=100, resultado={"tiempo": "3.00 segundos"},
+        )
+        datos = (await self.cliente.get(reverse("estado_consulta", args=[completo.pk]))).json()
+        self.assertEqual(datos["tiempo"], "3.00 segundos")
+        self.assertIn("completada", datos["msg"])
+
+        fallido = await Trabajo.objects.acreate(numero_documento="3", estado=Trabajo.ERROR, error="sin red")
+        datos = (await self.cliente.get(reverse("estado_consulta", args=[fallido.pk]))).json()
+        self.assertEqual(datos["status"], "error")
+        self.assertIn("sin red", datos["msg"])
+
+
+class PruebasApiLotes(TestCase):
+
+    def setUp(self):
+        self.cliente = AsyncClient()
+
+    async def enviar(self, *args, **kwargs):
+        lote = await Lote.objects.acreate(nombre="prueba")
+        with mock.patch("automa.views.encolar_lote", return_value=lote) as encolar:
+            respuesta = await self.cliente.post(reverse("consulta_lote"), *args, **kwargs)
+        return respuesta, encolar
+
+    async def test_csv(self):
+        archivo = SimpleUploadedFile(
+            "clientes.csv", "﻿documento,nombre\n1.234,Ana\n5678,Luis\n1234,Ana\n\n".encode(),
+        )
+        respuesta, encolar = await self.enviar({"archivo": archivo})
+
+        self.assertEqual(respuesta.status_code, 202)
+        self.assertEqual(encolar.call_args.args[0], ["1234", "5678"])
+        self.assertEqual(encolar.call_args.kwargs["nombre"], "clientes.csv")
+
+    async def test_json_y_campo_de_texto(self):
+        _, encolar = await self.enviar(
+            json.dumps({"numeros": ["900.123.456-7", 42, "NIT"]}), content_type="application/json",
+        )
+        self.assertEqual(encolar.call_args.args[0], ["9001234567", "42"])
+
+        _, encolar = await self.enviar(json.dumps(["1", "2"]), content_type="application/json")
+        self.assertEqual(encolar.call_args.args[0], ["1", "2"])
+
+        _, encolar = await self.enviar({"numeros": "11; 22,33\n44"})
+        self.assertEqual(encolar.call_args.args[0], ["11", "22", "33", "44"])
+
+    async def test_listas_invalidas(self):
+        respuesta, encolar = await self.enviar("{roto", content_type="application/json")
+        self.assertEqual(respuesta.status_code, 400)
+        respuesta, _ = await self.enviar({"numeros": "documento"})
+        self.assertEqual(respuesta.status_code, 400)
+        with mock.patch("automa.views.LOTE_MAX_DOCUMENTOS", 2):
+            respuesta, _ = await self.enviar({"numeros": "1 2 3"})
+        self.assertEqual(respuesta.status_code, 400)
+        encolar.assert_not_called()
+
+    async def test_lotes_pendientes_responden_429(self):
+        with mock.patch("automa.cola.LOTE_MAX_PENDIENTES", 2):
+            respuesta = await self.cliente.post(reverse("consulta_lote"), {"numeros": "1 2 3"})
+
+        self.assertEqual(respuesta.status_code, 429)
+        self.assertIn("Retry-After", respuesta)
+        self.assertFalse(await Lote.objects.aexists())
+
+
+class PruebasApiEventos(TestCase):
+
+    def setUp(self):
+        self.cliente = AsyncClient()
+
+    async def leer(self, trabajo, cabeceras=None):
+        respuesta = await self.cliente.get(reverse("eventos_consulta", args=[trabajo.pk]), headers=cabeceras)
+        self.assertEqual(respuesta["Content-Type"], "text/event-stream")
+        return b"".join([trozo async for trozo in respuesta.streaming_content]).decode()
+
+    async def test_retoma_con_last_event_id(self):
+        trabajo = await Trabajo.objects.acreate(numero_documento="123", estado=Trabajo.EN_PROCESO)
+        publicar(trabajo.pk.hex, "portal", portal="ofac", fase="inicio")
+        publicar(trabajo.pk.hex, "paso", portal="ofac", paso="carga")
+        publicar(trabajo.pk.hex, "fin", estado="completado")
+
+        texto = await self.leer(trabajo, {"Last-Event-ID": "1"})
+        self.assertTrue(texto.startswith("retry: 3000\n\nevent: estado\n"))
+        self.assertNotIn("id: 1\n", texto)
+        self.assertIn('id: 2\nevent: paso\ndata: {"portal": "ofac", "paso": "carga"}\n\n', texto)
+        self.assertTrue(texto.endswith('id: 3\nevent: fin\ndata: {"estado": "completado"}\n\n'))
+
+        # Sin Last-Event-ID se reciben todos
+        self.assertIn("id: 1\nevent: portal\n", await self.leer(trabajo))
+
+    async def test_trabajo_terminado_sin_eventos(self):
+        trabajo = await Trabajo.objects.acreate(
+            numero_documento="123", estado=Trabajo.ERROR, error="Cancelada por el cliente",
+        )
+        texto = await self.leer(trabajo)
+        self.assertTrue(texto.endswith(
+            'event: fin\ndata: {"estado": "error", "error": "Cancelada por el cliente"}\n\n'
+        ))
+
+    async def test_trabajo_inexistente(self):
+        respuesta = await self.cliente.get(reverse("eventos_consulta", args=[uuid.uuid4()]))
+        self.assertEqual(respuesta.status_code, 404)
+
+
+# ===================================================
+# 🧠 GOBERNADOR DE MEMORIA
+# ===================================================
+
+def driver_con_pid(pid):
+    """Driver falso: el gobernador solo mira ``service.process.pid``."""
+    return mock.Mock(service=mock.Mock(process=mock.Mock(pid=pid)))
+
+
+class PruebasGobernador(TestCase):
+
+    def setUp(self):
+        # Árboles falsos: cada pid raíz tiene un hijo (pid + 1); la firma es el pid + 0.5
+        self.vivos = {}
+        for nombre, falso in (
+            ("rss_arbol", lambda pid: 400 * memoria.MB if pid else 0),
+            ("instantanea", lambda pid: [(p, self.vivos[p]) for p in (pid, pid + 1) if p in self.vivos] if pid else []),
+            ("firma", lambda pid: self.vivos.get(pid)),
+        ):
+            mock.patch(f"automa.memoria.{nombre}", side_effect=falso).start()
+        self.kill = mock.patch("automa.memoria.os.kill").start()
+        self.addCleanup(mock.patch.stopall)
+
+    def gobernador(self, *pids, presupuesto_mb=1000):
+        gobernador = memoria.Gobernador(presupuesto_mb=presupuesto_mb, max_navegador_mb=500,
+                                        intervalo=1, prestamo_max=60)
+        drivers = []
+        for pid in pids:
+            if pid:
+                self.vivos.update({pid: pid + 0.5, pid + 1: pid + 1.5})
+            drivers.append(driver_con_pid(pid))
+            gobernador.registrar(drivers[-1])
+        return gobernador, drivers
+
+    def matados(self):
+        return [c.args[0] for c in self.kill.call_args_list]
+
+    def test_admite_nuevo_segun_presupuesto(self):
+        # Sin navegadores medibles (el primero, o solo contextos) siempre cabe
+        self.assertTrue(self.gobernador()[0].admite_nuevo())
+        self.assertTrue(self.gobernador(None, presupuesto_mb=1)[0].admite_nuevo())
+
+        # 400 usados + max(300 estimado, 400 promedio) = 800
+        self.assertTrue(self.gobernador(100)[0].admite_nuevo())
+        self.assertFalse(self.gobernador(100, presupuesto_mb=799)[0].admite_nuevo())
+
+        # 800 usados: con el promedio (400) no cabe; con el estimado sin promedio sí
+        gobernador = self.gobernador(100, 200, presupuesto_mb=1100)[0]
+        self.assertFalse(gobernador.admite_nuevo())
+        self.assertTrue(gobernador.admite_nuevo(promedio=False))
+        self.assertFalse(gobernador.admite_nuevo(estimado_mb=301, promedio=False))
+        self.assertEqual(gobernador.usado, 800 * memoria.MB)
+
+    def test_motivo_reciclar(self):
+        gobernador, (driver,) = self.gobernador(100)
+        self.assertIsNone(gobernador.motivo_reciclar(driver))
+        gobernador.max_navegador = 300 * memoria.MB
+        self.assertEqual(gobernador.motivo_reciclar(driver), "memoria")
+
+    def test_matar_colgados(self):
+        gobernador, (colgado, reciente, libre) = self.gobernador(100, 200, 300)
+        gobernador.prestado(colgado)
+        gobernador.prestado(reciente)
+        gobernador._prestamos[id(colgado)] -= 61
+
+        with self.assertLogs(level="ERROR"):
+            gobernador.matar_colgados()
+
+        # El árbol del colgado, de las hojas a la raíz; los demás no se tocan
+        self.assertEqual(self.matados(), [101, 100])
+        self.assertEqual(list(gobernador._prestamos), [id(reciente)])
+        self.assertEqual(gobernador.reciclados, {"colgado": 1})
+
+    def test_recoger_huerfanos_solo_con_firma(self):
+        gobernador, (vivo,) = self.gobernador(100)
+        # Anotados de drivers ya muertos: 500 sigue siendo el mismo proceso,
+        # 600 es ahora otro proceso (pid reutilizado), 700 ya terminó
+        # y 800 es de un driver que se está cerrando
+        gobernador._lanzados.update({500: 500.5, 600: 600.5, 700: 700.5, 800: 800.5})
+        gobernador._cerrando.add(800)
+        self.vivos.update({500: 500.5, 600: 9.9, 800: 800.5, 900: 900.5})
+
+        with self.assertLogs(level="WARNING") as registro:
+            gobernador.recoger_huerfanos()
+
+        self.assertEqual(self.matados(), [500])
+        self.assertEqual(gobernador.huerfanos, 1)
+        self.assertEqual(sorted(gobernador._lanzados), [100, 101, 800])
+        self.assertIn("pid 500", registro.output[0])
+
+        # Sin procesos anotados no se mata nada más, aunque haya otros vivos
+        self.kill.reset_mock()
+        gobernador.recoger_huerfanos()
+        self.kill.assert_not_called()
+
+
+# ===================================================
+# 📈 MÉTRICAS Y TRAMOS
+# ===================================================
+
+LINEA_PROMETHEUS = re.compile(
+    r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{[a-zA-Z_][a-zA-Z0-9_]*="(\\.|[^"\\])*"'
+    r'(,[a-zA-Z_][a-zA-Z0-9_]*="(\\.|[^"\\])*")*\})? (-?[0-9.e+-]+|\+Inf|NaN)$'
+)
+
+
+class PruebasMetricas(TestCase):
+
+    def test_escapa_las_etiquetas(self):
+        self.assertEqual(
+            metricas._etiquetas(("portal",), ['a"b\\c\nd'], [("le", "+Inf")]),
+            '{portal="a\\"b\\\\c\\nd",le="+Inf"}',
+        )
+
+    def test_exposicion_valida(self):
+        portal = 'por"tal\n'
+        with metricas.tramo("prueba_metricas", portal):
+            pass
+        with self.assertRaises(ValueError), metricas.tramo("prueba_metricas", portal):
+            raise ValueError("falla")
+
+        respuesta = Client().get(reverse("metricas"))
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta["Content-Type"], "text/plain; version=0.0.4; charset=utf-8")
+
+        texto = respuesta.content.decode()
+        self.assertTrue(texto.endswith("\n"))
+        for linea in texto.splitlines():
+            if linea.startswith("# "):
+                self.assertRegex(linea, r"^# (HELP|TYPE) [a-zA-Z_:][a-zA-Z0-9_:]* .+$")
+            else:
+                self.assertRegex(linea, LINEA_PROMETHEUS)
+        self.assertIn("# TYPE civi_paso_segundos histogram", texto)
+
+        etiquetas = 'paso="prueba_metricas",portal="por\\"tal\\n"'
+        cubetas = [
+            linea for linea in texto.splitlines()
+            if linea.startswith(f"civi_paso_segundos_bucket{{{etiquetas},")
+        ]
+        self.assertEqual(len(cubetas), len(metricas.CUBETAS_SEGUNDOS) + 1)
+        self.assertTrue(cubetas[-1].startswith(f'civi_paso_segundos_bucket{{{etiquetas},le="+Inf"}} 2'))
+        conteos = [int(linea.rsplit(" ", 1)[1]) for linea in cubetas]
+        self.assertEqual(conteos, sorted(conteos))
+        self.assertIn(f"civi_paso_segundos_count{{{etiquetas}}} 2\n", texto)
+        self.assertIn(f"civi_paso_segundos_sum{{{etiquetas}}} ", texto)
+        self.assertIn(f'civi_pasos_total{{{etiquetas},resultado="error"}} 1\n', texto)
+        self.assertIn(f'civi_pasos_total{{{etiquetas},resultado="ok"}} 1\n', texto)
+
+    def test_tramo_en_el_log_de_tiempos(self):
+        with self.assertLogs("civi.tiempos", "INFO") as registro:
+            with metricas.tramo("prueba_log", "ofac", "trabajo1"):
+                pass
+        datos = json.loads(registro.records[0].getMessage())
+        self.assertEqual(
+            {k: datos[k] for k in ("paso", "portal", "trabajo", "resultado")},
+            {"paso": "prueba_log", "portal": "ofac", "trabajo": "trabajo1", "resultado": "ok"},
+        )
@@ -4,9 +4,16 @@ from . import views
 urlpatterns = [
     path("", views.index, name="index"),
     path("run_consulta/", views.run_consulta, name="run_consulta"),
+    path("run_consulta/<uuid:trabajo_id>/", views.estado_consulta, name="estado_consulta"),
+    path("run_consulta/<uuid:trabajo_id>/eventos/", views.eventos_consulta, name="eventos_consulta"),
+    path("run_consulta/<uuid:trabajo_id>/cancelar/", views.cancelar_consulta, name="cancelar_consulta"),
+    path("consulta_lote/", views.consulta_lote, name="consulta_lote"),
+    path("consulta_lote/<uuid:lote_id>/", views.estado_lote, name="estado_lote"),
+    path("consulta_lote/<uuid:lote_id>/progreso/", views.progreso_lote, name="progreso_lote"),
     path("descargas/", views.listar_archivos, name="listar_archivos"),
     path("descargas/eliminar/", views.eliminar_archivos, name="eliminar_archivos"),
     path("descargar_informe/", views.generar_y_descargar_pdf, name="descargar_informe"),
+    path("metrics", views.metricas, name="metricas"),
 
     # ✅ REFERENCIA CORRECTA
     path("listar_archivos_json/", views.listar_archivos_json, name="listar_archivos_json"),
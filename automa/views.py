@@ -1,41 +1,72 @@
-from django.http import JsonResponse, FileResponse, HttpResponse
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 from django.shortcuts import render
 from django.conf import settings
-from docx import Document
-from docx.shared import Inches
-from docx.enum.section import WD_ORIENT
+from django.core.paginator import Paginator
+from django.urls import reverse
+import io
 import os
+import asyncio
+import re
+import csv
+import json
 import time
-import tempfile
-import pypandoc
 import traceback
-import subprocess
-import pathlib
-import shutil
 
-from .selenium_script import ejecutar_consulta
+from .cola import cancelar_trabajo, encolar_consulta, encolar_lote
+from .ejecutor import Saturado
+from .eventos import cancelar, suscribir
+from .informes import informe_completo_en_flujo
+from .metricas import exponer
+from .catalogo import eliminar_artefacto, marcar_acceso
+from .models import Artefacto, Lote, Trabajo
 
 
-# ==========================================================
-# 🖼️ Capturas específicas que se incluirán en el informe
-# ==========================================================
-CAPTURAS_INFORME = [
-    "ofac_final.png",
-    "contaduria_final.png",
-    "ofac_final.png"
-]
+LOTE_MAX_DOCUMENTOS = getattr(settings, "CIVI_LOTE_MAX_DOCUMENTOS", 5000)
+LOTE_RESULTADOS_POR_PAGINA = 500
+LOTE_INTERVALO_PROGRESO = 2
+SSE_LATIDO = 15
+ARCHIVOS_POR_PAGINA = 100
+
+
+def es_verdadero(valor):
+    return str(valor).lower() in ("1", "true", "si", "sí", "on")
+
+
+def limpiar_numero(valor):
+    """
+    Número de documento sin separadores ni otros símbolos (puntos,
+    guiones, espacios, barras). Retorna ``""`` si no queda un número:
+    el documento termina en nombres de carpeta y de archivo.
+    """
+    numero = re.sub(r"[^0-9A-Za-z]", "", str(valor or ""))
+    return numero if any(c.isdigit() for c in numero) else ""
 
 
 # ==========================================================
-# 🔹 API: Ejecutar Selenium y generar PDF automáticamente
+# 🔹 API: Encolar consulta Selenium + informe PDF
 # ==========================================================
+def respuesta_saturada(error):
+    """429 con ``Retry-After``: la cola está llena, el cliente debe reintentar más tarde."""
+    respuesta = JsonResponse({
+        "status": "error",
+        "msg": f"⏳ Servidor ocupado, reintenta en {error.reintentar_en} segundos",
+        "reintentar_en": error.reintentar_en,
+    }, status=429)
+    respuesta["Retry-After"] = str(error.reintentar_en)
+    return respuesta
+
+
 @csrf_exempt
-def run_consulta(request):
+async def run_consulta(request):
     """
-    Ejecuta el script Selenium, selecciona capturas específicas,
-    genera un informe PDF y devuelve su URL pública.
+    Registra la consulta en la cola de trabajos y devuelve de inmediato
+    el id del trabajo; el avance se consulta en ``estado_consulta``.
+    Con ``esperar=1`` la respuesta llega al terminar el trabajo, y si el
+    cliente se desconecta antes el trabajo se cancela.
     """
     if request.method != "POST":
         return JsonResponse({
@@ -43,95 +74,25 @@ def run_consulta(request):
             "msg": "Método no permitido (usa POST)"
         }, status=405)
 
-    numero_doc = request.POST.get("numero")
-    if not numero_doc:
+    if not request.POST.get("numero"):
         return JsonResponse({
             "status": "error",
             "msg": "⚠️ Falta el número de documento"
         }, status=400)
 
-    try:
-        inicio = time.time()
-        resultado = ejecutar_consulta(numero_doc)
-        duracion = time.time() - inicio
-
-        # 🔁 Filtrar solo las capturas deseadas que existan
-        capturas_seleccionadas = [
-            c for c in resultado.get("capturas", [])
-            if os.path.basename(c) in CAPTURAS_INFORME and os.path.exists(c)
-        ]
-
-        # 🧾 Crear documento Word temporal
-        doc = Document()
-
-        # Cambiar orientación a horizontal (landscape)
-        section = doc.sections[0]
-        section.orientation = WD_ORIENT.LANDSCAPE
-        section.page_width, section.page_height = section.page_height, section.page_width
-
-        # Título principal
-        doc.add_heading(f"Informe de Consulta - {numero_doc}", level=1)
-        doc.add_paragraph(f"Duración: {duracion:.2f} segundos")
-
-        # Solo agregar título de capturas si existen
-        if capturas_seleccionadas:
-            doc.add_paragraph("Capturas incluidas en este informe:\n")
-
-            for ruta in capturas_seleccionadas:
-                nombre = os.path.basename(ruta)
-                doc.add_paragraph(nombre)
-                doc.add_picture(ruta, width=Inches(6.5))
-
-        # 📄 Guardar DOCX temporalmente
-        tmp_dir = tempfile.mkdtemp()
-        docx_path = os.path.join(tmp_dir, "informe.docx")
-        pdf_path = os.path.join(tmp_dir, "informe.pdf")
-        doc.save(docx_path)
-
-        # 🔄 Convertir DOCX → PDF con pypandoc y wkhtmltopdf
-        try:
-            wkhtmltopdf_path = r"C:\Program Files\wkhtmltopdf\bin\wkhtmltopdf.exe"
-
-            # 1️⃣ DOCX → HTML
-            html_path = os.path.join(tmp_dir, "informe.html")
-            pypandoc.convert_file(docx_path, "html", outputfile=html_path, extra_args=["--standalone"])
-
-            # 2️⃣ HTML → PDF con wkhtmltopdf
-            result = subprocess.run(
-                [wkhtmltopdf_path, html_path, pdf_path],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-                )
-            if result.returncode != 0:
-                raise Exception(f"wkhtmltopdf falló: {result.stderr}")
-
-        except Exception as e:
-            print("🧨 ERROR COMPLETO EN run_consulta():")
-            print(traceback.format_exc())
-            return JsonResponse({
-                "status": "error",
-                "msg": f"❌ Error generando PDF: {str(e)}"
-            }, status=500)
-
-        # 📂 Guardar el PDF final en /media/descargas/
-        carpeta_salida = os.path.join(settings.MEDIA_ROOT, "descargas")
-        os.makedirs(carpeta_salida, exist_ok=True)
-        destino = os.path.join(carpeta_salida, f"informe_{numero_doc}.pdf")
-        if not os.path.exists(pdf_path):
-            raise FileNotFoundError(f"No se generó el PDF en {pdf_path}")
-        shutil.move(pdf_path, destino)
-
-        # 🌐 URL pública del PDF generado
-        url_pdf = settings.MEDIA_URL + f"descargas/informe_{numero_doc}.pdf"
-
+    numero_doc = limpiar_numero(request.POST.get("numero"))
+    if not numero_doc:
         return JsonResponse({
-            "status": "ok",
-            "msg": f"✅ Consulta completada para {numero_doc}",
-            "tiempo": f"{duracion:.2f} segundos",
-            "informe_pdf": url_pdf
-        })
+            "status": "error",
+            "msg": "⚠️ El número de documento no es válido"
+        }, status=400)
 
+    try:
+        trabajo = await sync_to_async(encolar_consulta)(
+            numero_doc, forzar=es_verdadero(request.POST.get("forzar"))
+        )
+    except Saturado as e:
+        return respuesta_saturada(e)
     except Exception as e:
         print("🧨 ERROR EN run_consulta():", traceback.format_exc())
         return JsonResponse({
@@ -139,6 +100,329 @@ def run_consulta(request):
             "msg": f"❌ Error en la consulta: {str(e)}"
         }, status=500)
 
+    if es_verdadero(request.POST.get("esperar")):
+        return JsonResponse(await esperar_trabajo(trabajo))
+
+    return JsonResponse({
+        "status": "ok",
+        "msg": f"⏳ Consulta en cola para {numero_doc}",
+        "trabajo": str(trabajo.pk),
+        "estado_url": reverse("estado_consulta", args=[trabajo.pk]),
+        "eventos_url": reverse("eventos_consulta", args=[trabajo.pk]),
+    }, status=202)
+
+
+async def esperar_trabajo(trabajo):
+    """
+    Espera el evento ``fin`` del trabajo sin ocupar un hilo y retorna su
+    estado final. Si la vista se cancela (el cliente cerró la conexión)
+    el trabajo se cancela también.
+    """
+    suscripcion, pendientes = suscribir(trabajo.pk.hex)
+    try:
+        terminado = any(e["tipo"] == "fin" for e in pendientes)
+        while not terminado:
+            evento = await suscripcion.siguiente(SSE_LATIDO)
+            if evento is None:
+                await trabajo.arefresh_from_db()
+                terminado = trabajo.estado in TERMINADOS
+            else:
+                terminado = evento["tipo"] == "fin"
+    except asyncio.CancelledError:
+        await asyncio.shield(sync_to_async(cancelar_trabajo)(trabajo.pk))
+        raise
+    finally:
+        cancelar(suscripcion)
+
+    await trabajo.arefresh_from_db()
+    return datos_trabajo(trabajo)
+
+
+@csrf_exempt
+@require_POST
+async def cancelar_consulta(request, trabajo_id):
+    """Cancela un trabajo en cola o en curso (lo que alcanzó a consultar se descarta)."""
+    if not await sync_to_async(cancelar_trabajo)(trabajo_id):
+        return JsonResponse({
+            "status": "error",
+            "msg": "⚠️ El trabajo no existe o ya terminó"
+        }, status=409)
+    return JsonResponse({"status": "ok", "msg": "🛑 Consulta cancelada"})
+
+
+# ==========================================================
+# 🔹 API: Estado / resultado de un trabajo
+# ==========================================================
+def datos_trabajo(trabajo):
+    datos = {
+        "status": "ok",
+        "trabajo": str(trabajo.pk),
+        "numero": trabajo.numero_documento,
+        "estado": trabajo.estado,
+        "etapa": trabajo.etapa,
+        "progreso": trabajo.progreso,
+    }
+
+    if trabajo.estado == Trabajo.COMPLETADO:
+        datos["msg"] = f"✅ Consulta completada para {trabajo.numero_documento}"
+        datos.update(trabajo.resultado)
+    elif trabajo.estado == Trabajo.ERROR:
+        datos["status"] = "error"
+        datos["msg"] = f"❌ Error en la consulta: {trabajo.error}"
+
+    return datos
+
+
+async def estado_consulta(request, trabajo_id):
+    """Devuelve la etapa, el progreso y, al terminar, el resultado del trabajo."""
+    trabajo = await Trabajo.objects.filter(pk=trabajo_id).afirst()
+    if trabajo is None:
+        return JsonResponse({
+            "status": "error",
+            "msg": "⚠️ Trabajo no encontrado"
+        }, status=404)
+
+    return JsonResponse(datos_trabajo(trabajo))
+
+
+# ==========================================================
+# 🔹 API: Avance en vivo de un trabajo (Server-Sent Events)
+# ==========================================================
+TERMINADOS = (Trabajo.COMPLETADO, Trabajo.ERROR)
+
+
+def evento_sse(tipo, datos, id_evento=None):
+    linea_id = f"id: {id_evento}\n" if id_evento else ""
+    return f"{linea_id}event: {tipo}\ndata: {json.dumps(datos, ensure_ascii=False, default=str)}\n\n"
+
+
+def datos_estado(trabajo):
+    return {"estado": trabajo.estado, "etapa": trabajo.etapa, "progreso": trabajo.progreso}
+
+
+def datos_fin(trabajo):
+    if trabajo.estado == Trabajo.ERROR:
+        return {"estado": trabajo.estado, "error": trabajo.error}
+    return {"estado": trabajo.estado, **trabajo.resultado}
+
+
+async def eventos_consulta(request, trabajo_id):
+    """
+    Transmite el avance del trabajo como Server-Sent Events: etapa,
+    inicio y fin de cada portal, pasos y artefactos en cuanto están en
+    disco, y un evento ``fin`` con el resultado. Acepta ``Last-Event-ID``
+    para retomar sin perder eventos al reconectar.
+    """
+    trabajo = await Trabajo.objects.filter(pk=trabajo_id).afirst()
+    if trabajo is None:
+        return JsonResponse({"status": "error", "msg": "⚠️ Trabajo no encontrado"}, status=404)
+
+    try:
+        desde = int(request.headers.get("Last-Event-ID") or request.GET.get("desde") or 0)
+    except ValueError:
+        desde = 0
+
+    # Bajo WSGI un iterador async se consume completo antes de enviarse;
+    # ahí se transmite solo la etapa, leyendo la base de datos.
+    flujo = flujo_eventos(trabajo, desde) if isinstance(request, ASGIRequest) else flujo_estado(trabajo)
+    respuesta = StreamingHttpResponse(flujo, content_type="text/event-stream")
+    respuesta["Cache-Control"] = "no-cache"
+    respuesta["X-Accel-Buffering"] = "no"
+    return respuesta
+
+
+async def flujo_eventos(trabajo, desde):
+    suscripcion, pendientes = suscribir(trabajo.pk.hex, desde)
+    try:
+        yield "retry: 3000\n\n"
+        yield evento_sse("estado", datos_estado(trabajo))
+        if trabajo.estado in TERMINADOS and not any(e["tipo"] == "fin" for e in pendientes):
+            yield evento_sse("fin", datos_fin(trabajo))
+            return
+
+        for evento in pendientes:
+            yield evento_sse(evento["tipo"], evento["datos"], evento["id"])
+            if evento["tipo"] == "fin":
+                return
+
+        while True:
+            evento = await suscripcion.siguiente(SSE_LATIDO)
+            if evento is not None:
+                yield evento_sse(evento["tipo"], evento["datos"], evento["id"])
+                if evento["tipo"] == "fin":
+                    return
+                continue
+
+            # Sin eventos: latido para proxies, y se revisa la base por si
+            # el trabajo lo procesa otro proceso (que no publica en este bus)
+            yield ": latido\n\n"
+            await trabajo.arefresh_from_db()
+            if trabajo.estado in TERMINADOS:
+                yield evento_sse("fin", datos_fin(trabajo))
+                return
+    finally:
+        cancelar(suscripcion)
+
+
+def flujo_estado(trabajo):
+    ultimo = None
+    while True:
+        trabajo.refresh_from_db()
+        estado = datos_estado(trabajo)
+        if estado != ultimo:
+            yield evento_sse("estado", estado)
+            ultimo = estado
+        if trabajo.estado in TERMINADOS:
+            yield evento_sse("fin", datos_fin(trabajo))
+            return
+        time.sleep(LOTE_INTERVALO_PROGRESO)
+
+
+# ==========================================================
+# 🔹 API: Consulta masiva (lote de documentos)
+# ==========================================================
+def leer_numeros_lote(request):
+    """Extrae los documentos de un CSV subido, un cuerpo JSON o el campo ``numeros``."""
+    if "archivo" in request.FILES:
+        texto = request.FILES["archivo"].read().decode("utf-8-sig")
+        valores = [fila[0] for fila in csv.reader(io.StringIO(texto)) if fila]
+    elif request.content_type == "application/json":
+        datos = json.loads(request.body or b"[]")
+        valores = datos.get("numeros", []) if isinstance(datos, dict) else datos
+    else:
+        valores = re.split(r"[\s,;]+", request.POST.get("numeros", ""))
+
+    numeros = []
+    for valor in valores:
+        numero = limpiar_numero(valor)
+        # Se ignoran encabezados como "documento" o "NIT"
+        if numero and numero not in numeros:
+            numeros.append(numero)
+    return numeros
+
+
+@csrf_exempt
+@require_POST
+async def consulta_lote(request):
+    """
+    Recibe una lista de documentos (CSV o JSON), crea un lote y
+    encola un trabajo por documento. Si ya hay demasiados documentos de
+    lotes esperando responde 429, como ``run_consulta``.
+    """
+    try:
+        numeros = leer_numeros_lote(request)
+    except (ValueError, UnicodeDecodeError) as e:
+        return JsonResponse({
+            "status": "error",
+            "msg": f"⚠️ No se pudo leer la lista de documentos: {e}"
+        }, status=400)
+
+    if not numeros:
+        return JsonResponse({
+            "status": "error",
+            "msg": "⚠️ La lista no contiene números de documento"
+        }, status=400)
+
+    if len(numeros) > LOTE_MAX_DOCUMENTOS:
+        return JsonResponse({
+            "status": "error",
+            "msg": f"⚠️ Máximo {LOTE_MAX_DOCUMENTOS} documentos por lote"
+        }, status=400)
+
+    nombre = request.POST.get("nombre", "")
+    if "archivo" in request.FILES:
+        nombre = nombre or request.FILES["archivo"].name
+    try:
+        lote = await sync_to_async(encolar_lote)(
+            numeros, nombre=nombre, forzar=es_verdadero(request.POST.get("forzar"))
+        )
+    except Saturado as e:
+        return respuesta_saturada(e)
+
+    return JsonResponse({
+        "status": "ok",
+        "msg": f"⏳ {len(numeros)} consulta(s) en cola",
+        "lote": str(lote.pk),
+        "estado_url": reverse("estado_lote", args=[lote.pk]),
+        "progreso_url": reverse("progreso_lote", args=[lote.pk]),
+    }, status=202)
+
+
+async def estado_lote(request, lote_id):
+    """Resumen del lote y resultados por documento (paginados)."""
+    lote = await Lote.objects.filter(pk=lote_id).afirst()
+    if lote is None:
+        return JsonResponse({"status": "error", "msg": "⚠️ Lote no encontrado"}, status=404)
+
+    return JsonResponse(await sync_to_async(datos_lote)(lote, request.GET.get("pagina")))
+
+
+def datos_lote(lote, numero_pagina):
+    trabajos = lote.trabajos.order_by("creado", "numero_documento")
+    pagina = Paginator(trabajos, LOTE_RESULTADOS_POR_PAGINA).get_page(numero_pagina)
+
+    return {
+        "status": "ok",
+        "lote": str(lote.pk),
+        "nombre": lote.nombre,
+        "resumen": lote.resumen(),
+        "pagina": pagina.number,
+        "paginas": pagina.paginator.num_pages,
+        "resultados": [
+            {
+                "trabajo": str(t.pk),
+                "numero": t.numero_documento,
+                "estado": t.estado,
+                "etapa": t.etapa,
+                "error": t.error,
+                **t.resultado,
+            }
+            for t in pagina
+        ],
+    }
+
+
+def progreso_lote(request, lote_id):
+    """
+    Transmite el avance del lote como líneas JSON (NDJSON): un resumen
+    y los trabajos que cambiaron desde el envío anterior.
+    """
+    lote = Lote.objects.filter(pk=lote_id).first()
+    if lote is None:
+        return JsonResponse({"status": "error", "msg": "⚠️ Lote no encontrado"}, status=404)
+
+    def eventos():
+        desde = None
+        while True:
+            cambios = lote.trabajos.all()
+            if desde is not None:
+                cambios = cambios.filter(actualizado__gt=desde)
+            cambios = list(cambios.values(
+                "id", "numero_documento", "estado", "etapa", "actualizado"
+            ))
+            if cambios:
+                desde = max(c["actualizado"] for c in cambios)
+
+            resumen = lote.resumen()
+            yield json.dumps({
+                "resumen": resumen,
+                "trabajos": [
+                    {
+                        "trabajo": str(c["id"]),
+                        "numero": c["numero_documento"],
+                        "estado": c["estado"],
+                        "etapa": c["etapa"],
+                    }
+                    for c in cambios
+                ],
+            }) + "\n"
+
+            if resumen["terminado"]:
+                break
+            time.sleep(LOTE_INTERVALO_PROGRESO)
+
+    return StreamingHttpResponse(eventos(), content_type="application/x-ndjson")
+
 
 # ==========================================================
 # 🔹 Página principal
@@ -149,31 +433,60 @@ def index(request):
 
 
 # ==========================================================
-# 🔹 Listar archivos en /media/descargas/
+# 🔹 Listar archivos en /media/descargas/ (catálogo indexado)
 # ==========================================================
-def listar_archivos(request):
-    carpeta_descargas = os.path.join(settings.MEDIA_ROOT, "descargas")
-
-    if not os.path.exists(carpeta_descargas):
-        return render(request, "automa/listar.html", {
-            "archivos": [],
-            "error": "⚠️ La carpeta 'descargas' no existe."
-        })
-
-    archivos = []
-    for nombre in os.listdir(carpeta_descargas):
-        ruta_completa = os.path.join(carpeta_descargas, nombre)
-        if os.path.isfile(ruta_completa):
-            archivos.append({
-                "nombre": nombre,
-                "url": f"{settings.MEDIA_URL}descargas/{nombre}"
-            })
-
+def filtrar_artefactos(request):
+    """
+    Consulta del catálogo según los parámetros ``documento`` (exacto,
+    indexado), ``tipo``, ``extension`` y ``filtro`` (parte del nombre).
+    """
+    artefactos = Artefacto.objects.all()
+
+    documento = request.GET.get("documento")
+    if documento:
+        artefactos = artefactos.filter(numero_documento=documento)
+    tipo = request.GET.get("tipo")
+    if tipo:
+        artefactos = artefactos.filter(tipo=tipo)
+    extension = request.GET.get("extension")
+    if extension:
+        artefactos = artefactos.filter(extension="." + extension.lower().lstrip("."))
     filtro = request.GET.get("filtro")
     if filtro:
-        archivos = [a for a in archivos if filtro.lower() in a["nombre"].lower()]
+        artefactos = artefactos.filter(nombre__icontains=filtro)
+
+    return artefactos
+
+
+def pagina_artefactos(request, artefactos):
+    """
+    Página pedida (``?pagina=``) del catálogo. El paginador hace un
+    ``COUNT`` de la consulta filtrada (para el total de páginas) y trae
+    solo las filas de la página.
+    """
+    paginador = Paginator(artefactos.order_by("-creado", "-pk"), ARCHIVOS_POR_PAGINA)
+    return paginador.get_page(request.GET.get("pagina"))
+
 
-    return render(request, "automa/listar.html", {"archivos": archivos})
+def datos_artefacto(artefacto):
+    return {
+        "id": artefacto.pk,
+        "nombre": artefacto.nombre,
+        "url": settings.MEDIA_URL + artefacto.ruta,
+        "tipo": artefacto.tipo,
+        "portal": artefacto.portal,
+        "documento": artefacto.numero_documento,
+        "tamano": artefacto.tamano,
+        "creado": artefacto.creado.isoformat(),
+    }
+
+
+def listar_archivos(request):
+    pagina = pagina_artefactos(request, filtrar_artefactos(request))
+    return render(request, "automa/listar.html", {
+        "archivos": [datos_artefacto(a) for a in pagina],
+        "pagina": pagina,
+    })
 
 
 # ==========================================================
@@ -181,34 +494,29 @@ def listar_archivos(request):
 # ==========================================================
 @require_POST
 def eliminar_archivos(request):
-    seleccionados = request.POST.getlist("archivos")
-    carpeta_descargas = os.path.join(settings.MEDIA_ROOT, "descargas")
+    """
+    Recibe ids del catálogo en ``archivos``. Solo se borran archivos
+    catalogados, nunca rutas arbitrarias enviadas por el cliente.
+    """
+    seleccionados = [v for v in request.POST.getlist("archivos") if v.isdigit()]
 
     eliminados, errores = [], []
 
-    for nombre in seleccionados:
-        ruta = os.path.join(carpeta_descargas, nombre)
+    for artefacto in Artefacto.objects.filter(pk__in=seleccionados):
         try:
-            os.remove(ruta)
-            eliminados.append(nombre)
+            eliminar_artefacto(artefacto)
+            eliminados.append(artefacto.nombre)
         except Exception as e:
-            errores.append(f"{nombre}: {str(e)}")
+            errores.append(f"{artefacto.nombre}: {str(e)}")
 
     mensaje = f"✅ {len(eliminados)} archivo(s) eliminado(s)."
     if errores:
         mensaje += f" ⚠️ {len(errores)} no se pudieron eliminar."
 
-    archivos = []
-    for nombre in os.listdir(carpeta_descargas):
-        ruta_completa = os.path.join(carpeta_descargas, nombre)
-        if os.path.isfile(ruta_completa):
-            archivos.append({
-                "nombre": nombre,
-                "url": f"{settings.MEDIA_URL}descargas/{nombre}"
-            })
-
+    pagina = pagina_artefactos(request, filtrar_artefactos(request))
     return render(request, "automa/listar.html", {
-        "archivos": archivos,
+        "archivos": [datos_artefacto(a) for a in pagina],
+        "pagina": pagina,
         "mensaje": mensaje
     })
 
@@ -218,40 +526,29 @@ def eliminar_archivos(request):
 # ==========================================================
 def generar_y_descargar_pdf(request):
     """
-    Ejecuta el script Python que genera el informe completo y
-    devuelve el archivo PDF final al navegador.
+    Genera en el mismo proceso el informe completo de un trabajo
+    (``?trabajo=<id>`` o el último completado) y lo devuelve al navegador.
     """
-    carpeta_capturas = os.path.join(settings.BASE_DIR, "media", "descargas")
-    script_path = os.path.join(settings.BASE_DIR, "automa", "generar_informe_completo.py")
-
-    try:
-        # Ejecutar script externo
-        proceso = subprocess.run(
-            ["python", str(script_path)],
-            capture_output=True,
-            text=True
-        )
+    trabajo_id = request.GET.get("trabajo")
+    trabajos = Trabajo.objects.filter(estado=Trabajo.COMPLETADO)
+    trabajo = trabajos.filter(pk=trabajo_id).first() if trabajo_id else trabajos.first()
+    if trabajo is None:
+        return HttpResponse("⚠️ No se encontró un trabajo completado.", status=404)
 
-        print("=== SALIDA SCRIPT ===")
-        print(proceso.stdout)
-        print(proceso.stderr)
+    carpeta = trabajo.ruta_carpeta()
+    if not carpeta or not os.path.isdir(carpeta):
+        return HttpResponse("⚠️ Los archivos del trabajo ya no existen.", status=404)
 
-        if proceso.returncode != 0:
-            return HttpResponse(
-                f"⚠️ Error ejecutando el script:<br><pre>{proceso.stderr}</pre>",
-                content_type="text/html",
-                status=500
-            )
-
-        # Buscar PDF más reciente
-        pdfs = [f for f in os.listdir(carpeta_capturas) if f.lower().endswith(".pdf")]
-        if not pdfs:
+    marcar_acceso(trabajo.artefactos.all())
+    try:
+        nombre, trozos = informe_completo_en_flujo(carpeta, numero=trabajo.numero_documento)
+        if trozos is None:
             return HttpResponse("⚠️ No se encontró ningún PDF generado.", status=404)
 
-        pdfs.sort(key=lambda f: os.path.getmtime(os.path.join(carpeta_capturas, f)), reverse=True)
-        pdf_final = os.path.join(carpeta_capturas, pdfs[0])
-
-        return FileResponse(open(pdf_final, "rb"), as_attachment=True, filename=os.path.basename(pdf_final))
+        # El PDF se envía mientras se combina; no se arma completo en memoria
+        respuesta = StreamingHttpResponse(trozos, content_type="application/pdf")
+        respuesta["Content-Disposition"] = f'attachment; filename="{nombre}"'
+        return respuesta
 
     except Exception as e:
         error_trace = traceback.format_exc()
@@ -261,19 +558,27 @@ def generar_y_descargar_pdf(request):
             content_type="text/html",
             status=500
         )
-from django.http import JsonResponse
 
-def listar_archivos_json(request):
-    carpeta = os.path.join(settings.MEDIA_ROOT, "descargas")
 
-    archivos = []
+# ==========================================================
+# 🔹 PDFs disponibles (JSON paginado)
+# ==========================================================
+def listar_archivos_json(request):
+    artefactos = filtrar_artefactos(request)
+    if not request.GET.get("extension"):
+        artefactos = artefactos.filter(extension=".pdf")
+
+    pagina = pagina_artefactos(request, artefactos)
+    return JsonResponse({
+        "archivos": [datos_artefacto(a) for a in pagina],
+        "pagina": pagina.number,
+        "paginas": pagina.paginator.num_pages,
+        "total": pagina.paginator.count,
+    })
 
-    if os.path.exists(carpeta):
-        for nombre in os.listdir(carpeta):
-            if nombre.lower().endswith(".pdf"):
-                archivos.append({
-                    "nombre": nombre,
-                    "url": settings.MEDIA_URL + "descargas/" + nombre
-                })
 
-    return JsonResponse({"archivos": archivos})
+# ==========================================================
+# 📈 Métricas para Prometheus
+# ==========================================================
+def metricas(request):
+    return HttpResponse(exponer(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -3,6 +3,14 @@ ASGI config for seleniumweb project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The live progress stream (``run_consulta/<id>/eventos/``) and the API
+views that wait on the job queue (``run_consulta/?esperar=1``) are async:
+under an ASGI server each waiting client costs a coroutine instead of a
+worker thread, and a client that disconnects cancels its job. Serve it
+in the same process as the job queue, e.g.:
+
+    uvicorn seleniumweb.asgi:application --workers 1
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -14,3 +22,7 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'seleniumweb.settings')
 
 application = get_asgi_application()
+
+# Tareas de fondo del proceso que sirve (recupera la cola en memoria, etc.)
+from automa.apps import iniciar_servicio  # noqa: E402
+iniciar_servicio()
@@ -145,3 +145,120 @@ MEDIA_ROOT = BASE_DIR / 'media'
 # CONFIGURACIÓN ADICIONAL
 # ================================
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# ================================
+# POOL DE NAVEGADORES (Selenium)
+# ================================
+CIVI_POOL_TAMANO = 3          # Drivers de Chrome vivos en total (repartidos entre estrategias de carga)
+CIVI_POOL_MAX_USOS = 25       # Trabajos antes de reciclar un driver
+CIVI_POOL_TIMEOUT = 120       # Segundos máximos esperando un driver libre
+CIVI_POOL_CALENTAR = False    # Arrancar los drivers al iniciar el proceso que sirve (asgi/wsgi)
+CIVI_CONTEXTOS = False        # Un solo Chrome con un contexto aislado por driver (menos memoria por consulta)
+CIVI_CONTEXTOS_TAMANO = 8     # Contextos vivos en total (con CIVI_CONTEXTOS)
+CIVI_MAX_PORTALES_PARALELO = 3  # Portales de una consulta en paralelo
+
+
+# ================================
+# GOBERNADOR DE MEMORIA (navegadores)
+# ================================
+CIVI_MEMORIA_PRESUPUESTO_MB = None   # RSS total de los navegadores; None = 60% de la memoria del equipo
+CIVI_MEMORIA_MAX_NAVEGADOR_MB = 1024  # Un navegador que pase esto se recicla al devolverse al pool
+CIVI_MEMORIA_INTERVALO = 30          # Segundos entre revisiones (colgados, huérfanos, métricas)
+CIVI_MEMORIA_PRESTAMO_MAX = 360      # Segundos prestado antes de darlo por colgado y matarlo
+CIVI_QUIT_TIMEOUT = 20               # Segundos máximos de driver.quit() antes de matar el árbol
+CIVI_CONTEXTOS_MAX_MB = 2048         # Con CIVI_CONTEXTOS: el Chrome compartido se recicla al pasarlo (sin préstamos)
+
+
+# ================================
+# COLA DE TRABAJOS
+# ================================
+CIVI_COLA_WORKERS = 2         # Consultas procesadas a la vez en segundo plano
+CIVI_COLA_MAX_PENDIENTES = 200  # Consultas en cola + en curso; con más se responde 429 (Retry-After)
+CIVI_LOTE_MAX_DOCUMENTOS = 5000  # Documentos aceptados por consulta masiva
+CIVI_LOTE_MAX_PENDIENTES = 10000  # Documentos de lotes esperando; con más se responde 429 (Retry-After)
+CIVI_MAX_CONCURRENCIA_PORTAL = 2  # Consultas simultáneas por portal (si no se define en paginas)
+
+
+# ================================
+# CACHÉ DE RESULTADOS POR PORTAL
+# ================================
+CIVI_CACHE_TTL = 6 * 3600     # Segundos (si el portal no define "cache_ttl")
+CIVI_CACHE_MAX_MB = 500       # Tamaño máximo antes de desalojar (LRU)
+
+
+# ================================
+# RETENCIÓN DE ARTEFACTOS
+# ================================
+CIVI_RETENCION_AUTOMATICA = True  # Hilo de retención en el proceso que sirve (o programar el comando retencion_artefactos)
+CIVI_RETENCION_TTL = {            # Segundos que se conserva cada tipo de artefacto (0 = sin vencimiento)
+    "captura": 7 * 24 * 3600,
+    "html": 7 * 24 * 3600,
+    "archivo": 30 * 24 * 3600,    # Descargas de los portales (certificados)
+    "informe": 90 * 24 * 3600,    # informe_<doc>.pdf e INFORME DE CONSULTAS_*.pdf
+}
+CIVI_RETENCION_CUOTA_MB = None    # Tope del catálogo; al pasarlo se borra lo usado hace más tiempo
+CIVI_RETENCION_INTERVALO = 600    # Segundos entre pasadas
+CIVI_RETENCION_LOTE = 200         # Artefactos por lote (con una pausa breve entre lotes)
+
+
+# ================================
+# CAPTURAS DE PANTALLA
+# ================================
+CIVI_CAPTURA_FORMATO = "jpeg"  # "jpeg", "png" o "webp" (el PDF nativo solo inserta JPEG y PNG: webp queda fuera del informe)
+CIVI_CAPTURA_CALIDAD = 80      # Calidad JPEG/WebP (0-100)
+CIVI_CAPTURA_WORKERS = 2       # Hilos que decodifican y escriben capturas
+
+
+# ================================
+# VÍA RÁPIDA HTTP (adaptadores)
+# ================================
+CIVI_HTTP_CONEXIONES = 4      # Conexiones keep-alive por host
+CIVI_HTTP_TIMEOUT = 20        # Segundos de lectura por petición
+
+
+# ================================
+# INFORMES PDF
+# ================================
+CIVI_PDF_COMPRIMIR = True     # Flujos de objetos y xref comprimida al unir PDFs
+
+
+# ================================
+# BLOQUEO DE RECURSOS (CDP)
+# ================================
+CIVI_BLOQUEO_GLOBAL = ["analitica"]  # Grupos o patrones bloqueados en todos los portales
+CIVI_BLOQUEO_REPORTE = True          # Contar peticiones bloqueadas (registro de red de chromedriver)
+
+
+# ================================
+# PLAZO POR TRABAJO
+# ================================
+CIVI_PLAZO_TRABAJO = 120      # Segundos máximos por consulta; cada espera se recorta a lo que quede
+
+
+# ================================
+# CORTACIRCUITOS POR PORTAL
+# ================================
+CIVI_CIRCUITO_UMBRAL = 3         # Fallos seguidos que abren el circuito de un portal
+CIVI_CIRCUITO_ESPERA = 60        # Segundos abierto antes de probar de nuevo (se duplica si el sondeo falla)
+CIVI_CIRCUITO_ESPERA_MAX = 600
+CIVI_MAX_FALLOS_SEGUIDOS = 3     # Eventos fallidos seguidos que cortan la página
+CIVI_REINTENTOS = 2              # Reintentos ante errores de red transitorios
+CIVI_REINTENTO_BASE = 1.0        # Segundos; espera aleatoria entre 0 y base·2^intento
+CIVI_REINTENTO_TOPE = 8.0
+
+
+# ================================
+# REGISTRO Y MÉTRICAS
+# ================================
+CIVI_LOG_ERRORES = "errores.log"  # Se agrega al final (ya no se vacía en cada consulta) y rota por tamaño
+CIVI_LOG_NIVEL = "ERROR"          # Nivel mínimo de errores.log
+CIVI_LOG_TIEMPOS = "tiempos.log"  # JSON por tramo medido (se escribe por la cola de registro); None lo desactiva
+CIVI_LOG_MAX_BYTES = 5 * 1024 * 1024
+CIVI_LOG_COPIAS = 3
+
+
+# ================================
+# BENCHMARK (PORTALES SIMULADOS)
+# ================================
+CIVI_BENCHMARK_CARPETA = BASE_DIR / "benchmarks"  # Un JSON por corrida de benchmark_consultas
@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'seleniumweb.settings')
 
 application = get_wsgi_application()
+
+# Tareas de fondo del proceso que sirve (recupera la cola en memoria, etc.)
+from automa.apps import iniciar_servicio  # noqa: E402
+iniciar_servicio()